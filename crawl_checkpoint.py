@@ -0,0 +1,111 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import hashlib
+import json
+import os
+
+# ----------------------------------------------------------------------------------------------------------------------
+class CrawlCheckpoint:
+    """
+    Checkpoint of a crawl which merges the pages of a sorted page list in order (see
+    webpage_navigator.crawlThroughSubDirsParallel()). Every iIntervalPages pages the crawl session is flushed and the
+    number of merged pages is stored together with the size of the CSV file at that moment and a hash of its bytes
+    up to that size, which is updated with the rows written since the last checkpoint only. A crawl resumed from
+    the checkpoint truncates the CSV file to that size and continues with the next page, so no row is written twice.
+    The checkpoint is a small JSON file which is replaced atomically.
+    """
+
+    def __init__(self, checkpointPath, iIntervalPages=1000):
+        """
+            checkpointPath: Path to the checkpoint file.
+            iIntervalPages: Number of merged pages after which a checkpoint is saved.
+        """
+        self._checkpointPath = checkpointPath
+        self._iIntervalPages = iIntervalPages
+        self._filePath = None
+        self._sDigest = None
+        self._iPages = 0
+        self._iLastPagesDone = 0
+        self._hashFile = None
+        self._iHashedBytes = 0
+
+    def load(self, lstFilePaths):
+        """
+        Returns a tuple of CSV file path, number of merged pages and CSV file size of the saved checkpoint, or None if
+        there is none for the specified page list or the rows of its CSV file up to that size have been changed since.
+        Rows written after the checkpoint are expected, they are cut off when the crawl is resumed.
+            lstFilePaths: Sorted list of the pages of the crawl.
+        """
+        try:
+            with open(self._checkpointPath, 'r', encoding="utf-8") as fileHandler:
+                dictCheckpoint = json.load(fileHandler)
+        except (OSError, ValueError):
+            return None
+        if dictCheckpoint["pages"] != len(lstFilePaths) or dictCheckpoint["digest"] != _digest(lstFilePaths):
+            return None
+        filePath = dictCheckpoint["file"]
+        if not os.path.isfile(filePath) or os.path.getsize(filePath) < dictCheckpoint["offset"]:
+            return None
+        hashFile = hashlib.blake2b(digest_size=16)
+        _updateHash(hashFile, filePath, 0, dictCheckpoint["offset"])
+        if hashFile.hexdigest() != dictCheckpoint.get("file_digest"):
+            return None
+        return filePath, dictCheckpoint["pages_done"], dictCheckpoint["offset"]
+
+    def begin(self, filePath, lstFilePaths, iPagesDone=0):
+        """
+        Starts saving checkpoints of a crawl.
+            filePath: Path to the CSV file of the crawl.
+            lstFilePaths: Sorted list of the pages of the crawl.
+            iPagesDone: Number of pages merged already, if the crawl is resumed.
+        """
+        self._filePath = filePath
+        self._sDigest = _digest(lstFilePaths)
+        self._iPages = len(lstFilePaths)
+        self._iLastPagesDone = iPagesDone
+        self._hashFile = hashlib.blake2b(digest_size=16)
+        self._iHashedBytes = 0
+
+    def saveIfDue(self, iPagesDone, session):
+        """
+        Flushes the session and saves a checkpoint if iIntervalPages pages have been merged since the last one.
+            iPagesDone: Number of pages merged so far, the first ones of the page list.
+            session: CrawlSession of the crawl, see CrawlSession.checkpoint().
+        """
+        if iPagesDone - self._iLastPagesDone < self._iIntervalPages:
+            return
+        iOffset = session.checkpoint()
+        _updateHash(self._hashFile, self._filePath, self._iHashedBytes, iOffset)
+        self._iHashedBytes = iOffset
+        dictCheckpoint = {"file": self._filePath, "pages": self._iPages, "digest": self._sDigest,
+                          "pages_done": iPagesDone, "offset": iOffset, "file_digest": self._hashFile.hexdigest()}
+        temporaryPath = self._checkpointPath + ".tmp"
+        with open(temporaryPath, 'w', encoding="utf-8") as fileHandler:
+            json.dump(dictCheckpoint, fileHandler)
+            fileHandler.flush()
+            os.fsync(fileHandler.fileno())
+        os.replace(temporaryPath, self._checkpointPath)
+        self._iLastPagesDone = iPagesDone
+
+    def remove(self):
+        """
+        Removes the checkpoint, which has to be done when the crawl is complete.
+        """
+        if os.path.exists(self._checkpointPath):
+            os.remove(self._checkpointPath)
+
+def _digest(lstFilePaths):
+    return hashlib.blake2b("\n".join(lstFilePaths).encode("utf-8"), digest_size=16).hexdigest()
+
+def _updateHash(hashFile, filePath, iBegin, iEnd):
+    # Adds the bytes of the file from iBegin to iEnd to the hash.
+    with open(filePath, 'rb') as fileHandler:
+        fileHandler.seek(iBegin)
+        iRemaining = iEnd - iBegin
+        while iRemaining > 0:
+            block = fileHandler.read(min(iRemaining, 1 << 20))
+            if not block:
+                break
+            hashFile.update(block)
+            iRemaining -= len(block)
+
+# ----------------------------------------------------------------------------------------------------------------------
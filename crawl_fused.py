@@ -0,0 +1,141 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from concurrent.futures import ProcessPoolExecutor
+
+import asyncio
+import crawler
+import os
+import time
+import webpage_downloader as wd
+import webpage_navigator as wn
+
+# ----------------------------------------------------------------------------------------------------------------------
+class FusedCrawl:
+    """
+    Crawl which parses the pages while the webpage is downloaded, without writing the mirror to disk and reading it
+    back. The SiteFetcher hands every html page to consume() as bytes; the pages the directory crawl would parse
+    (webpage_navigator.lstDefaultIncludePatterns and lstDefaultExcludePatterns) are parsed in a pool of worker
+    processes and merged into the crawl session as soon as they are parsed, so the rows are in download order.
+    The download workers do not wait for the parsing; at most iMaxPendingPages pages are parsed at the same time,
+    further pages wait for a free slot, which bounds the number of pages in memory. If a page cannot be parsed or
+    merged at all, e.g. because a worker process has been killed (BrokenProcessPool), the download is stopped and
+    the error is raised by run(), so a partial table is never taken for a complete one. All html pages can be
+    archived to a WARC file (see site_archive.WarcWriter) in the background, which can be crawled again with
+    main.py --archive.
+    """
+
+    def __init__(self, session, iWorkers=None, iMaxTasksPerChild=200, iMaxPendingPages=64, archiver=None):
+        """
+            session: CrawlSession the product information is written to.
+            iWorkers: Number of worker processes; None uses the number of CPUs.
+            iMaxTasksPerChild: Number of pages after which a worker process is replaced by a fresh one.
+            iMaxPendingPages: Maximum number of pages handed to the worker processes and not merged yet.
+            archiver: Object with add(sUrl, contents) the raw pages are handed to, e.g. site_archive.WarcWriter;
+                      None does not keep the pages.
+        """
+        self._session = session
+        self._iWorkers = iWorkers
+        self._iMaxTasksPerChild = iMaxTasksPerChild
+        self._iMaxPendingPages = iMaxPendingPages
+        self._archiver = archiver
+        self._executor = None
+        self._semaphorePending = None
+        self._setPending = set()
+        self._taskFetch = None
+        self._lstErrors = []
+        self._regexInclude = wn.compilePatterns(wn.lstDefaultIncludePatterns)
+        self._regexExclude = wn.compilePatterns(wn.lstDefaultExcludePatterns)
+        self._iParsedPages = 0
+        self._dFirstRowSeconds = None
+        self._dBeginTime = None
+
+    def run(self, url, dirDownload, iMaxConnectionsPerHost=8, dRequestsPerSecond=None, iMaxPages=None, journal=None,
+            bPriority=False, dBudgetSeconds=None):
+        """
+        Downloads the webpage and crawls its pages on the fly.
+            url: The base url to download.
+            dirDownload: Directory path the webpage would be downloaded to; the pages get the file paths they would
+                         have in the mirror, so failures are journaled and images resolved like in a directory crawl.
+            iMaxConnectionsPerHost: Maximum number of concurrent requests per host, see SiteFetcher.
+            dRequestsPerSecond: Maximum number of requests per second per host; None does not limit the rate.
+            iMaxPages: Maximum number of pages requested; None downloads every page found.
+            journal: FailureJournal the failed downloads are recorded in; None only counts them.
+            bPriority: Boolean if the crawl should be seeded from the sitemaps and fetch the most valuable pages first,
+                       see webpage_downloader.PriorityFrontier; iMaxPages is then the budget of pages fetched.
+            dBudgetSeconds: Time after which no further pages are requested; None downloads until done.
+        """
+        self._dBeginTime = time.perf_counter()
+        fetcher = wd.SiteFetcher(dirDownload, iMaxConnectionsPerHost=iMaxConnectionsPerHost,
+                                 dRequestsPerSecond=dRequestsPerSecond, iMaxPages=iMaxPages, journal=journal,
+                                 consumer=self, bPriority=bPriority, dBudgetSeconds=dBudgetSeconds)
+        with ProcessPoolExecutor(max_workers=self._iWorkers, max_tasks_per_child=self._iMaxTasksPerChild,
+                                 initializer=crawler.initWorker, initargs=crawler.workerInitArgs()) as executor:
+            self._executor = executor
+            try:
+                asyncio.run(self._run(fetcher, url))
+            finally:
+                self._executor = None
+        fetcher.printStatistics()
+
+    async def _run(self, fetcher, url):
+        self._semaphorePending = asyncio.Semaphore(self._iMaxPendingPages)
+        self._lstErrors = []
+        self._taskFetch = asyncio.ensure_future(fetcher.run([url]))
+        try:
+            await self._taskFetch
+        except asyncio.CancelledError:
+            # Cancelled by _parse() after an error, which is raised below; any other cancellation is passed on.
+            if not self._lstErrors:
+                raise
+        finally:
+            # The last pages are still being parsed when the download is complete.
+            await asyncio.gather(*self._setPending, return_exceptions=True)
+        if self._lstErrors:
+            raise self._lstErrors[0]
+
+    async def consume(self, sUrl, filePath, contents):
+        """
+        Archives the page and parses it if the directory crawl would; called by the SiteFetcher for every html page.
+            sUrl: Url of the page.
+            filePath: Path the page would be stored at in the mirror; it is used as the file path of the page.
+            contents: Raw bytes of the page.
+        """
+        loop = asyncio.get_running_loop()
+        if self._archiver is not None:
+            await loop.run_in_executor(None, self._archiver.add, sUrl, contents)
+        sName = os.path.basename(filePath)
+        if self._regexInclude.match(sName) is None or \
+                (self._regexExclude is not None and self._regexExclude.match(sName) is not None):
+            return
+        await self._semaphorePending.acquire()
+        task = asyncio.ensure_future(self._parse(filePath, contents))
+        self._setPending.add(task)
+        task.add_done_callback(self._setPending.discard)
+
+    async def _parse(self, filePath, contents):
+        try:
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(self._executor, _parsePage, filePath,
+                                                                          contents)
+            finally:
+                self._semaphorePending.release()
+            crawler.mergeProductInfo(result, self._session)
+        except Exception as exception:
+            # Failures of single pages are results of their own; this is a failure of the crawl, which is stopped.
+            # The download is cancelled only once, so the cancellation does not interrupt it while it winds down.
+            if not self._lstErrors:
+                self._taskFetch.cancel()
+            self._lstErrors.append(exception)
+            return
+        self._iParsedPages += 1
+        if self._dFirstRowSeconds is None and result.dictData is not None:
+            self._dFirstRowSeconds = time.perf_counter() - self._dBeginTime
+
+    def printStatistics(self):
+        print("Pages parsed while downloading: {0}".format(self._iParsedPages))
+        if self._dFirstRowSeconds is not None:
+            print("First product row after: {0:.2f} s".format(self._dFirstRowSeconds))
+
+def _parsePage(filePath, contents):
+    return crawler.parseProductInfo(filePath, contents=contents)
+
+# ----------------------------------------------------------------------------------------------------------------------
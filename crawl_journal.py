@@ -0,0 +1,127 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from collections import Counter, deque, namedtuple
+
+import datetime
+import json
+import threading
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Entry of the failure journal.
+#     sTimestamp: Time the failure was recorded.
+#     sStage: Crawl stage which failed, e.g. "read", "parse", "extract" or "write" (see crawl_tracing.lstStages).
+#     sErrorType: Class name of the exception, or a name for failures without exception, e.g. "MissingColumn".
+#     filePath: Path to the HTML file.
+#     sMessage: Message of the exception, cut to the maximum message length of the journal.
+JournalEntry = namedtuple("JournalEntry", ["sTimestamp", "sStage", "sErrorType", "filePath", "sMessage"])
+
+# ----------------------------------------------------------------------------------------------------------------------
+class FailureJournal:
+    """
+    Journal of the failed pages of a crawl. Only the most recent failures are kept in memory (ring buffer) together
+    with the counts per error type and stage, so the memory stays flat even if tens of thousands of pages fail after
+    a change of the site. Every failure is appended to a log file with one JSON object per line, if a path is given,
+    and flushed right away.
+    Failures may be recorded from different threads; the journal is guarded by a lock.
+    """
+
+    def __init__(self, journalPath=None, iRecentEntries=100, iMaxMessageLength=200):
+        """
+            journalPath: Path to the log file the failures are appended to; None keeps the journal in memory only.
+            iRecentEntries: Number of most recent failures kept in memory.
+            iMaxMessageLength: Maximum number of characters stored of an exception message.
+        """
+        self._journalPath = journalPath
+        self._fileHandler = None
+        self._dequeRecent = deque(maxlen=iRecentEntries)
+        self._counterFailures = Counter()
+        self._iMaxMessageLength = iMaxMessageLength
+        self._lock = threading.Lock()
+
+    def journalPath(self):
+        """
+        Returns the path to the log file or None if the journal is kept in memory only.
+        """
+        return self._journalPath
+
+    def record(self, sStage, sErrorType, filePath, sMessage=""):
+        """
+        Records a failed page.
+            sStage: Crawl stage which failed.
+            sErrorType: Class name of the exception or name of the failure.
+            filePath: Path to the HTML file.
+            sMessage: Message of the exception.
+        """
+        sTimestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._append(JournalEntry(sTimestamp, sStage, sErrorType, filePath, sMessage[:self._iMaxMessageLength]))
+
+    def merge(self, other):
+        """
+        Records the failures of another journal with their original timestamps, e.g. of a batch of pages whose rows
+        have been accepted. Only the entries the other journal keeps in memory are recorded, so it has to keep as many
+        entries as it may record.
+            other: FailureJournal to add, which is not changed.
+        """
+        for entry in other.recentEntries():
+            self._append(entry)
+
+    def countOfFailures(self):
+        """
+        Returns the total number of recorded failures.
+        """
+        with self._lock:
+            return sum(self._counterFailures.values())
+
+    def counts(self):
+        """
+        Returns a dictionary of (error type, stage) and number of failures.
+        """
+        with self._lock:
+            return dict(self._counterFailures)
+
+    def recentEntries(self):
+        """
+        Returns the list of the most recent JournalEntry objects, the oldest first.
+        """
+        with self._lock:
+            return list(self._dequeRecent)
+
+    def printReport(self, iEntries=10):
+        """
+        Prints the number of failures per error type and stage and the most recent failures.
+            iEntries: Maximum number of recent failures printed.
+        """
+        print("Failures: {0}{1}".format(self.countOfFailures(), "" if self._journalPath is None else
+                                        " (journal: {0})".format(self._journalPath)))
+        for (sErrorType, sStage), iCount in sorted(self.counts().items(), key=lambda item: -item[1]):
+            print("    {0:<24} {1:<8} {2:>8}".format(sErrorType, sStage, iCount))
+        lstEntries = self.recentEntries()[-iEntries:] if iEntries > 0 else []
+        if lstEntries:
+            print("Most recent failures:")
+        for entry in lstEntries:
+            print("    {0} {1:<8} {2}: {3} {4}".format(entry.sTimestamp, entry.sStage, entry.sErrorType,
+                                                        entry.filePath, entry.sMessage))
+
+    def close(self):
+        """
+        Closes the log file. Failures recorded afterwards reopen it.
+        """
+        with self._lock:
+            if self._fileHandler is not None:
+                self._fileHandler.close()
+                self._fileHandler = None
+
+    def _append(self, entry):
+        with self._lock:
+            self._dequeRecent.append(entry)
+            self._counterFailures[(entry.sErrorType, entry.sStage)] += 1
+            if self._journalPath is not None:
+                if self._fileHandler is None:
+                    # Appended to, so the failures of several sessions of the same day end up in one file.
+                    self._fileHandler = open(self._journalPath, 'a', encoding="utf-8")
+                dictEntry = {"timestamp": entry.sTimestamp, "stage": entry.sStage, "error_type": entry.sErrorType,
+                             "path": entry.filePath, "message": entry.sMessage}
+                self._fileHandler.write(json.dumps(dictEntry, ensure_ascii=False) + "\n")
+                # Flushed at once, so the last failures before a crash are not lost in the buffer.
+                self._fileHandler.flush()
+
+# ----------------------------------------------------------------------------------------------------------------------
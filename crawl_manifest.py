@@ -0,0 +1,163 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawler
+import json
+import os
+import sqlite3
+import threading
+
+# ----------------------------------------------------------------------------------------------------------------------
+class CrawlManifest:
+    """
+    Persistent manifest of all crawled pages storing path, size, modification time, content hash and the extracted
+    record of every page. Pages whose size and modification time are unchanged are not even read again, pages whose
+    content hash is unchanged are not parsed again; both reuse their previous record with a refreshed timestamp.
+    The manifest carries the record format version (crawler.iRecordFormatVersion) it was written with; a manifest of
+    another version is emptied when it is opened, so records of an older parser are never reused.
+    The manifest is an SQLite database in WAL mode. Updates are committed every iCommitInterval pages, so a crash
+    loses at most the uncommitted pages, which are simply parsed again by the next run.
+    Lookups and updates may come from different threads (see CrawlPipeline); the connection is guarded by a lock.
+    """
+
+    def __init__(self, manifestPath, iCommitInterval=500):
+        """
+        Opens the manifest, creating it if it does not exist.
+            manifestPath: Path to the SQLite database file.
+            iCommitInterval: Number of updated pages after which the changes are committed.
+        """
+        self._connection = sqlite3.connect(manifestPath, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS pages (path TEXT PRIMARY KEY, size INTEGER, "
+                                 "mtime_ns INTEGER, hash TEXT, record TEXT)")
+        if self._connection.execute("PRAGMA user_version").fetchone()[0] != crawler.iRecordFormatVersion:
+            # Records of another parser version would be reused for every unchanged page; all pages are parsed again.
+            self._connection.execute("DELETE FROM pages")
+            self._connection.execute("PRAGMA user_version = {0}".format(int(crawler.iRecordFormatVersion)))
+        self._connection.commit()
+        self._iCommitInterval = iCommitInterval
+        self._iUncommitted = 0
+        self._dictStats = {}
+        self._setResolved = set()
+        self._setSeen = set()
+        self._iHits = 0
+        self._iMisses = 0
+
+    def hits(self):
+        """
+        Returns counter of pages whose previous record was reused.
+        """
+        return self._iHits
+
+    def misses(self):
+        """
+        Returns counter of pages which had to be parsed.
+        """
+        return self._iMisses
+
+    def hitRate(self):
+        """
+        Returns the share of pages whose previous record was reused.
+        """
+        iTotal = self._iHits + self._iMisses
+        return self._iHits / iTotal if iTotal > 0 else 0.0
+
+    def lookup(self, filePath):
+        """
+        Looks up the specified file in the manifest. Returns a tuple of
+        - the ParseResult reusing the previous record if size and modification time are unchanged, otherwise None,
+        - the previous content hash to hand to parseProductInfo() if the file has to be read, otherwise None.
+            filePath: Path to the HTML file.
+        """
+        stat = os.stat(filePath)
+        with self._lock:
+            self._dictStats[filePath] = (stat.st_size, stat.st_mtime_ns)
+            row = self._connection.execute("SELECT size, mtime_ns, hash, record FROM pages WHERE path = ?",
+                                           (filePath,)).fetchone()
+            if row is None:
+                return None, None
+            iSize, iMtime, sHash, sRecord = row
+            if iSize != stat.st_size or iMtime != stat.st_mtime_ns:
+                return None, sHash
+
+            self._setResolved.add(filePath)
+            return self._reuse(filePath, sRecord, iSize, sHash), None
+
+    def update(self, result):
+        """
+        Updates the manifest with the specified result and returns the result to merge, which carries the previous
+        record if the page is unchanged.
+            result: ParseResult of the page.
+        """
+        filePath = result.filePath
+        with self._lock:
+            self._setSeen.add(filePath)
+            iSize, iMtime = self._dictStats.pop(filePath)
+
+            if result.bUnchanged:
+                self._iHits += 1
+                if filePath in self._setResolved:
+                    self._setResolved.discard(filePath)
+                    return result
+                # Same content under a new modification time: keep the record, store the new size and time.
+                row = self._connection.execute("SELECT record FROM pages WHERE path = ?", (filePath,)).fetchone()
+                self._connection.execute("UPDATE pages SET size = ?, mtime_ns = ? WHERE path = ?",
+                                         (iSize, iMtime, filePath))
+                self._commitIfNeeded()
+                return self._reuse(filePath, row[0], result.iBytes, result.sHash)
+
+            self._iMisses += 1
+            if result.bException:
+                # Do not remember failing pages, they are parsed again by the next run.
+                self._connection.execute("DELETE FROM pages WHERE path = ?", (filePath,))
+            else:
+                sRecord = json.dumps(result.dictData) if result.dictData is not None else None
+                self._connection.execute("INSERT OR REPLACE INTO pages (path, size, mtime_ns, hash, record) "
+                                         "VALUES (?, ?, ?, ?, ?)", (filePath, iSize, iMtime, result.sHash, sRecord))
+            self._commitIfNeeded()
+            return result
+
+    def markSeen(self, lstFilePaths):
+        """
+        Marks pages as crawled in this run without looking them up, e.g. the pages merged before a resumed crawl was
+        interrupted, so pruneUnseen() keeps them.
+            lstFilePaths: Paths to the HTML files.
+        """
+        with self._lock:
+            self._setSeen.update(lstFilePaths)
+
+    def pruneUnseen(self):
+        """
+        Removes all pages from the manifest which have not been crawled in this run, i.e. which no longer exist.
+        """
+        lstUnseen = [(row[0],) for row in self._connection.execute("SELECT path FROM pages")
+                     if row[0] not in self._setSeen]
+        self._connection.executemany("DELETE FROM pages WHERE path = ?", lstUnseen)
+        self._connection.commit()
+
+    def close(self):
+        """
+        Commits all pending changes and closes the manifest.
+        """
+        self._connection.commit()
+        self._connection.close()
+
+    def printStatistics(self):
+        print("Manifest hits: {0}".format(self._iHits))
+        print("Manifest misses: {0}".format(self._iMisses))
+        print("Manifest hit rate: {0:.1%}".format(self.hitRate()))
+
+    def _reuse(self, filePath, sRecord, iBytes, sHash):
+        dictData = None
+        if sRecord is not None:
+            dictData = json.loads(sRecord)
+            dictData["timestamp"] = crawler.getTimestamp()
+        return crawler.ParseResult(filePath, dictData, False, False, iBytes, 0.0, sHash, True)
+
+    def _commitIfNeeded(self):
+        self._iUncommitted += 1
+        if self._iUncommitted >= self._iCommitInterval:
+            self._connection.commit()
+            self._iUncommitted = 0
+
+# ----------------------------------------------------------------------------------------------------------------------
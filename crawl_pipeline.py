@@ -0,0 +1,261 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import crawler
+import queue
+import threading
+import time
+import webpage_navigator as wn
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Marks the end of the items in a queue.
+_END = object()
+
+# ----------------------------------------------------------------------------------------------------------------------
+class StageStatistics:
+    """
+    Throughput statistics of one pipeline stage. Every stage is run by exactly one thread, so no lock is needed.
+    """
+
+    def __init__(self, sName):
+        self._sName = sName
+        self._iItems = 0
+        self._dWorkSeconds = 0.0
+        self._dWaitSeconds = 0.0
+
+    def name(self):
+        return self._sName
+
+    def items(self):
+        """
+        Returns counter of items processed by the stage.
+        """
+        return self._iItems
+
+    def addItem(self, dWorkSeconds):
+        """
+        Counts one processed item.
+            dWorkSeconds: Time taken to process the item.
+        """
+        self._iItems += 1
+        self._dWorkSeconds += dWorkSeconds
+
+    def addWait(self, dWaitSeconds):
+        """
+        Adds time the stage was blocked on a full output queue or an empty input queue.
+            dWaitSeconds: Blocked time.
+        """
+        self._dWaitSeconds += dWaitSeconds
+
+    def format(self, dTotalSeconds):
+        """
+        Returns a line with items, throughput and busy/blocked time of the stage.
+            dTotalSeconds: Wall time of the whole pipeline run.
+        """
+        dRate = self._iItems / dTotalSeconds if dTotalSeconds > 0 else 0.0
+        return "{0:<8} {1:>9} items {2:>10.1f} items/s   busy {3:>8.1f} s   blocked {4:>8.1f} s".format(
+            self._sName, self._iItems, dRate, self._dWorkSeconds, self._dWaitSeconds)
+
+# ----------------------------------------------------------------------------------------------------------------------
+class CrawlPipeline:
+    """
+    Streaming crawl of a downloaded webpage in overlapping stages connected by bounded queues:
+        walk:   generator-based file walker (or the file index) feeding file paths,
+        parse:  pool of worker processes parsing the html files (at most iQueueSize files in flight),
+        write:  merges the results in file order into the crawl session (and the manifest), which normalizes and
+                writes them in batches,
+        upload: uploads every written row to the data warehouse.
+    A full queue blocks the stage feeding it (backpressure), so the memory stays flat however large the mirror is.
+    If a stage fails, all stages are stopped, the worker processes are shut down and the error is re-raised by run().
+    """
+
+    def __init__(self, dirPath, session, iWorkers=None, iQueueSize=256, iMaxTasksPerChild=200, manifest=None,
+                 uploader=None, indexPath=None):
+        """
+            dirPath: Path to the root directory of the downloaded webpage.
+            session: CrawlSession the rows and statistics are written to.
+            iWorkers: Number of worker processes; None uses the number of CPUs.
+            iQueueSize: Capacity of every queue and maximum number of files being parsed at once.
+            iMaxTasksPerChild: Number of files after which a worker process is replaced by a fresh one.
+            manifest: CrawlManifest of the previous crawls; unchanged files are not parsed again.
+            uploader: Object with uploadRow(dictRow) and close(), e.g. data_upload.RowUploader; None skips uploading.
+            indexPath: Path to the file index of the directory, see webpage_navigator.collectHtmlFiles(); None walks
+                       the directory lazily.
+        """
+        self._dirPath = dirPath
+        self._session = session
+        self._iWorkers = iWorkers
+        self._iQueueSize = iQueueSize
+        self._iMaxTasksPerChild = iMaxTasksPerChild
+        self._manifest = manifest
+        self._uploader = uploader
+        self._indexPath = indexPath
+        self._queuePaths = queue.Queue(maxsize=iQueueSize)
+        self._queueResults = queue.Queue(maxsize=iQueueSize)
+        self._queueRows = queue.Queue(maxsize=iQueueSize)
+        self._eventStop = threading.Event()
+        self._lstErrors = []
+        self._dictStatistics = {sName: StageStatistics(sName) for sName in ["walk", "parse", "write", "upload"]}
+        self._dTotalSeconds = 0.0
+
+    def run(self):
+        """
+        Runs all stages until the last row has been uploaded. Re-raises the first error of any stage.
+        """
+        beginTime = time.perf_counter()
+        lstThreads = [threading.Thread(target=self._runStage, args=(self._walk,), name="walk"),
+                      threading.Thread(target=self._runStage, args=(self._parse,), name="parse"),
+                      threading.Thread(target=self._runStage, args=(self._write,), name="write")]
+        if self._uploader is not None:
+            lstThreads.append(threading.Thread(target=self._runStage, args=(self._upload,), name="upload"))
+        for thread in lstThreads:
+            thread.start()
+        for thread in lstThreads:
+            thread.join()
+        self._dTotalSeconds = time.perf_counter() - beginTime
+
+        if self._lstErrors:
+            raise self._lstErrors[0]
+
+    def printStatistics(self):
+        print("Pipeline run time: {0:.1f} s".format(self._dTotalSeconds))
+        for statistics in self._dictStatistics.values():
+            print(statistics.format(self._dTotalSeconds))
+
+    def _runStage(self, function):
+        try:
+            function()
+        except BaseException as exception:
+            self._lstErrors.append(exception)
+            self._eventStop.set()
+
+    def _put(self, queueOut, item, statistics):
+        """
+        Puts the item into the queue, blocking while it is full. Returns False if the pipeline has been stopped.
+        """
+        beginTime = time.perf_counter()
+        try:
+            while not self._eventStop.is_set():
+                try:
+                    queueOut.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        finally:
+            statistics.addWait(time.perf_counter() - beginTime)
+
+    def _get(self, queueIn, statistics):
+        """
+        Gets the next item from the queue, blocking while it is empty. Returns _END if the pipeline has been stopped.
+        """
+        beginTime = time.perf_counter()
+        try:
+            while not self._eventStop.is_set():
+                try:
+                    return queueIn.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return _END
+        finally:
+            statistics.addWait(time.perf_counter() - beginTime)
+
+    def _walk(self):
+        statistics = self._dictStatistics["walk"]
+        if self._indexPath is None:
+            iterFilePaths = wn.iterHtmlFiles(self._dirPath)
+        else:
+            iterFilePaths = iter(wn.collectHtmlFiles(self._dirPath, self._indexPath))
+        while True:
+            beginTime = time.perf_counter()
+            filePath = next(iterFilePaths, _END)
+            if filePath is _END:
+                break
+            statistics.addItem(time.perf_counter() - beginTime)
+            if not self._put(self._queuePaths, filePath, statistics):
+                return
+        self._put(self._queuePaths, _END, statistics)
+
+    def _parse(self):
+        statistics = self._dictStatistics["parse"]
+        dequeInFlight = deque()
+        with ProcessPoolExecutor(max_workers=self._iWorkers, max_tasks_per_child=self._iMaxTasksPerChild,
+                                 initializer=crawler.initWorker,
+                                 initargs=crawler.workerInitArgs()) as executor:
+            try:
+                while True:
+                    filePath = self._get(self._queuePaths, statistics)
+                    if filePath is _END:
+                        break
+                    beginTime = time.perf_counter()
+                    if self._manifest is not None:
+                        result, sPreviousHash = self._manifest.lookup(filePath)
+                    else:
+                        result, sPreviousHash = None, None
+                    if result is None:
+                        result = executor.submit(crawler.parseProductTask, (filePath, sPreviousHash))
+                    dequeInFlight.append(result)
+                    statistics.addItem(time.perf_counter() - beginTime)
+
+                    # Keep the order of the files and bound the number of files in flight.
+                    while dequeInFlight and (len(dequeInFlight) >= self._iQueueSize or self._isDone(dequeInFlight[0])):
+                        if not self._put(self._queueResults, self._resolve(dequeInFlight.popleft()), statistics):
+                            return
+                while dequeInFlight:
+                    if not self._put(self._queueResults, self._resolve(dequeInFlight.popleft()), statistics):
+                        return
+                self._put(self._queueResults, _END, statistics)
+            finally:
+                for future in dequeInFlight:
+                    if not isinstance(future, crawler.ParseResult):
+                        future.cancel()
+
+    def _isDone(self, item):
+        return isinstance(item, crawler.ParseResult) or item.done()
+
+    def _resolve(self, item):
+        return item if isinstance(item, crawler.ParseResult) else item.result()
+
+    def _write(self):
+        statistics = self._dictStatistics["write"]
+        while True:
+            result = self._get(self._queueResults, statistics)
+            if result is _END:
+                break
+            beginTime = time.perf_counter()
+            lstRows = crawler.mergeProductInfo(result, self._session, self._manifest)
+            statistics.addItem(time.perf_counter() - beginTime)
+            if not self._putRows(lstRows, statistics):
+                return
+        # Write the last batch of rows before the end.
+        if not self._putRows(self._session.flush(), statistics):
+            return
+        if self._uploader is not None:
+            self._put(self._queueRows, _END, statistics)
+
+    def _putRows(self, lstRows, statistics):
+        """
+        Hands the written rows to the upload stage, if any. Returns False if the pipeline has been stopped.
+        """
+        if self._uploader is None:
+            return True
+        for dictRow in lstRows:
+            if not self._put(self._queueRows, dictRow, statistics):
+                return False
+        return True
+
+    def _upload(self):
+        statistics = self._dictStatistics["upload"]
+        try:
+            while True:
+                dictRow = self._get(self._queueRows, statistics)
+                if dictRow is _END:
+                    break
+                beginTime = time.perf_counter()
+                self._uploader.uploadRow(dictRow)
+                statistics.addItem(time.perf_counter() - beginTime)
+        finally:
+            self._uploader.close()
+
+# ----------------------------------------------------------------------------------------------------------------------
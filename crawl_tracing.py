@@ -0,0 +1,141 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import heapq
+import math
+import pstats
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Stages of the processing of one page in processing order.
+#     read:      mapping the file, hashing it and scanning it with the byte-level pre-filter,
+#     parse:     parsing the page with the parser backend and reading the raw fields,
+#     extract:   building the data dictionary from the raw fields,
+#     normalize: converting the string values to numbers,
+#     write:     converting the rows for all sinks and writing them.
+# Records are normalized and written in batches; these two stages are spread evenly over the records of the batch
+# and do not count towards the slowest pages.
+lstStages = ["read", "parse", "extract", "normalize", "write"]
+
+# ----------------------------------------------------------------------------------------------------------------------
+class _ProfileStats:
+    """
+    Wraps the raw stats of a cProfile.Profile, e.g. returned by a worker process, so pstats can load them.
+    """
+
+    def __init__(self, dictStats):
+        self.stats = dictStats
+
+    def create_stats(self):
+        pass
+
+# ----------------------------------------------------------------------------------------------------------------------
+class CrawlTracer:
+    """
+    Collects the per page timings of all stages of a crawl, reports latency percentiles and histograms per stage and
+    names the slowest pages. Profiles of sampled pages (see crawler.setProfileSampleRate()) are aggregated and can be
+    dumped into one pstats file.
+    """
+
+    def __init__(self, iSlowestPages=10):
+        """
+            iSlowestPages: Number of slowest pages to report.
+        """
+        self._dictSamples = {sStage: [] for sStage in lstStages}
+        self._iSlowestPages = iSlowestPages
+        self._lstSlowest = []
+        self._profileStats = None
+        self._iProfiledPages = 0
+
+    def addPage(self, filePath, dictTimings, dictProfileStats=None):
+        """
+        Records the timings of one page.
+            filePath: Path to the HTML file.
+            dictTimings: Dictionary of stage and seconds; stages the page did not pass are missing.
+            dictProfileStats: Raw cProfile stats of the page if it has been sampled, otherwise None.
+        """
+        for sStage, dSeconds in dictTimings.items():
+            self._dictSamples[sStage].append(dSeconds)
+
+        dTotal = sum(dictTimings.values())
+        if len(self._lstSlowest) < self._iSlowestPages:
+            heapq.heappush(self._lstSlowest, (dTotal, filePath, dictTimings))
+        elif dTotal > self._lstSlowest[0][0]:
+            heapq.heapreplace(self._lstSlowest, (dTotal, filePath, dictTimings))
+
+        if dictProfileStats is not None:
+            if self._profileStats is None:
+                self._profileStats = pstats.Stats(_ProfileStats(dictProfileStats))
+            else:
+                self._profileStats.add(_ProfileStats(dictProfileStats))
+            self._iProfiledPages += 1
+
+    def addBatch(self, sStage, dSeconds, iRecords):
+        """
+        Records the time of a stage which processed a batch of records, as the same share for every record.
+            sStage: Name of the stage.
+            dSeconds: Time taken for the whole batch.
+            iRecords: Number of records in the batch.
+        """
+        if iRecords > 0:
+            self._dictSamples[sStage].extend([dSeconds / iRecords] * iRecords)
+
+    def percentiles(self, sStage, lstPercentiles=(50, 95, 99)):
+        """
+        Returns the list of the specified latency percentiles of the stage in seconds (nearest rank).
+            sStage: Name of the stage.
+            lstPercentiles: Percentiles to return.
+        """
+        lstSamples = sorted(self._dictSamples[sStage])
+        if not lstSamples:
+            return [0.0 for iPercentile in lstPercentiles]
+        return [lstSamples[max(0, math.ceil(iPercentile / 100 * len(lstSamples)) - 1)]
+                for iPercentile in lstPercentiles]
+
+    def histogram(self, sStage):
+        """
+        Returns the latency histogram of the stage as list of (upper bound in ms, count) with power of two buckets.
+            sStage: Name of the stage.
+        """
+        dictCounts = {}
+        for dSeconds in self._dictSamples[sStage]:
+            dMilliseconds = dSeconds * 1000
+            iExponent = max(-4, math.ceil(math.log2(dMilliseconds))) if dMilliseconds > 0 else -4
+            dictCounts[iExponent] = dictCounts.get(iExponent, 0) + 1
+        return [(2.0 ** iExponent, dictCounts[iExponent]) for iExponent in sorted(dictCounts)]
+
+    def slowestPages(self):
+        """
+        Returns the list of (total seconds, file path, timings) of the slowest pages, slowest first.
+        """
+        return sorted(self._lstSlowest, key=lambda tplPage: tplPage[0], reverse=True)
+
+    def printReport(self, bHistograms=False):
+        print("Stage        pages    total s    p50 ms    p95 ms    p99 ms")
+        for sStage in lstStages:
+            lstSamples = self._dictSamples[sStage]
+            dP50, dP95, dP99 = self.percentiles(sStage)
+            print("{0:<10} {1:>7} {2:>10.2f} {3:>9.3f} {4:>9.3f} {5:>9.3f}".format(
+                sStage, len(lstSamples), sum(lstSamples), dP50 * 1000, dP95 * 1000, dP99 * 1000))
+            if bHistograms:
+                for dUpperBound, iCount in self.histogram(sStage):
+                    print("    <= {0:>9.3f} ms: {1}".format(dUpperBound, iCount))
+        print()
+        print("Slowest pages:")
+        for dTotal, filePath, dictTimings in self.slowestPages():
+            sTimings = ", ".join("{0} {1:.1f} ms".format(sStage, dictTimings[sStage] * 1000)
+                                 for sStage in lstStages if sStage in dictTimings)
+            print("{0:>9.1f} ms  {1}  ({2})".format(dTotal * 1000, filePath, sTimings))
+        print()
+
+    def dumpProfile(self, profilePath, iTopFunctions=20):
+        """
+        Writes the aggregated profile of all sampled pages to a pstats file and prints its top functions.
+        Does nothing if no page has been profiled.
+            profilePath: Path to the pstats file, e.g. for snakeviz or pstats.Stats(profilePath).
+            iTopFunctions: Number of functions with the highest cumulative time to print.
+        """
+        if self._profileStats is None:
+            return
+        self._profileStats.dump_stats(profilePath)
+        print("Profile of {0} sampled pages written to {1}".format(self._iProfiledPages, profilePath))
+        self._profileStats.sort_stats("cumulative").print_stats(iTopFunctions)
+
+# ----------------------------------------------------------------------------------------------------------------------
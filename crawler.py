@@ -1,97 +1,76 @@
 # ----------------------------------------------------------------------------------------------------------------------
-from bs4 import BeautifulSoup
+from collections import namedtuple
+from contextlib import nullcontext
 from datetime import datetime
+from functools import lru_cache
+from sinks import CsvSink, ParquetSink
 
+import cProfile
+import crawl_journal as cj
 import csv
-import datetime
+import hashlib
+import math
+import nutrient_table as nt
 import os
+import parser_backends as pb
+import quantities as qt
+import random
+import threading
 import time
 import utility as ut
 
 # ----------------------------------------------------------------------------------------------------------------------
-class Singleton:
-    """
-    The Singleton class is a non-thread-safe helper class which can be used to easily implement singletons.
-    The decorated class can define an `__init__` method which takes only the `self` argument.
-    To get the singleton instance, simply use the `instance` method.
-
-    Important notes:
-    - This class should only be used as a decorator - and not as a meta class - to the class that should be a singleton.
-    - The decorated class cannot be inherited from. Other than that, there are no restrictions that apply to the
-      decorated class.
-    - Trying to use `__call__` will result in a `TypeError` being raised.
-    """
-
-    def __init__(self, decorated):
-        self._decorated = decorated
-
-    def instance(self):
-        """
-        Returns the singleton instance. Upon its first call, it creates a new instance of the decorated class and
-        calls its `__init__` method. On all subsequent calls, the already created instance will be returned.
-        """
-
-        try:
-            return self._instance
-        except AttributeError:
-            self._instance = self._decorated()
-            return self._instance
+# Columns of the CSV file in the order of the header.
+lstProductColumns = ["product_name", "category", "image", "price", "product_note", "price_note", "price_note_dim",
+                     "feature", "calorific_value_in_kJ", "calorific_value_in_kcal", "fat_in_g",
+                     "hereof_saturated_fatty_acids_in_g", "carbohydrates_in_g", "hereof_sugar_in_g", "protein_in_g",
+                     "salt_in_g", "serving_size", "serving_size_dim", "package_size", "package_size_dim", "timestamp"]
 
-    def __call__(self):
-        raise TypeError("Singletons have to be accessed through `instance()`.")
-
-    def __instanceheck__(self, inst):
-        return isinstance(inst, self._decorated)
+# Version of the records built by buildProductInfo(). Records stored by previous crawls (see CrawlManifest) are only
+# reused if they have the current version, so it has to be increased whenever a change of the parsing changes records.
+iRecordFormatVersion = 2
 
 # ----------------------------------------------------------------------------------------------------------------------
-@Singleton
-class CsvHandler:
+class CrawlStatistics:
+    """
+    Counters and lists of the crawled pages. Every thread merging results counts into its own instance (see
+    CrawlSession.workerStatistics()), so no lock is needed; the instances are merged at the end of the crawl.
+    The failed pages themselves are recorded in the failure journal of the session.
+    """
     def __init__(self):
-        self._filePath = None
-        self._lstDimensionChars = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q',
-                                   'r', 's', 't', 'u', 'v', 'w', 'x', 'y', 'z', 'ü', 'ä', 'ö', '€', '%', '$']
-        self._lstFails = []
-        self._lstExceptions = []
+        self._iFails = 0
+        self._iExceptions = 0
         self._iCounter = 0
         self._iSuccesses = 0
+        self._iRejectedPages = 0
+        self._iRejectedBytes = 0
+        self._dRejectedSeconds = 0.0
+        self._iParsedBytes = 0
+        self._dParsedSeconds = 0.0
 
-    def filePath(self):
+    def countOfFails(self):
         """
-        Returns the CSV file path.
+        Returns counter of failed crawls.
         """
-        return self._filePath
+        return self._iFails
 
-    def setFilePath(self, filePath):
+    def incrementFails(self):
         """
-        Sets the CSV file path.
-            filePath: The specified CSV file path.
+        Increments counter of failed crawls.
         """
-        ut.createFileIfNotExist(filePath=filePath, removeIfExists=True)
-        self._filePath = filePath
+        self._iFails += 1
 
-    def listFails(self):
+    def countOfExceptions(self):
         """
-        Returns the list of all failed crawls.
+        Returns counter of exceptions during crawls.
         """
-        return self._lstFails
+        return self._iExceptions
 
-    def addToListFails(self, sFail):
+    def incrementExceptions(self):
         """
-        Adds fail to the list of all failed crawls.
+        Increments counter of exceptions during crawls.
         """
-        self._lstFails.append(sFail)
-
-    def listExceptions(self):
-        """
-        Returns the list of all exceptions during crawls.
-        """
-        return self._lstExceptions
-
-    def addTolistExceptions(self, sException):
-        """
-        Adds exception to list of all exceptions during crawls.
-        """
-        self._lstExceptions.append(sException)
+        self._iExceptions += 1
 
     def countOfCrawls(self):
         """
@@ -120,234 +99,613 @@ class CsvHandler:
         """
         self._iSuccesses += 1
 
-    def findFirstIndexOfDimension(self, sNum):
-        sNumLower = sNum.lower().strip()
-        for iIndex in range(len(sNumLower)):
-            if sNumLower[iIndex] in self._lstDimensionChars:
-                return iIndex
-        return -1
+    def rejectedPages(self):
+        """
+        Returns counter of pages rejected by the byte-level pre-filter.
+        """
+        return self._iRejectedPages
 
-    def beginsWithNumber(self, sNum):
-        sNumLower = sNum.lower().strip()
-        if len(sNumLower) == 0:
-            return False
-        if sNumLower[0] not in ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9']:
-            return False
-        return True
+    def addRejectedPage(self, iBytes, dSeconds):
+        """
+        Counts a page rejected by the byte-level pre-filter.
+            iBytes: Size of the page in bytes.
+            dSeconds: Time taken to scan the page.
+        """
+        self._iRejectedPages += 1
+        self._iRejectedBytes += iBytes
+        self._dRejectedSeconds += dSeconds
+
+    def addParsedPage(self, iBytes, dSeconds):
+        """
+        Counts a page which passed the byte-level pre-filter and was parsed.
+            iBytes: Size of the page in bytes.
+            dSeconds: Time taken to parse the page and extract its data.
+        """
+        self._iParsedBytes += iBytes
+        self._dParsedSeconds += dSeconds
+
+    def estimatedSecondsSaved(self):
+        """
+        Returns the estimated parse time saved by the byte-level pre-filter, i.e. the average parse time per byte
+        of the parsed pages applied to the rejected bytes, minus the time taken to scan the rejected pages.
+        """
+        if self._iParsedBytes == 0:
+            return 0.0
+        return self._iRejectedBytes * self._dParsedSeconds / self._iParsedBytes - self._dRejectedSeconds
+
+    def merge(self, other):
+        """
+        Adds the counters and lists of other statistics to these statistics.
+            other: CrawlStatistics to add, which is not changed.
+        """
+        self._iFails += other._iFails
+        self._iExceptions += other._iExceptions
+        self._iCounter += other._iCounter
+        self._iSuccesses += other._iSuccesses
+        self._iRejectedPages += other._iRejectedPages
+        self._iRejectedBytes += other._iRejectedBytes
+        self._dRejectedSeconds += other._dRejectedSeconds
+        self._iParsedBytes += other._iParsedBytes
+        self._dParsedSeconds += other._dParsedSeconds
+
+# ----------------------------------------------------------------------------------------------------------------------
+class CrawlSession:
+    """
+    State of one crawl: the sinks the rows are written to, the pending records, the statistics, the failure journal
+    and the optional tracer. A session is passed explicitly to the crawl functions, so several crawls (e.g. of different retailers)
+    can run one after another or side by side in the same warm process. Can be used as context manager, which calls
+    close() at the end.
+    """
+    def __init__(self, filePath=None, tracer=None, journal=None):
+        """
+            filePath: CSV file path, see setFilePath(); None to set it later.
+            tracer: CrawlTracer collecting the stage timings or None if tracing is off.
+            journal: FailureJournal recording the failed pages; None keeps a journal in memory only.
+        """
+        self._filePath = None
+        self._bResumed = False
+        self._lstSinks = []
+        self._lstPendingRecords = []
+        self._iMaxPendingRecords = 1000
+        self._dMaxPendingSeconds = 5.0
+        self._dLastFlush = time.monotonic()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._lstWorkerStatistics = []
+        self._tracer = tracer
+        self._journal = journal if journal is not None else cj.FailureJournal()
+        if filePath is not None:
+            self.setFilePath(filePath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
 
-    def splitStringByDimensionIfPossible(self, sNum):
-        if len(sNum) == 0 or not self.beginsWithNumber(sNum):
-            return "", ""
-        iIndex = self.findFirstIndexOfDimension(sNum)
-        if iIndex < 0:
-            return sNum, ""
-        return sNum[:iIndex], sNum[iIndex:]
+    def filePath(self):
+        """
+        Returns the CSV file path.
+        """
+        return self._filePath
+
+    def setFilePath(self, filePath, iResumeOffset=None):
+        """
+        Sets the CSV file path and opens the CSV file, which stays open until close() is called.
+            filePath: The specified CSV file path.
+            iResumeOffset: CSV file size of the checkpoint of an interrupted crawl to resume (see checkpoint()); the
+                           existing file is cut to this size and appended to. None starts a new file.
+        """
+        self._closeSinks()
+        if iResumeOffset is None:
+            ut.createFileIfNotExist(filePath=filePath, removeIfExists=True)
+        self._filePath = filePath
+        self._bResumed = iResumeOffset is not None
+        self._lstSinks = [CsvSink(filePath, lstProductColumns, iResumeOffset=iResumeOffset)]
+
+    def setParquetFilePath(self, parquetFilePath, dictAdjustDataTypes):
+        """
+        Sets the path of the typed Parquet file written alongside the CSV file. Has to be called after setFilePath().
+        A Parquet file cannot be appended to, so the file of a resumed crawl is rebuilt from the rows of the CSV file.
+            parquetFilePath: The specified Parquet file path.
+            dictAdjustDataTypes: Dictionary of column name and SQL data type defining the schema of the file.
+        """
+        sink = ParquetSink(parquetFilePath, dictAdjustDataTypes)
+        if self._bResumed:
+            sink.writeCsvFile(self._filePath)
+        self._lstSinks.append(sink)
+
+    def tracer(self):
+        """
+        Returns the CrawlTracer collecting the stage timings or None if tracing is off.
+        """
+        return self._tracer
+
+    def setTracer(self, tracer):
+        """
+        Sets the CrawlTracer which collects the stage timings of every merged page. The tracer is not thread-safe,
+        so the results of a traced session have to be merged by one thread.
+            tracer: CrawlTracer or None to turn tracing off.
+        """
+        self._tracer = tracer
+
+    def journal(self):
+        """
+        Returns the FailureJournal recording the failed pages.
+        """
+        return self._journal
+
+    def close(self):
+        """
+        Writes all buffered rows and closes the CSV (and Parquet) file and the failure journal. Has to be called at the
+        end of the crawl.
+        """
+        self._closeSinks()
+        self._journal.close()
+
+    def _closeSinks(self):
+        self.flush()
+        with self._lock:
+            for sink in self._lstSinks:
+                sink.close()
+            self._lstSinks = []
+
+    def workerStatistics(self):
+        """
+        Returns the CrawlStatistics of the calling thread, which only this thread updates.
+        """
+        statistics = getattr(self._local, "statistics", None)
+        if statistics is None:
+            statistics = CrawlStatistics()
+            self._local.statistics = statistics
+            with self._lock:
+                self._lstWorkerStatistics.append(statistics)
+        return statistics
+
+    def statistics(self):
+        """
+        Returns new CrawlStatistics with the merged counters of all threads. Call it when the crawl is done, while
+        no thread updates its statistics any more.
+        """
+        merged = CrawlStatistics()
+        with self._lock:
+            lstWorkerStatistics = list(self._lstWorkerStatistics)
+        for statistics in lstWorkerStatistics:
+            merged.merge(statistics)
+        return merged
 
     def writeToCsv(self, dictData):
         """
-        Write the date in the CSV file previously specified by the file path.
+        Write the date in the CSV file previously specified by the file path. The raw record is kept until a batch
+        of records is normalized and written together, see flushIfDue(). Returns False if a column is missing, in
+        which case the record is not written at all.
             dictData: Dictionary which contains all the data.
         """
 
-        try:
-            with open(self._filePath, 'a') as fileHandler:
-                writer = csv.DictWriter(fileHandler, dictData.keys(), delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-                if fileHandler.tell() == 0:
-                    writer.writeheader()
-                self.convertStringValuesToFloat(dictData)
-                fileHandler.write('"{0}","{1}","{2}","{3}","{4}","{5}","{6}",{7},{8},{9},{10},{11},{12},{13},{14},"{15}",{16},{17},{18},{19},{20}\n'
-                                  .format(dictData["product_name"], dictData["category"], dictData["image"],
-                                          dictData["price"], dictData["product_note"], dictData["price_note"], dictData["price_note_dim"],
-                                          dictData["feature"], dictData["calorific_value_in_kJ"],
-                                          dictData["calorific_value_in_kcal"], dictData["fat_in_g"],
-                                          dictData["hereof_saturated_fatty_acids_in_g"],
-                                          dictData["carbohydrates_in_g"], dictData["hereof_sugar_in_g"],
-                                          dictData["protein_in_g"], dictData["salt_in_g"],
-                                          dictData["package_size"], dictData["package_size_dim"],
-                                          dictData["serving_size"], dictData["serving_size_dim"], dictData["timestamp"]))
-                return True
-        except:
-            return False
+        with self._lock:
+            for sink in self._lstSinks:
+                for column in sink.columns():
+                    if column not in dictData:
+                        return False
+            self._lstPendingRecords.append(dictData)
+        return True
 
-    def convertStringValuesToFloat(self, dictData):
-        for key, value in dictData.items():
-            if isinstance(value, str):
-                val = value.replace(',', '.').replace('g', '').replace('k', '').replace('"', '')\
-                    .replace('>', '').replace('<', '').replace('=', '').replace('_', '')
-                val = "".join(val.split())
-                if self.isFloat(val):
-                    dictData[key] = float(val)
-                else:
-                    dictData[key] = value.replace('"', '')
-
-    def isFloat(self, value):
-        try:
-            float(value)
-            return True
-        except ValueError:
-            return False
+    def checkpoint(self):
+        """
+        Normalizes and writes all pending records and forces the CSV file to disk, so all merged pages are in it.
+        Returns the size of the CSV file, from which an interrupted crawl can be resumed (see setFilePath()).
+        """
+        self.flush()
+        with self._lock:
+            return self._lstSinks[0].sync()
+
+    def flushIfDue(self):
+        """
+        Normalizes and writes the pending records if their number or the time since the last flush reached its limit.
+        Returns the list of normalized records written, usually empty.
+        """
+        if len(self._lstPendingRecords) >= self._iMaxPendingRecords or \
+                time.monotonic() - self._dLastFlush >= self._dMaxPendingSeconds:
+            return self.flush()
+        return []
+
+    def flush(self):
+        """
+        Normalizes all pending records at once (see normalization.normalizeRecords()) and writes them to all sinks.
+        Returns the list of normalized records written.
+        """
+        # Imported on first use, so the parsing worker processes do not have to load pandas.
+        import normalization as nz
+
+        with self._lock:
+            self._dLastFlush = time.monotonic()
+            if not self._lstPendingRecords:
+                return []
+            iRecords = len(self._lstPendingRecords)
+            beginTime = time.perf_counter()
+            lstRecords = nz.normalizeRecords(self._lstPendingRecords)
+            self._lstPendingRecords = []
+            normalizedTime = time.perf_counter()
+            for sink in self._lstSinks:
+                for dictRecord in lstRecords:
+                    sink.writeRow(sink.convertRow(dictRecord))
+                sink.flushIfDue()
+            if self._tracer is not None:
+                self._tracer.addBatch("normalize", normalizedTime - beginTime, iRecords)
+                self._tracer.addBatch("write", time.perf_counter() - normalizedTime, iRecords)
+        return lstRecords
 
 #--------------------------------------------------------------------------------------------------------------------
 def getTimestamp():
     """
     Returns the current timestamp.
     """
-    return datetime.datetime.fromtimestamp(time.time()).strftime("%Y-%m-%d %H:%M:%S")
+    return datetime.fromtimestamp(time.time()).strftime("%Y-%m-%d %H:%M:%S")
 
 #--------------------------------------------------------------------------------------------------------------------
-def printStatistics():
-    print("Number of total crawls: {0}".format(CsvHandler.instance().countOfCrawls()))
-    print("Number of successes: {0}".format(CsvHandler.instance().successes()))
-    print("Number of fails: {0}".format(len(CsvHandler.instance().listFails())))
-    print("Number of exceptions: {0}".format(len(CsvHandler.instance().listExceptions())))
+def printStatistics(session):
+    """
+    Prints the merged statistics of all threads of the crawl session.
+        session: CrawlSession of the crawl.
+    """
+    statistics = session.statistics()
+    print("Number of total crawls: {0}".format(statistics.countOfCrawls()))
+    print("Number of successes: {0}".format(statistics.successes()))
+    print("Number of fails: {0}".format(statistics.countOfFails()))
+    print("Number of exceptions: {0}".format(statistics.countOfExceptions()))
+    print("Number of pages rejected by pre-filter: {0} (estimated time saved: {1:.1f} s)"
+          .format(statistics.rejectedPages(), statistics.estimatedSecondsSaved()))
+    qt.printStatistics()
+    nt.printStatistics()
+    print()
+    session.journal().printReport()
     print()
-    print("Fails:\n{0}\n".format(CsvHandler.instance().listFails()))
-    print("Exceptions:\n{0}\n".format(CsvHandler.instance().listExceptions()))
 
 #--------------------------------------------------------------------------------------------------------------------
 def getAbsolutePath(absoluteFilePath, relativeFilePath):
     """
-    Returns the absolute path of the specified relative file path.
+    Returns the absolute path of the specified relative file path, with symbolic links of its directory resolved,
+    or the relative file path unchanged if it has no directory part or its directory does not exist.
+    The process working directory is not touched, so it is safe to call from several threads.
         absoluteFilePath: Absolute file path used for reference.
         relativeFilePath: Relative file path for which the absolute path should be returned.
     """
-    try:
-        currentPath = os.getcwd()
-        os.chdir(os.path.dirname(absoluteFilePath))
-        os.chdir(os.path.dirname(relativeFilePath))
-        absolutePath = os.path.join(os.getcwd(), os.path.basename(relativeFilePath))
-        os.chdir(currentPath)
-        return absolutePath
-    except:
+    dirPath = _resolveDirectory(os.path.dirname(absoluteFilePath), os.path.dirname(relativeFilePath))
+    if dirPath is None:
         return relativeFilePath
+    return os.path.join(dirPath, os.path.basename(relativeFilePath))
+
+@lru_cache(maxsize=4096)
+def _resolveDirectory(referenceDirPath, relativeDirPath):
+    # All pages of a directory refer to the same few image directories, so the resolved directories are cached.
+    # Like changing into both directories one after another, an empty or a missing directory resolves to nothing.
+    if not referenceDirPath or not relativeDirPath or not os.path.isdir(referenceDirPath):
+        return None
+    try:
+        dirPath = os.path.realpath(os.path.join(referenceDirPath, relativeDirPath), strict=True)
+    except OSError:
+        return None
+    if not os.path.isdir(dirPath):
+        return None
+    return dirPath
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Parser backend extracting the product page fields, see setParserBackend().
+_backend = pb.getParserBackend("lxml")
+
+# Share of pages parsed under cProfile, see setProfileSampleRate().
+_dProfileSampleRate = 0.0
+
+# Byte sequences every product page contains. Pages missing one of them are rejected without building a soup.
+_lstProductPageMarkers = [b"detail-description"]
+
+# Result of parseProductInfo().
+#     filePath: Path to the HTML file.
+#     dictData: Dictionary which contains all the data or None if the file is no product page.
+#     bException: Boolean which is True if the parsing raised an exception.
+#     bRejected: Boolean which is True if the page was rejected by the byte-level pre-filter.
+#     iBytes: Size of the page in bytes.
+#     dSeconds: Time taken to scan the page if rejected, otherwise to parse it and extract its data.
+#     sHash: Content hash of the page or None if not computed.
+#     bUnchanged: Boolean which is True if the page is unchanged since the previous crawl and was not parsed.
+#     dictTimings: Dictionary of stage name and seconds of the stages the page passed (see crawl_tracing.lstStages).
+#     dictProfileStats: Raw cProfile stats of the page if it has been sampled for profiling, otherwise None.
+#     tplError: Tuple of failed stage, exception class name and exception message if bException is True, else None.
+ParseResult = namedtuple("ParseResult", ["filePath", "dictData", "bException", "bRejected", "iBytes", "dSeconds",
+                                         "sHash", "bUnchanged", "dictTimings", "dictProfileStats", "tplError"],
+                         defaults=(None, None, None))
+
+# ----------------------------------------------------------------------------------------------------------------------
+def setParserBackend(sName):
+    """
+    Sets the parser backend used by extractProductInfo().
+        sName: "lxml" (default) for the lxml backend with BeautifulSoup fallback, "bs4" for the BeautifulSoup backend.
+    """
+    global _backend
+    _backend = pb.getParserBackend(sName)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def setProfileSampleRate(dRate):
+    """
+    Sets the share of pages which are parsed under cProfile. Their profiles are returned with the ParseResult and
+    aggregated by the CrawlTracer.
+        dRate: Share between 0.0 (default, no profiling) and 1.0 (every page).
+    """
+    global _dProfileSampleRate
+    _dProfileSampleRate = dRate
 
 # ----------------------------------------------------------------------------------------------------------------------
-def getAllProductInfo(filePath):
+def profileSampleRate():
+    """
+    Returns the share of pages which are parsed under cProfile.
+    """
+    return _dProfileSampleRate
+
+# ----------------------------------------------------------------------------------------------------------------------
+def initWorker(sBackendName, dProfileSampleRate):
+    """
+    Initializes a worker process with the parser backend and the profile sample rate of the main process.
+        sBackendName: Name of the parser backend, see setParserBackend().
+        dProfileSampleRate: Share of pages which are parsed under cProfile, see setProfileSampleRate().
+    """
+    setParserBackend(sBackendName)
+    setProfileSampleRate(dProfileSampleRate)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def workerInitArgs():
+    """
+    Returns the arguments of initWorker() which reproduce the settings of this process in a worker process.
+    """
+    return (parserBackendName(), profileSampleRate())
+
+# ----------------------------------------------------------------------------------------------------------------------
+def parserBackendName():
+    """
+    Returns the name of the current parser backend.
+    """
+    return _backend.name
+
+# ----------------------------------------------------------------------------------------------------------------------
+def isProductPageCandidate(contents):
+    """
+    Returns False if the raw page certainly is no product page, i.e. if one of the product page markers is missing.
+        contents: Raw bytes of the page (bytes or mmap object).
+    """
+    for marker in _lstProductPageMarkers:
+        if contents.find(marker) < 0:
+            return False
+    return True
+
+# ----------------------------------------------------------------------------------------------------------------------
+def extractProductInfo(filePath, contents, dictTimings=None):
+    """
+    Extracts all product information from the specified HTML page.
+    Returns the data dictionary of the product or None if the page is no product page.
+        filePath: Path to the HTML file.
+        contents: Raw bytes of the page (bytes or mmap object); the parser detects the encoding.
+        dictTimings: Dictionary of stage timings of the page; the parse and extract stages are added to it.
+    """
+    beginTime = time.perf_counter()
+    page = _backend.extract(contents)
+    parsedTime = time.perf_counter()
+    if dictTimings is not None:
+        dictTimings["parse"] = parsedTime - beginTime
+    if page is None:
+        return None
+    dictData = buildProductInfo(filePath, page)
+    if dictTimings is not None:
+        dictTimings["extract"] = time.perf_counter() - parsedTime
+    return dictData
+
+# ----------------------------------------------------------------------------------------------------------------------
+def buildProductInfo(filePath, page):
+    """
+    Builds the data dictionary of a product from the raw fields of its page.
+        filePath: Path to the HTML file, used to resolve the image path.
+        page: ProductPage record of the page.
+    """
     categories = ""
     priceNote = ""
     productNote = ""
     image = ""
-    bList = []
     feature = ""
 
+    productName = page.title.strip().replace("\n", '')
+    groupNames = qt.splitNameGroups(productName)
+    if groupNames:
+        if groupNames[-5].isdigit() and groupNames[-4] == ',':
+            packageSize = ''.join(groupNames[-5:]).replace(',', '.').strip()
+        elif groupNames[-4].isdigit() and groupNames[-3] == ',':
+            packageSize = ''.join(groupNames[-4:]).replace(',', '.').strip()
+        else:
+            packageSize = ''.join(groupNames[-3:]).replace(',', '.').strip()
+    else:
+        packageSize = ''
+
+    categories = '|'.join(map(str, page.breadcrumb))
+
+    if page.image is not None:
+        image = getAbsolutePath(filePath, page.image)
+
+    price = page.price.strip().replace("\n", '')
+    replaceDict = {" €": '', '.': '', ',': '.'}
+    price = ut.replaceAll(price,replaceDict)
+    if page.priceNote is not None:
+        priceNote = page.priceNote.strip().replace("\n", '')
+
+    if page.productNote is not None:
+        productNote = page.productNote.strip().replace("\n", '')
+
+    if page.feature is not None:
+        feature = page.feature.strip().replace("\n", '')
+    if page.nutrientsPerGramm is not None:
+        replaDict = {"\n": '', ':': '', 'unzubereitet': '', '(': '', ')': '', 'je': '', 'pro': '', 'zubereitet': '', 'verarbeitet': ''}
+        nutrientsTotalQuantity = ut.replaceAll(page.nutrientsPerGramm, replaDict).strip()
+    else:
+        nutrientsTotalQuantity = ""
+    if page.nutrientRows is not None:
+        nutrientInfo = ["" if math.isnan(dValue) else dValue for dValue in nt.extractNutrients(page.nutrientRows).tolist()]
+    else:
+        nutrientInfo = ["" for column in nt.lstNutrientColumns]
+    timestamp = getTimestamp()
+
+    # The package size has no decimal comma left, so its value equals float() of its number.
+    packageSizeQuantity = qt.parseQuantity(packageSize.strip())
+    packageSizeFormatted, packageSizeDim = packageSizeQuantity.sNumber, packageSizeQuantity.sUnit
+    if packageSizeFormatted != "" and packageSizeQuantity.dValue is None:
+        raise ValueError("Invalid package size '{0}'.".format(packageSizeFormatted))
+
+    servingSizeQuantity = qt.parseQuantity(nutrientsTotalQuantity)
+    servingSizeFormatted, servingSizeDim = servingSizeQuantity.sNumber, servingSizeQuantity.sUnit
+    if servingSizeFormatted != "":
+        float(servingSizeFormatted)
+
+    priceNoteQuantity = qt.parseQuantity(priceNote)
+    priceNoteFormatted, priceNoteDim = priceNoteQuantity.sNumber, priceNoteQuantity.sUnit
+    if priceNoteFormatted != "":
+        if priceNoteQuantity.dValue is None:
+            raise ValueError("Invalid price note '{0}'.".format(priceNoteFormatted))
+        priceNoteFormatted = priceNoteQuantity.dValue
+
+    categories = categories.replace("Startseite|", "")
+    categories = categories.replace("'", "")
+    categories = categories.split("|")
+    categories = ["\'{0}\'".format(sCategory) for sCategory in categories]
+    categories = ", ".join(categories)
+
+    dictData = {"product_name": productName, "category": categories, "image": image, "price": float(price),
+                "product_note": productNote, "price_note": priceNoteFormatted, "price_note_dim": priceNoteDim, "feature": feature,
+                "calorific_value_in_kJ": nutrientInfo[0], "calorific_value_in_kcal": nutrientInfo[1],
+                "fat_in_g": nutrientInfo[2], "hereof_saturated_fatty_acids_in_g": nutrientInfo[3],
+                "carbohydrates_in_g": nutrientInfo[4], "hereof_sugar_in_g": nutrientInfo[5],
+                "protein_in_g": nutrientInfo[6], "salt_in_g": nutrientInfo[7],
+                "serving_size": servingSizeFormatted, "serving_size_dim": servingSizeDim,
+                "package_size": packageSizeFormatted, "package_size_dim": packageSizeDim,
+                "timestamp": timestamp}
+    return dictData
+
+# ----------------------------------------------------------------------------------------------------------------------
+def parseProductInfo(filePath, sPreviousHash=None, bHash=False, contents=None):
+    """
+    Parses the specified HTML file without touching the crawl session, so it can run in a worker process.
+    The file is memory-mapped and handed to the parser as raw bytes. Pages failing the byte-level pre-filter are
+    rejected without building a soup. A share of the pages (see setProfileSampleRate()) is parsed under cProfile.
+    Returns the ParseResult of the file.
+        filePath: Path to the HTML file.
+        sPreviousHash: Content hash of the file at the previous crawl; the file is not parsed if it is unchanged.
+        bHash: Boolean if the content hash of the file should be computed.
+        contents: Raw bytes of the page if they are not read from the file, e.g. of a page in a site archive.
+    """
+    if _dProfileSampleRate > 0.0 and random.random() < _dProfileSampleRate:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(_parseProductInfo, filePath, sPreviousHash, bHash, contents)
+        profiler.create_stats()
+        return result._replace(dictProfileStats=profiler.stats)
+    return _parseProductInfo(filePath, sPreviousHash, bHash, contents)
+
+def _parseProductInfo(filePath, sPreviousHash, bHash, contents):
+    iBytes = 0
+    sHash = None
+    dictTimings = {}
+    readTime = time.perf_counter()
+    beginTime = readTime
     try:
-        with open(filePath, 'r') as fileHandler:
-            contents = fileHandler.read()
-            soup = BeautifulSoup(contents, "lxml")
-            isProductPage = soup.find("div", class_="col-sm-6 detail-description")
-
-            if isProductPage:
-                listTitle = soup.find("div", class_="col-sm-6 detail-description").h1.text
-                productName = listTitle.strip().replace("\n", '')
-                groupNames = ut.seperateStringNumber(productName)
-                if groupNames:
-                    if groupNames[-5].isdigit() and groupNames[-4] == ',':
-                        packageSize = ''.join(groupNames[-5:]).replace(',', '.').strip()
-                    elif groupNames[-4].isdigit() and groupNames[-3] == ',':
-                        packageSize = ''.join(groupNames[-4:]).replace(',', '.').strip()
-                    else:
-                        packageSize = ''.join(groupNames[-3:]).replace(',', '.').strip()
-                else:
-                    packageSize = ''
-                category = soup.find("div", class_="breadcrumb")
-
-                liList = category.find_all('li')
-                for li in liList:
-                    bList.append(li.a.text)
-                categories = '|'.join(map(str, bList))
-
-                if soup.find("img", class_="img-responsive jq-img-zoom"):
-                    image = soup.find("img", class_="img-responsive jq-img-zoom")["src"]
-                    image = getAbsolutePath(filePath, image)
-
-                price = soup.find("div", class_="price").text.strip().replace("\n", '')
-                replaceDict = {" €": '', '.': '', ',': '.'}
-                price = ut.replaceAll(price,replaceDict)
-                if soup.find("p", class_="price-note"):
-                    priceNote = soup.find("p", class_="price-note").text.strip().replace("\n", '')
-
-                if soup.find("p", class_="product-note"):
-                    productNote = soup.find("p", class_="product-note").text
-                    productNote = productNote.strip().replace("\n", '')
-
-                characteristics = soup.find("ul", class_="characteristics clearfix")
-                if characteristics:
-                    feature = characteristics.text.strip().replace("\n", '')
-                nutrientPerGramm = soup.find("span", class_="listTitlePerGramm")
-                if nutrientPerGramm:
-                    nutrientsTotal = soup.find("span", class_="listTitlePerGramm").text
-                    replaDict = {"\n": '', ':': '', 'unzubereitet': '', '(': '', ')': '', 'je': '', 'pro': '', 'zubereitet': '', 'verarbeitet': ''}
-                    nutrientsTotalQuantity = ut.replaceAll(nutrientsTotal, replaDict).strip()
-                else:
-                    nutrientsTotalQuantity = ""
-                nutrientTable = soup.find("table", class_="table-striped")
-                if nutrientTable:
-                    nutrientInfo = getTableData(nutrientTable)
-                else:
-                    nutrientInfo = ["" for i in range(8)]
-
-                if len(nutrientInfo) < 8:
-                    nutrientInfo = ["" for i in range(8)]
-                timestamp = getTimestamp()
-
-                packageSizeFormatted, packageSizeDim = CsvHandler.instance().splitStringByDimensionIfPossible(packageSize.strip())
-                if packageSizeFormatted != "":
-                    float(packageSizeFormatted)
-
-                servingSizeFormatted, servingSizeDim = CsvHandler.instance().splitStringByDimensionIfPossible(nutrientsTotalQuantity)
-                if servingSizeFormatted != "":
-                    float(servingSizeFormatted)
-
-                priceNoteFormatted, priceNoteDim = CsvHandler.instance().splitStringByDimensionIfPossible(priceNote)
-                if priceNoteFormatted != "":
-                    priceNoteFormatted = float(priceNoteFormatted.replace(',', '.'))
-
-                categories = categories.replace("Startseite|", "")
-                categories = categories.replace("'", "")
-                categories = categories.split("|")
-                categories = ["\'{0}\'".format(sCategory) for sCategory in categories]
-                categories = ", ".join(categories)
-
-                dictData = {"product_name": productName, "category": categories, "image": image, "price": float(price),
-                            "product_note": productNote, "price_note": priceNoteFormatted, "price_note_dim": priceNoteDim, "feature": feature,
-                            "calorific_value_in_kJ": nutrientInfo[0], "calorific_value_in_kcal": nutrientInfo[1],
-                            "fat_in_g": nutrientInfo[2], "hereof_saturated_fatty_acids_in_g": nutrientInfo[3],
-                            "carbohydrates_in_g": nutrientInfo[4], "hereof_sugar_in_g": nutrientInfo[5],
-                            "protein_in_g": nutrientInfo[6], "salt_in_g": nutrientInfo[7],
-                            "serving_size": servingSizeFormatted, "serving_size_dim": servingSizeDim,
-                            "package_size": packageSizeFormatted, "package_size_dim": packageSizeDim,
-                            "timestamp": timestamp}
-
-                if CsvHandler.instance().writeToCsv(dictData):
-                    CsvHandler.instance().incrementSuccesses()
-                else:
-                    CsvHandler.instance().addToListFails(filePath)
-                return
-    except:
-        CsvHandler.instance().addTolistExceptions(filePath)
-    CsvHandler.instance().incrementCount()
+        with ut.mapFile(filePath) if contents is None else nullcontext(contents) as contents:
+            iBytes = len(contents)
+            if bHash or sPreviousHash is not None:
+                sHash = hashContents(contents)
+                if sHash == sPreviousHash:
+                    dictTimings["read"] = time.perf_counter() - readTime
+                    return ParseResult(filePath, None, False, False, iBytes, 0.0, sHash, True, dictTimings)
+            beginTime = time.perf_counter()
+            bCandidate = isProductPageCandidate(contents)
+            dictTimings["read"] = time.perf_counter() - readTime
+            if not bCandidate:
+                return ParseResult(filePath, None, False, True, iBytes, time.perf_counter() - beginTime, sHash, False,
+                                   dictTimings)
+            dictData = extractProductInfo(filePath, contents, dictTimings)
+            return ParseResult(filePath, dictData, False, False, iBytes, time.perf_counter() - beginTime, sHash, False,
+                               dictTimings)
+    except Exception as exception:
+        # The stages record their timing when done, so the first stage without timing is the failed one.
+        sStage = next((sStage for sStage in ["read", "parse", "extract"] if sStage not in dictTimings), "extract")
+        return ParseResult(filePath, None, True, False, iBytes, time.perf_counter() - beginTime, sHash, False,
+                           dictTimings, None, (sStage, type(exception).__name__, str(exception)))
 
 # ----------------------------------------------------------------------------------------------------------------------
-def getTableData(nutrientTable):
+def parseProductTask(tplTask):
     """
-    Currently not used.
+    Calls parseProductInfo() with the arguments of the specified task, for use with Pool.imap().
+        tplTask: Tuple of the file path and the previous content hash of the file (None if unknown).
+    """
+    filePath, sPreviousHash = tplTask
+    return parseProductInfo(filePath, sPreviousHash=sPreviousHash, bHash=True)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def hashContents(contents):
+    """
+    Returns the content hash of a page as hex string.
+        contents: Raw bytes of the page (bytes or mmap object).
     """
+    return hashlib.blake2b(contents, digest_size=16).hexdigest()
 
-    tHeaders = []
-    i = 0
-    for th in nutrientTable.find_all("th"):
-        tHeaders.append(th.text.replace('\n', ' ').strip())
-    tableData = []
-
-    # Find all tr's from table's tbody.
-    for tr in nutrientTable.find_all("tr"):
-        tRow = {}
-        for td, th in zip(tr.find_all("td"), tHeaders):
-            tableText = td.text
-            replaDict = {'<': '', 'g': '', '.': '', ',': '.'}
-            tableText = ut.replaceAll(tableText, replaDict).strip()
-            tableData.append(tableText)
-    return tableData
+# ----------------------------------------------------------------------------------------------------------------------
+def mergeProductInfo(result, session, manifest=None):
+    """
+    Merges the result of parseProductInfo() into the crawl session, i.e. writes the row and updates the statistics of
+    the calling thread. Failed pages are recorded in the failure journal of the session. Rows are normalized and
+    written in batches, see CrawlSession.flushIfDue().
+    Returns the list of normalized records written by this call, usually empty.
+        result: ParseResult of the parsed HTML file.
+        session: CrawlSession the row and the statistics are added to.
+        manifest: CrawlManifest which supplies the records of unchanged pages and is updated with the result.
+    """
+    if manifest is not None:
+        result = manifest.update(result)
+
+    statistics = session.workerStatistics()
+    if result.bRejected:
+        statistics.addRejectedPage(result.iBytes, result.dSeconds)
+    elif not result.bUnchanged:
+        statistics.addParsedPage(result.iBytes, result.dSeconds)
+
+    tracer = session.tracer()
+    dictTimings = dict(result.dictTimings) if tracer is not None and result.dictTimings is not None else None
+
+    if result.bException:
+        sStage, sErrorType, sMessage = result.tplError if result.tplError is not None else ("parse", "Exception", "")
+        session.journal().record(sStage, sErrorType, result.filePath, sMessage)
+        statistics.incrementExceptions()
+        statistics.incrementCount()
+    elif result.dictData is not None:
+        if session.writeToCsv(result.dictData):
+            statistics.incrementSuccesses()
+        else:
+            session.journal().record("write", "MissingColumn", result.filePath)
+            statistics.incrementFails()
+    else:
+        statistics.incrementCount()
+
+    if dictTimings is not None:
+        tracer.addPage(result.filePath, dictTimings, result.dictProfileStats)
+    return session.flushIfDue()
+
+# ----------------------------------------------------------------------------------------------------------------------
+def getAllProductInfo(filePath, session, manifest=None):
+    """
+    Crawls the specified HTML file and writes the product information to the CSV file of the session.
+        filePath: Path to the HTML file.
+        session: CrawlSession the product information is written to.
+        manifest: CrawlManifest of the previous crawls; unchanged files are not parsed again.
+    """
+    if manifest is None:
+        mergeProductInfo(parseProductInfo(filePath), session)
+        return
+
+    result, sPreviousHash = manifest.lookup(filePath)
+    if result is None:
+        result = parseProductInfo(filePath, sPreviousHash=sPreviousHash, bHash=True)
+    mergeProductInfo(result, session, manifest)
 
 # ----------------------------------------------------------------------------------------------------------------------
 def checkIfProductAlreadyPresentInFile(file, searchString):
@@ -0,0 +1,241 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from lxml import etree
+
+import argparse
+import crawler
+import json
+import os
+import parser_backends as pb
+import shutil
+import synthetic_corpus as sc
+import sys
+import tempfile
+import time
+import tracemalloc
+import utility as ut
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Stored baselines of runBenchmarks(), see checkBaselines().
+baselinePath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "benchmark_baselines.json")
+
+# Metrics checked against the baselines. Field costs of a few microseconds are too noisy and are only reported.
+_setCheckedMetrics = {"pages_per_second", "peak_memory_kib"}
+
+# Benchmark of a workload independent of the crawler code, which the throughputs are compared relative to, see
+# benchmarkReference().
+_sReferenceBenchmark = "reference"
+
+# Key of the corpus parameters stored with the baselines, see checkBaselines().
+_sCorpusKey = "corpus"
+
+# ----------------------------------------------------------------------------------------------------------------------
+def benchmarkReference(lstFilePaths, iRepetitions=3):
+    """
+    Measures building a plain lxml tree of every page, a workload which does not depend on the crawler code. The
+    throughputs of the other benchmarks are checked relative to it, so baselines recorded on another machine (or
+    under another load) remain comparable.
+    Returns a dictionary with pages per second (best repetition) and peak memory in KiB (separate traced run).
+        lstFilePaths: List of html file paths.
+        iRepetitions: Number of timed runs.
+    """
+    lstContents = []
+    for filePath in lstFilePaths:
+        with open(filePath, 'rb') as fileHandler:
+            lstContents.append(fileHandler.read())
+    parser = etree.HTMLParser(encoding="utf-8")
+    return _measure(lambda: [etree.HTML(contents, parser) for contents in lstContents], len(lstContents), iRepetitions)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def benchmarkParse(lstFilePaths, sBackendName, iRepetitions=3):
+    """
+    Measures parseProductInfo() over all pages with the specified parser backend.
+    Returns a dictionary with pages per second (best repetition) and peak memory in KiB (separate traced run).
+        lstFilePaths: List of html file paths.
+        sBackendName: Name of the parser backend, see crawler.setParserBackend().
+        iRepetitions: Number of timed runs.
+    """
+    sPreviousBackendName = crawler.parserBackendName()
+    crawler.setParserBackend(sBackendName)
+    try:
+        return _measure(lambda: [crawler.parseProductInfo(filePath) for filePath in lstFilePaths],
+                        len(lstFilePaths), iRepetitions)
+    finally:
+        crawler.setParserBackend(sPreviousBackendName)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def benchmarkCrawl(lstFilePaths, iRepetitions=3):
+    """
+    Measures getAllProductInfo() over all pages, i.e. parsing, normalizing and writing the CSV file in one process.
+    Returns a dictionary with pages per second (best repetition) and peak memory in KiB (separate traced run).
+        lstFilePaths: List of html file paths.
+        iRepetitions: Number of timed runs.
+    """
+    dirPath = tempfile.mkdtemp()
+    csvFilePath = os.path.join(dirPath, "product_info.csv")
+
+    def crawl():
+        with crawler.CrawlSession(csvFilePath) as session:
+            for filePath in lstFilePaths:
+                crawler.getAllProductInfo(filePath, session)
+
+    try:
+        return _measure(crawl, len(lstFilePaths), iRepetitions)
+    finally:
+        shutil.rmtree(dirPath)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def benchmarkFields(lstFilePaths, iRepetitions=3):
+    """
+    Measures the cost of locating and reading every field of the product pages in an already parsed lxml tree, which
+    tells which selectors dominate the extraction. Non-product pages are skipped.
+    Returns a dictionary of field name and microseconds per product page (best repetition).
+        lstFilePaths: List of html file paths.
+        iRepetitions: Number of timed runs.
+    """
+    lstTrees = []
+    for filePath in lstFilePaths:
+        with ut.mapFile(filePath) as contents:
+            if crawler.isProductPageCandidate(contents):
+                lstTrees.append(etree.HTML(contents[:], etree.HTMLParser(encoding=pb.detectEncoding(contents))))
+    if not lstTrees:
+        return {}
+
+    xpathText = pb.LxmlBackend._xpathText
+    dictFields = {}
+    for sName, sClass, sField in pb.LxmlBackend._lstSelectors:
+        dBest = float("inf")
+        for i in range(iRepetitions):
+            beginTime = time.perf_counter()
+            for tree in lstTrees:
+                for element in tree.iter(sName):
+                    if pb.matchesClass(element.get("class"), sClass):
+                        xpathText(element)
+                        break
+            dBest = min(dBest, time.perf_counter() - beginTime)
+        dictFields[sField] = dBest / len(lstTrees) * 1e6
+    return dictFields
+
+# ----------------------------------------------------------------------------------------------------------------------
+def runBenchmarks(lstFilePaths, iRepetitions=3):
+    """
+    Runs all benchmarks and returns their results as dictionary, in the format of the stored baselines.
+        lstFilePaths: List of html file paths.
+        iRepetitions: Number of timed runs per benchmark.
+    """
+    return {_sReferenceBenchmark: benchmarkReference(lstFilePaths, iRepetitions),
+            "parse_lxml": benchmarkParse(lstFilePaths, "lxml", iRepetitions),
+            "parse_bs4": benchmarkParse(lstFilePaths, "bs4", iRepetitions),
+            "crawl": benchmarkCrawl(lstFilePaths, iRepetitions),
+            "fields_us_per_page": benchmarkFields(lstFilePaths, iRepetitions)}
+
+# ----------------------------------------------------------------------------------------------------------------------
+def checkBaselines(dictResults, dictBaselines, dTolerance=0.25, dictCorpus=None):
+    """
+    Prints the results next to the baselines and returns the list of regressions, i.e. throughputs which dropped or
+    peak memories which grew by more than the tolerance. Throughputs are compared relative to the reference
+    benchmark of their own run (see benchmarkReference()), so the change does not depend on the speed of the machine.
+    The page mix of the corpus changes the throughputs as well, so baselines recorded on another corpus (or without
+    corpus parameters) are not compared; the results are only printed then.
+        dictResults: Results of runBenchmarks().
+        dictBaselines: Stored results of an earlier runBenchmarks() with the parameters of their corpus.
+        dTolerance: Allowed relative deviation, which absorbs the noise of the measurements.
+        dictCorpus: Dictionary of the parameters of the benchmarked corpus; None compares with any baselines.
+    """
+    if dictCorpus is not None and dictBaselines and dictBaselines.get(_sCorpusKey) != dictCorpus:
+        print("Baselines recorded on another corpus ({0}), not compared.".format(dictBaselines.get(_sCorpusKey)))
+        dictBaselines = {}
+    dReference = dictResults.get(_sReferenceBenchmark, {}).get("pages_per_second")
+    dBaselineReference = dictBaselines.get(_sReferenceBenchmark, {}).get("pages_per_second")
+    lstRegressions = []
+    for sBenchmark, dictMetrics in dictResults.items():
+        dictBaseline = dictBaselines.get(sBenchmark, {})
+        for sMetric, dValue in dictMetrics.items():
+            dBaseline = dictBaseline.get(sMetric)
+            if dBaseline is None or dBaseline == 0:
+                print("{0:<20} {1:<24} {2:>12.1f}".format(sBenchmark, sMetric, dValue))
+                continue
+            dChange = dValue / dBaseline - 1.0
+            if sMetric == "pages_per_second" and sBenchmark != _sReferenceBenchmark:
+                if not dReference or not dBaselineReference:
+                    print("{0:<20} {1:<24} {2:>12.1f} {3:>12.1f}  no reference".format(
+                        sBenchmark, sMetric, dValue, dBaseline))
+                    continue
+                dChange = (dValue / dReference) / (dBaseline / dBaselineReference) - 1.0
+            # Throughputs regress when they drop, costs and memory when they grow.
+            bRegression = sMetric in _setCheckedMetrics and sBenchmark != _sReferenceBenchmark and \
+                (-dChange > dTolerance if sMetric == "pages_per_second" else dChange > dTolerance)
+            print("{0:<20} {1:<24} {2:>12.1f} {3:>12.1f} {4:>+8.1%}{5}".format(
+                sBenchmark, sMetric, dValue, dBaseline, dChange, "  REGRESSION" if bRegression else ""))
+            if bRegression:
+                lstRegressions.append((sBenchmark, sMetric, dValue, dBaseline))
+    return lstRegressions
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _measure(function, iPages, iRepetitions):
+    dBest = float("inf")
+    for i in range(iRepetitions):
+        beginTime = time.perf_counter()
+        function()
+        dBest = min(dBest, time.perf_counter() - beginTime)
+
+    # Tracing slows everything down, so the peak memory is measured in a separate run.
+    tracemalloc.start()
+    try:
+        function()
+        iPeak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"pages_per_second": iPages / dBest, "peak_memory_kib": iPeak / 1024}
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the crawler on a synthetic edeka24 corpus.")
+    parser.add_argument("--corpus-dir", help="existing mirror to benchmark instead of a generated one")
+    parser.add_argument("--products", type=int, default=500, help="number of generated product pages")
+    parser.add_argument("--others", type=int, default=100, help="number of generated non-product pages")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated corpus")
+    parser.add_argument("--filler-bytes", type=int, default=20000,
+                        help="approximate size of the navigation and script markup of every generated page")
+    parser.add_argument("--repetitions", type=int, default=3, help="number of timed runs per benchmark")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative deviation from the baselines")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as new baselines")
+    arguments = parser.parse_args()
+
+    corpusDirPath = arguments.corpus_dir
+    if corpusDirPath is None:
+        corpusDirPath = tempfile.mkdtemp()
+        sc.generateCorpus(corpusDirPath, arguments.products, arguments.others, iSeed=arguments.seed,
+                          iFillerBytes=arguments.filler_bytes)
+        dictCorpus = {"products": arguments.products, "others": arguments.others, "seed": arguments.seed,
+                      "filler_bytes": arguments.filler_bytes}
+    else:
+        dictCorpus = {"corpus_dir": os.path.abspath(corpusDirPath)}
+    lstFilePaths = []
+    for dirPath, lstDirNames, lstFileNames in os.walk(corpusDirPath):
+        lstDirNames.sort()
+        lstFilePaths.extend(os.path.join(dirPath, fileName) for fileName in sorted(lstFileNames)
+                            if fileName.endswith(".html"))
+    try:
+        dictResults = runBenchmarks(lstFilePaths, arguments.repetitions)
+    finally:
+        if arguments.corpus_dir is None:
+            shutil.rmtree(corpusDirPath)
+
+    dictBaselines = {}
+    if os.path.isfile(baselinePath):
+        with open(baselinePath, 'r') as fileHandler:
+            dictBaselines = json.load(fileHandler)
+    dictCorpus["pages"] = len(lstFilePaths)
+    print("{0} pages".format(len(lstFilePaths)))
+    print("{0:<20} {1:<24} {2:>12} {3:>12} {4:>8}".format("benchmark", "metric", "result", "baseline", "change"))
+    lstRegressions = checkBaselines(dictResults, dictBaselines, arguments.tolerance, dictCorpus)
+
+    if arguments.save_baseline:
+        with open(baselinePath, 'w') as fileHandler:
+            json.dump(dict(dictResults, **{_sCorpusKey: dictCorpus}), fileHandler, indent=4, sort_keys=True)
+        print("Baselines written to {0}".format(baselinePath))
+    elif lstRegressions:
+        print("{0} regressions.".format(len(lstRegressions)))
+        sys.exit(1)
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -135,7 +135,8 @@ def uploadDataFrame(dataFrame, dbName, dataTableName, lstJsonArrayIndices, logDi
 
     for index, row in dataFrame.iterrows():
         dictRow = row.to_dict()
-        values = list(dictRow.values())
+        # Typed timestamp columns (e.g. read from Parquet) yield pandas timestamps, which SQLInsert does not know.
+        values = [value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in dictRow.values()]
         sqlInsert.setValues(values)
         statement = sqlInsert.buildStatement()
         sqlInsert.executeStatement(statement, False)
@@ -150,6 +151,65 @@ def uploadDataFrame(dataFrame, dbName, dataTableName, lstJsonArrayIndices, logDi
     connection.close()
     print("Database connection successfully closed.\n")
 
+# ======================================================================================================================
+# Upload single rows
+# ======================================================================================================================
+class RowUploader:
+    """
+    Uploads single crawled rows to a database in a data warehouse over one connection, e.g. from a streaming
+    pipeline, instead of a whole data frame at the end of the crawl.
+    """
+
+    def __init__(self, dbName, dataTableName, dictAdjustDataTypes, logDirPath=None):
+
+        # --------------------------------------------------------------------------------------------------------------
+        # Establish server connection
+        # --------------------------------------------------------------------------------------------------------------
+
+        hostIpAddress = ""
+        username = ""
+        password = ""
+        self._connection = pysql.establishServerConnection(hostIpAddress=hostIpAddress,
+                                                           dbName=dbName,
+                                                           username=username,
+                                                           password=password,
+                                                           keepassDB="",
+                                                           keepassKey="",
+                                                           keepassTitle="")
+
+        # --------------------------------------------------------------------------------------------------------------
+        # Prepare SQL INSERT statement
+        # --------------------------------------------------------------------------------------------------------------
+
+        self._dbName = dbName
+        self._dataTableName = dataTableName
+        self._logDirPath = logDirPath
+        self._lstColumnNames = list(dictAdjustDataTypes.keys())
+        self._sqlInsert = pysql.SQLInsert(self._connection, dbName, dataTableName, self._lstColumnNames, values=None)
+        self._sqlInsert.setCursor()
+        self._sqlInsert.setLstJsonArrayIndices([index for index, value in enumerate(dictAdjustDataTypes.values())
+                                                if value == "JSON"])
+
+    def uploadRow(self, dictRow):
+        """
+        Uploads one row. Empty strings are uploaded as NULL, like the NaN values of a data frame read from CSV.
+            dictRow: Dictionary of column name and value.
+        """
+        values = [None if dictRow[key] == "" else dictRow[key] for key in self._lstColumnNames]
+        self._sqlInsert.setValues(values)
+        statement = self._sqlInsert.buildStatement()
+        self._sqlInsert.executeStatement(statement, False)
+
+    def close(self):
+        """
+        Writes the failed statements to the log and closes the connection.
+        """
+        if self._logDirPath is not None:
+            writeFailedStatementsToLog(self._logDirPath, self._sqlInsert, self._dataTableName, self._dbName)
+
+        self._connection.close()
+        print("Database connection successfully closed.\n")
+
 # ======================================================================================================================
 # Write failed statements to log
 # ======================================================================================================================
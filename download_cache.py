@@ -0,0 +1,112 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from collections import namedtuple
+
+import crawler
+import os
+import sqlite3
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Validators of a downloaded page, see DownloadCache.lookup().
+#     filePath: Path the page is stored at in the mirror.
+#     sEtag: ETag header of the last full response or None.
+#     sLastModified: Last-Modified header of the last full response or None.
+#     sHash: Content hash of the stored page (see crawler.hashContents()).
+#     iSize: Size of the stored page in bytes.
+#     iModifiedNs: Modification time of the stored page in nanoseconds since the epoch.
+CacheEntry = namedtuple("CacheEntry", ["filePath", "sEtag", "sLastModified", "sHash", "iSize", "iModifiedNs"])
+
+# ----------------------------------------------------------------------------------------------------------------------
+class DownloadCache:
+    """
+    Persistent validator cache of the downloader, keyed by url, storing the ETag and Last-Modified headers, content
+    hash, size and modification time of every page stored in the mirror. The downloader sends the validators as
+    conditional request headers and keeps the stored page if the server answers 304 Not Modified. A page downloaded
+    again with an unchanged content hash is not rewritten either, so its modification time stays and the
+    CrawlManifest does not even read it.
+    The cache is an SQLite database in WAL mode. Updates are committed every iCommitInterval pages; a crash only
+    loses validators, which makes the next run request those pages unconditionally.
+    """
+
+    def __init__(self, cachePath, iCommitInterval=500):
+        """
+        Opens the cache, creating it if it does not exist.
+            cachePath: Path to the SQLite database file.
+            iCommitInterval: Number of updated pages after which the changes are committed.
+        """
+        self._connection = sqlite3.connect(cachePath)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, path TEXT, etag TEXT, "
+                                 "last_modified TEXT, hash TEXT, size INTEGER, modified_ns INTEGER)")
+        # Caches written before the modification time was stored get the column; lookup() compares the content hash
+        # of their pages once and stores the modification time.
+        if "modified_ns" not in [row[1] for row in self._connection.execute("PRAGMA table_info(pages)")]:
+            self._connection.execute("ALTER TABLE pages ADD COLUMN modified_ns INTEGER")
+        self._connection.commit()
+        self._iCommitInterval = iCommitInterval
+        self._iUncommitted = 0
+
+    def lookup(self, sUrl):
+        """
+        Returns the CacheEntry of the url, or None if the url is unknown or its stored page has been removed or
+        changed on disk since, in which case it has to be downloaded unconditionally. A page of another size has
+        changed; a page of the same size with another modification time (e.g. edited in place, or written again for
+        another url of the same path) is compared by its content hash, and its modification time is updated if the
+        content is unchanged.
+            sUrl: Normalized url of the page.
+        """
+        row = self._connection.execute("SELECT path, etag, last_modified, hash, size, modified_ns FROM pages "
+                                       "WHERE url = ?", (sUrl,)).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row)
+        try:
+            stat = os.stat(entry.filePath)
+        except OSError:
+            return None
+        if stat.st_size != entry.iSize:
+            return None
+        if stat.st_mtime_ns != entry.iModifiedNs:
+            try:
+                with open(entry.filePath, 'rb') as fileHandler:
+                    sHash = crawler.hashContents(fileHandler.read())
+            except OSError:
+                return None
+            if sHash != entry.sHash:
+                return None
+            entry = entry._replace(iModifiedNs=stat.st_mtime_ns)
+            self.update(sUrl, entry)
+        return entry
+
+    def update(self, sUrl, entry):
+        """
+        Stores the validators of a page after a full response.
+            sUrl: Normalized url of the page.
+            entry: CacheEntry of the page, with the size and modification time of the file as stored.
+        """
+        self._connection.execute("INSERT OR REPLACE INTO pages (url, path, etag, last_modified, hash, size, "
+                                 "modified_ns) VALUES (?, ?, ?, ?, ?, ?, ?)", (sUrl,) + tuple(entry))
+        self._commitIfNeeded()
+
+    def remove(self, sUrl):
+        """
+        Removes the validators of a page, e.g. one which is no longer available.
+            sUrl: Normalized url of the page.
+        """
+        self._connection.execute("DELETE FROM pages WHERE url = ?", (sUrl,))
+        self._commitIfNeeded()
+
+    def close(self):
+        """
+        Commits all pending changes and closes the cache.
+        """
+        self._connection.commit()
+        self._connection.close()
+
+    def _commitIfNeeded(self):
+        self._iUncommitted += 1
+        if self._iUncommitted >= self._iCommitInterval:
+            self._connection.commit()
+            self._iUncommitted = 0
+
+# ----------------------------------------------------------------------------------------------------------------------
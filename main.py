@@ -1,63 +1,307 @@
 # ----------------------------------------------------------------------------------------------------------------------
 from datetime import datetime
 
+import argparse
+import crawl_checkpoint as ccp
+import crawl_fused as cfu
+import crawl_journal as cj
+import crawl_manifest as cm
+import crawl_pipeline as cpl
+import crawl_tracing as ctr
 import crawler as crawler
 import data_upload as du
+import download_cache as dc
 import os
 import pandas as pd
+import site_archive as sa
 import utility as ut
 import webpage_downloader as wd
 import webpage_navigator as wn
+import work_queue as wq
 
 
 
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def main():
+def main(bPipeline=False, bTrace=False, dProfileSampleRate=0.0, queuePath=None, bQueueWorker=False, bResume=False,
+         archivePath=None, bFused=False, bKeepHtml=False, iBudgetPages=None, dBudgetMinutes=None):
     """
     Web crawler main function.
+        bPipeline: Boolean if crawling, writing and uploading should overlap in a streaming pipeline.
+        bTrace: Boolean if the per stage timings of all pages should be reported.
+        dProfileSampleRate: Share of pages parsed under cProfile; the aggregated profile is written to data/log.
+        queuePath: Path to the work queue shared with the crawler processes of other nodes; None crawls alone.
+        bQueueWorker: Boolean if this process only helps crawling the queue of another process, which downloads,
+                      merges and uploads.
+        bResume: Boolean if an interrupted crawl should be continued from its last checkpoint instead of downloading
+                 the webpage and crawling it from the start.
+        archivePath: Path to a tar, zip or WARC archive of the webpage, which is crawled instead of downloading the
+                     webpage; None downloads and crawls the mirror.
+        bFused: Boolean if the pages should be parsed in memory while the webpage is downloaded, without writing the
+                mirror to disk.
+        bKeepHtml: Boolean if the raw pages of a fused crawl should be archived to a WARC file in data/archive.
+        iBudgetPages: Maximum number of pages downloaded, the most valuable ones first; None downloads every page.
+        dBudgetMinutes: Time after which no further pages are downloaded; None downloads until done.
     """
 
     # Preparations
     scriptPath = ut.identifyScriptPath()
+    dictAdjustDataTypes = du.createDataTypeAdjustmentDict()
+    logDirPath = os.path.join(scriptPath, "data", "log", '')
+    ut.createDirIfNotExist(logDirPath)
+    journalFileName = "crawl_failures_{0}.jsonl".format(datetime.now().strftime("%Y_%m_%d"))
+    journal = cj.FailureJournal(os.path.join(logDirPath, journalFileName))
+
+    # Trace the stages of every page and profile a sample of the pages if requested, in every mode of the crawl.
+    tracer = None
+    if bTrace or dProfileSampleRate > 0.0:
+        tracer = ctr.CrawlTracer()
+        crawler.setProfileSampleRate(dProfileSampleRate)
 
     # Download entire webpage to local directory.
-    dirDownload = os.path.join(scriptPath, "data", "edeka24")
-    ut.createDirIfNotExist(dirDownload)
     url = "https://www.edeka24.de/"
-    wd.downloadWebPage(url=url, dirDownload=dirDownload)
+    dirDownload = os.path.join(scriptPath, "data", "edeka24")
+    dBudgetSeconds = dBudgetMinutes * 60.0 if dBudgetMinutes is not None else None
+    if bQueueWorker:
+        # The mirror is downloaded and enqueued by the coordinating process; only the pages are crawled, as soon as the
+        # coordinator has opened the run of today.
+        session = crawler.CrawlSession(tracer=tracer, journal=journal)
+        workQueue = wq.WorkQueue(queuePath)
+        wq.runWorker(workQueue, session, dirDownload, iWorkers=os.cpu_count(), dictAdjustDataTypes=dictAdjustDataTypes)
+        session.close()
+        wn.printCrawlerStatistics(session)
+        workQueue.printStatistics()
+        workQueue.close()
+        printTrace(tracer, logDirPath)
+        return 0
 
-    # Set file path in the singleton class.
-    outputDir = os.path.join(scriptPath, "data", "output")
-    ut.createDirIfNotExist(outputDir)
-    fileName = "product_info_{0}.csv".format(datetime.now().strftime("%Y_%m_%d"))
-    filePath = os.path.join(outputDir, fileName)
-    ut.checkAndWipeMaxStoredCSVFilesIfNeeded(scriptPath, fileName, outputDir, iMaxCount=300)
-    crawler.CsvHandler.instance().setFilePath(filePath)
+    # An interrupted crawl is resumed on the mirror and the file index it was started with, into its own files.
+    indexPath = os.path.join(scriptPath, "data", "helpers", "file_index.txt")
+    ut.createDirIfNotExist(os.path.dirname(indexPath))
+    checkpoint = ccp.CrawlCheckpoint(os.path.join(scriptPath, "data", "helpers", "crawl_checkpoint.json"))
+    resumed = None
+    if bResume:
+        lstFilePaths = wn.readFileIndex(indexPath, dirDownload)
+        resumed = checkpoint.load(lstFilePaths) if lstFilePaths is not None else None
+        if resumed is None:
+            print("No checkpoint to resume from, starting a new crawl.")
 
-    # Run the crawler by traversing through the downloaded webpage.
-    wn.crawlThroughSubDirs(dirDownload)
-    wn.printCrawlerStatistics()
+    if resumed is None:
+        if archivePath is None and not bFused:
+            # Pages unchanged since the previous download are requested conditionally and kept as they are. The
+            # download is seeded from the sitemaps and fetches product pages first, most recently changed first, so a
+            # download limited by a budget gets the most valuable pages.
+            ut.createDirIfNotExist(dirDownload)
+            cache = dc.DownloadCache(os.path.join(scriptPath, "data", "helpers", "download_cache.sqlite"))
+            lstDownloadedPaths = wd.downloadWebPage(url=url, dirDownload=dirDownload, iMaxPages=iBudgetPages,
+                                                    journal=journal, cache=cache, bPriority=True,
+                                                    dBudgetSeconds=dBudgetSeconds)
+            cache.close()
 
-    # Read in CSV as Pandas dataframe.
-    dataFrame = pd.read_csv(filePath, sep=',')
+        # Paths to the CSV file of today.
+        outputDir = os.path.join(scriptPath, "data", "output")
+        ut.createDirIfNotExist(outputDir)
+        fileName = "product_info_{0}.csv".format(datetime.now().strftime("%Y_%m_%d"))
+        filePath = os.path.join(outputDir, fileName)
+        ut.checkAndWipeMaxStoredCSVFilesIfNeeded(scriptPath, fileName, outputDir, iMaxCount=300)
+        iFirstPage, iResumeOffset = 0, None
+
+        # The download changed the mirror, so its file index is written anew; the crawl reads it instead of walking.
+        # A download limited by a budget leaves pages of earlier runs in the mirror which were neither fetched nor
+        # validated today, so only the pages of this download are indexed, like the fused crawl emits only those.
+        if archivePath is None and not bFused:
+            if iBudgetPages is None and dBudgetSeconds is None:
+                lstFilePaths = wn.writeFileIndex(dirDownload, indexPath)
+            else:
+                lstFilePaths = wn.writeFileIndex(dirDownload, indexPath, lstFilePaths=lstDownloadedPaths or [])
+    else:
+        filePath, iFirstPage, iResumeOffset = resumed
+        print("Resuming the crawl into {0} after {1} of {2} pages.".format(filePath, iFirstPage, len(lstFilePaths)))
+    parquetFilePath = os.path.splitext(filePath)[0] + ".parquet"
 
-    # Create the table in the database if not available yet
     dbName = "grocery"
     dataTableName = "edeka24"
-    logDirPath = os.path.join(scriptPath, "data", "log", '')
-    dictAdjustDataTypes = du.createDataTypeAdjustmentDict()
+
+    if archivePath is not None:
+        # Crawl the pages of the archive as they are streamed out of it, without unpacking it; every worker process
+        # reads its own part of the archive.
+        session = crawler.CrawlSession(tracer=tracer, journal=journal)
+        session.setFilePath(filePath)
+        session.setParquetFilePath(parquetFilePath, dictAdjustDataTypes)
+        sa.crawlArchiveParallel(archivePath, session, iWorkers=os.cpu_count())
+        session.close()
+        wn.printCrawlerStatistics(session)
+        printTrace(tracer, logDirPath)
+        uploadParquetFile(parquetFilePath, dictAdjustDataTypes, dbName, dataTableName, logDirPath)
+        return 0
+
+    if bFused:
+        # Parse the pages as they are downloaded; the raw pages are only kept in a WARC file if requested.
+        session = crawler.CrawlSession(tracer=tracer, journal=journal)
+        session.setFilePath(filePath)
+        session.setParquetFilePath(parquetFilePath, dictAdjustDataTypes)
+        archiver = None
+        if bKeepHtml:
+            archiveDirPath = os.path.join(scriptPath, "data", "archive")
+            ut.createDirIfNotExist(archiveDirPath)
+            archiveFileName = "edeka24_{0}.warc.gz".format(datetime.now().strftime("%Y_%m_%d"))
+            archiver = sa.WarcWriter(os.path.join(archiveDirPath, archiveFileName))
+        fusedCrawl = cfu.FusedCrawl(session, iWorkers=os.cpu_count(), archiver=archiver)
+        fusedCrawl.run(url, dirDownload, iMaxPages=iBudgetPages, journal=journal, bPriority=True,
+                       dBudgetSeconds=dBudgetSeconds)
+        if archiver is not None:
+            archiver.close()
+        session.close()
+        wn.printCrawlerStatistics(session)
+        fusedCrawl.printStatistics()
+        printTrace(tracer, logDirPath)
+        uploadParquetFile(parquetFilePath, dictAdjustDataTypes, dbName, dataTableName, logDirPath)
+        return 0
+
+    if queuePath is not None:
+        # Crawl the mirror in batches together with the processes started with --queue-worker on other nodes, then
+        # merge the parts of all batches into the files of today and close the run.
+        session = crawler.CrawlSession(tracer=tracer, journal=journal)
+        workQueue = wq.WorkQueue(queuePath)
+        workQueue.enqueue(dirDownload, lstFilePaths)
+        wq.runWorker(workQueue, session, dirDownload, iWorkers=os.cpu_count(), dictAdjustDataTypes=dictAdjustDataTypes)
+        session.close()
+        wn.printCrawlerStatistics(session)
+        workQueue.printStatistics()
+        try:
+            # Fails if a batch has been given up, so the partial table is not uploaded.
+            workQueue.mergeParts(filePath, parquetFilePath)
+        finally:
+            workQueue.closeRun()
+            workQueue.close()
+        printTrace(tracer, logDirPath)
+        uploadParquetFile(parquetFilePath, dictAdjustDataTypes, dbName, dataTableName, logDirPath)
+        return 0
+
+    # Open a crawl session writing to the CSV file of today and a typed Parquet file alongside, which is loaded for
+    # the upload; failed pages are appended to the journal of today.
+    session = crawler.CrawlSession(tracer=tracer, journal=journal)
+    session.setFilePath(filePath, iResumeOffset)
+    session.setParquetFilePath(parquetFilePath, dictAdjustDataTypes)
+
+    # Run the crawler by traversing through the downloaded webpage; the html files are parsed in a pool of processes.
+    # Files unchanged since the previous run are taken from the manifest instead of being parsed again. A checkpoint
+    # is saved every 1000 pages; it is removed once the crawl is complete.
+    manifestPath = os.path.join(scriptPath, "data", "helpers", "crawl_manifest.sqlite")
+    ut.createDirIfNotExist(os.path.dirname(manifestPath))
+    manifest = cm.CrawlManifest(manifestPath)
+
+    if bPipeline:
+        # Create the table in the database if not available yet, then crawl, write and upload in one streaming pass.
+        dataFrame = pd.DataFrame(columns=list(dictAdjustDataTypes.keys()))
+        du.createTable(dataFrame, dbName, dataTableName, logDirPath, dropTable=False, dictAdjustDataTypes=dictAdjustDataTypes)
+        uploader = du.RowUploader(dbName, dataTableName, dictAdjustDataTypes, logDirPath=logDirPath)
+        pipeline = cpl.CrawlPipeline(dirDownload, session, iWorkers=os.cpu_count(), manifest=manifest,
+                                     uploader=uploader, indexPath=indexPath)
+        pipeline.run()
+        session.close()
+        manifest.pruneUnseen()
+        manifest.close()
+        wn.printCrawlerStatistics(session)
+        manifest.printStatistics()
+        pipeline.printStatistics()
+        printTrace(tracer, logDirPath)
+        return 0
+
+    wn.crawlThroughSubDirsParallel(dirDownload, session, iWorkers=os.cpu_count(), iMaxTasksPerChild=200, manifest=manifest,
+                                   indexPath=indexPath, checkpoint=checkpoint, iFirstPage=iFirstPage)
+    session.close()
+    checkpoint.remove()
+    manifest.pruneUnseen()
+    manifest.close()
+    wn.printCrawlerStatistics(session)
+    manifest.printStatistics()
+    printTrace(tracer, logDirPath)
+    uploadParquetFile(parquetFilePath, dictAdjustDataTypes, dbName, dataTableName, logDirPath)
+
+    return 0
+
+# ----------------------------------------------------------------------------------------------------------------------
+def uploadParquetFile(parquetFilePath, dictAdjustDataTypes, dbName, dataTableName, logDirPath):
+    """
+    Uploads the typed Parquet file of the crawl to the data warehouse, creating the table if not available yet.
+        parquetFilePath: Path to the Parquet file.
+        dictAdjustDataTypes: Dictionary of column name and SQL data type, see data_upload.createDataTypeAdjustmentDict().
+        dbName: Name of the database.
+        dataTableName: Name of the table.
+        logDirPath: Directory of the upload logs.
+    """
+    # Read in the typed Parquet file as Pandas dataframe.
+    dataFrame = pd.read_parquet(parquetFilePath)
+
+    # Create the table in the database if not available yet
     du.createTable(dataFrame, dbName, dataTableName, logDirPath, dropTable=False, dictAdjustDataTypes=dictAdjustDataTypes)
 
     # Upload data frame to data warehouse.
     lstJsonArrayIndices = [dataFrame.columns.get_loc(key) for key, value in dictAdjustDataTypes.items() if value == "JSON"]
     du.uploadDataFrame(dataFrame, dbName, dataTableName, lstJsonArrayIndices, logDirPath=logDirPath)
 
-    return 0
+# ----------------------------------------------------------------------------------------------------------------------
+def printTrace(tracer, logDirPath):
+    """
+    Prints the stage report of the tracer and dumps the aggregated profile of the sampled pages, if any.
+        tracer: CrawlTracer of the crawl or None if tracing is off.
+        logDirPath: Directory the profile is written to.
+    """
+    if tracer is None:
+        return
+    tracer.printReport(bHistograms=True)
+    ut.createDirIfNotExist(logDirPath)
+    profileFileName = "crawl_profile_{0}.pstats".format(datetime.now().strftime("%Y_%m_%d"))
+    tracer.dumpProfile(os.path.join(logDirPath, profileFileName))
 
 # ----------------------------------------------------------------------------------------------------------------------
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Web crawler for gathering data from online grocery stores.")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="crawl, write and upload in one streaming pipeline instead of one stage after another")
+    parser.add_argument("--trace", action="store_true",
+                        help="report latency percentiles and histograms per stage and the slowest pages")
+    parser.add_argument("--profile-sample-rate", type=float, default=0.0, metavar="RATE",
+                        help="share of pages parsed under cProfile (implies --trace), e.g. 0.01")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="crawl in batches from a work queue shared with other nodes, e.g. data/helpers/queue.sqlite")
+    parser.add_argument("--queue-worker", action="store_true",
+                        help="only help crawling the queue of the node started with --queue, on a shared mirror")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted crawl from its last checkpoint instead of starting over")
+    parser.add_argument("--archive", metavar="PATH",
+                        help="crawl a tar, zip or WARC archive of the webpage instead of downloading it")
+    parser.add_argument("--fused", action="store_true",
+                        help="parse the pages in memory while downloading, without writing the mirror to disk")
+    parser.add_argument("--keep-html", action="store_true",
+                        help="archive the raw pages of a --fused crawl to data/archive/edeka24_<date>.warc.gz")
+    parser.add_argument("--budget-pages", type=int, metavar="N",
+                        help="download at most N pages, product pages and recently changed pages first")
+    parser.add_argument("--budget-minutes", type=float, metavar="M",
+                        help="stop requesting further pages after M minutes, product pages and recently changed first")
+    arguments = parser.parse_args()
+    if arguments.queue_worker and arguments.queue is None:
+        parser.error("--queue-worker requires --queue")
+    if arguments.pipeline and arguments.queue is not None:
+        parser.error("--pipeline cannot be combined with --queue")
+    if arguments.resume and (arguments.pipeline or arguments.queue is not None):
+        parser.error("--resume cannot be combined with --pipeline or --queue")
+    if arguments.archive is not None and (arguments.pipeline or arguments.queue is not None or arguments.resume):
+        parser.error("--archive cannot be combined with --pipeline, --queue or --resume")
+    if arguments.fused and (arguments.pipeline or arguments.queue is not None or arguments.resume or
+                            arguments.archive is not None):
+        parser.error("--fused cannot be combined with --pipeline, --queue, --resume or --archive")
+    if arguments.keep_html and not arguments.fused:
+        parser.error("--keep-html requires --fused")
+    if (arguments.budget_pages is not None or arguments.budget_minutes is not None) and \
+            (arguments.queue_worker or arguments.resume or arguments.archive is not None):
+        parser.error("--budget-pages and --budget-minutes apply to the download, which is skipped with "
+                     "--queue-worker, --resume and --archive")
+    main(bPipeline=arguments.pipeline, bTrace=arguments.trace, dProfileSampleRate=arguments.profile_sample_rate,
+         queuePath=arguments.queue, bQueueWorker=arguments.queue_worker, bResume=arguments.resume,
+         archivePath=arguments.archive, bFused=arguments.fused, bKeepHtml=arguments.keep_html,
+         iBudgetPages=arguments.budget_pages, dBudgetMinutes=arguments.budget_minutes)
 
 # ----------------------------------------------------------------------------------------------------------------------
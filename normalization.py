@@ -0,0 +1,115 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import sys
+
+# ----------------------------------------------------------------------------------------------------------------------
+# All characters str.split() splits at, as class for the regular expressions of Arrow (RE2), whose \s is ASCII only.
+_sWhitespaceClass = "".join("\\x{{{0:x}}}".format(iChar) for iChar in range(0x3001) if chr(iChar).isspace())
+
+# Characters removed from a value before testing it for a number: unit letters, quotes, comparison signs, underscores
+# and all whitespace.
+_sRemovePattern = '[gk"><=_' + _sWhitespaceClass + ']'
+
+# Numbers Arrow casts to exactly the same float as float() does.
+_sAsciiNumberPattern = r"^[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?$"
+
+# Further strings float() accepts: numbers with other decimal digits than 0-9 as well as infinity and nan.
+_sOtherNumberPattern = r"^[+-]?(?:(?:\p{Nd}+\.?\p{Nd}*|\.\p{Nd}+)(?:[eE][+-]?\p{Nd}+)?|(?i:inf|infinity|nan))$"
+
+# ----------------------------------------------------------------------------------------------------------------------
+def normalizeValue(value):
+    """
+    Returns the normalized value of a single crawled value: strings which are numbers after removing units, quotes
+    and comparison signs (with decimal comma) become floats, all other strings only lose their quotes. Values which
+    are no strings are returned unchanged. Reference for normalizeRecords(), see checkNormalizationParity().
+        value: Crawled value.
+    """
+    if not isinstance(value, str):
+        return value
+    val = value.replace(',', '.').replace('g', '').replace('k', '').replace('"', '') \
+        .replace('>', '').replace('<', '').replace('=', '').replace('_', '')
+    val = "".join(val.split())
+    try:
+        return float(val)
+    except ValueError:
+        return value.replace('"', '')
+
+# ----------------------------------------------------------------------------------------------------------------------
+def normalizeValues(values):
+    """
+    Returns the list of normalized values, with the same result as normalizeValue() for every value but converting
+    all strings at once with the string kernels of Arrow.
+        values: List of crawled values.
+    """
+    maskString = np.array([isinstance(value, str) for value in values], dtype=bool)
+    if not maskString.any():
+        return list(values)
+
+    arrayValues = np.array(values, dtype=object)
+    strings = pa.array(arrayValues[maskString].tolist(), type=pa.string())
+    cleaned = pc.replace_substring_regex(pc.replace_substring(strings, ",", "."), _sRemovePattern, "")
+    maskNumber = pc.match_substring_regex(cleaned, _sAsciiNumberPattern)
+    maskOtherNumber = pc.and_not(pc.match_substring_regex(cleaned, _sOtherNumberPattern), maskNumber)
+
+    arrayStrings = np.array(pc.replace_substring(strings, '"', "").to_pylist(), dtype=object)
+    arrayMaskNumber = maskNumber.to_numpy(zero_copy_only=False)
+    if arrayMaskNumber.any():
+        arrayStrings[arrayMaskNumber] = pc.cast(pc.filter(cleaned, maskNumber), pa.float64()).to_pylist()
+    # Rare numbers Arrow cannot cast are left to float().
+    for iIndex in np.flatnonzero(maskOtherNumber.to_numpy(zero_copy_only=False)):
+        arrayStrings[iIndex] = float(cleaned[iIndex].as_py())
+
+    arrayValues[maskString] = arrayStrings
+    return arrayValues.tolist()
+
+# ----------------------------------------------------------------------------------------------------------------------
+def normalizeRecords(lstRecords):
+    """
+    Normalizes a batch of crawled records, all columns in one go, see normalizeValues().
+    Returns the list of new normalized records; the crawled records are not changed.
+        lstRecords: List of data dictionaries, all with the same keys.
+    """
+    if not lstRecords:
+        return []
+    lstColumns = list(lstRecords[0].keys())
+    iRecords = len(lstRecords)
+    lstValues = normalizeValues([dictRecord[column] for column in lstColumns for dictRecord in lstRecords])
+    lstNormalizedColumns = [lstValues[iColumn * iRecords:(iColumn + 1) * iRecords] for iColumn in range(len(lstColumns))]
+    return [dict(zip(lstColumns, tplValues)) for tplValues in zip(*lstNormalizedColumns)]
+
+# ----------------------------------------------------------------------------------------------------------------------
+def checkNormalizationParity(lstRecords):
+    """
+    Normalizes the records with normalizeRecords() and with normalizeValue() per value and prints every value which
+    differs in value or type. Returns the list of (record index, key, batch value, reference value) of all differences.
+        lstRecords: List of data dictionaries, all with the same keys.
+    """
+    lstMismatches = []
+    for iRecord, (dictBatch, dictRecord) in enumerate(zip(normalizeRecords(lstRecords), lstRecords)):
+        for key, value in dictRecord.items():
+            reference = normalizeValue(value)
+            batchValue = dictBatch[key]
+            bSame = type(batchValue) is type(reference) and \
+                (batchValue == reference or (isinstance(reference, float) and reference != reference
+                                             and batchValue != batchValue))
+            if not bSame:
+                print("Mismatch in record {0}, {1}: {2!r} != {3!r}".format(iRecord, key, batchValue, reference))
+                lstMismatches.append((iRecord, key, batchValue, reference))
+    print("{0} differing values in {1} records.".format(len(lstMismatches), len(lstRecords)))
+    return lstMismatches
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == '__main__':
+    import crawler
+
+    # Check the normalization of the records crawled from the specified html files.
+    lstRecords = []
+    for filePath in sys.argv[1:]:
+        result = crawler.parseProductInfo(filePath)
+        if result.dictData is not None:
+            lstRecords.append(result.dictData)
+    checkNormalizationParity(lstRecords)
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,108 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from functools import lru_cache
+
+import numpy as np
+import re
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Nutrient columns in the order of the array returned by extractNutrients().
+lstNutrientColumns = ["calorific_value_in_kJ", "calorific_value_in_kcal", "fat_in_g", "hereof_saturated_fatty_acids_in_g",
+                      "carbohydrates_in_g", "hereof_sugar_in_g", "protein_in_g", "salt_in_g"]
+
+_iKj, _iKcal, _iFat, _iSaturated, _iCarbohydrates, _iSugar, _iProtein, _iSalt = range(len(lstNutrientColumns))
+
+# Marks an energy row, whose unit decides between the kJ and the kcal column.
+_ENERGY = -1
+
+# Words of the lower case row labels and their column, checked in this order, so a label like "Kohlenhydrate, davon
+# Zucker" goes to the sugar column. Only whole words count: "ungesättigte Fettsäuren", "Fettsäuren" or
+# "Zuckeralkohole" are no column of their own and must not end up in the saturated, fat or sugar column.
+_lstLabelWords = [({"gesättigte", "gesättigten", "gesättigt", "gesaettigte", "gesaettigten"}, _iSaturated),
+                  ({"zucker"}, _iSugar),
+                  ({"kohlenhydrate", "kohlenhydraten", "kohlenhydrat"}, _iCarbohydrates),
+                  ({"fett"}, _iFat),
+                  ({"eiweiß", "eiweiss", "protein"}, _iProtein),
+                  ({"salz"}, _iSalt),
+                  ({"brennwert", "energie"}, _ENERGY)]
+
+# Words of a row label.
+_regexWords = re.compile(r"[^\W\d_]+")
+
+# First number of a cell, with German thousands separators and decimal comma.
+_regexNumber = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Numbers of an energy cell together with their unit, e.g. "1046 kJ / 250 kcal".
+_regexEnergy = re.compile(r"(\d+(?:[.,]\d+)*)\s*(kj|kcal)")
+
+# ----------------------------------------------------------------------------------------------------------------------
+@lru_cache(maxsize=1024)
+def labelColumn(sLabel):
+    """
+    Returns the index of the nutrient column of a row label, _ENERGY for an energy row or None for rows which are
+    not stored (e.g. fibre). The few distinct labels repeat on every page, so the results are cached.
+        sLabel: Text of the th cells of the row.
+    """
+    setWords = set(_regexWords.findall(sLabel.lower()))
+    for setLabelWords, iColumn in _lstLabelWords:
+        if not setWords.isdisjoint(setLabelWords):
+            return iColumn
+    return None
+
+# ----------------------------------------------------------------------------------------------------------------------
+def parseNumber(sText):
+    """
+    Returns the first number of a cell like "3,5 g", "<0,01 g" or "1.046 kJ" as float or NaN if there is none.
+        sText: Text of the cell.
+    """
+    match = _regexNumber.search(sText)
+    if match is None:
+        return np.nan
+    return float(match.group().replace('.', '').replace(',', '.'))
+
+# ----------------------------------------------------------------------------------------------------------------------
+def extractNutrients(nutrientRows):
+    """
+    Maps the rows of a nutrient table to the nutrient columns by their labels, so missing, extra or reordered rows
+    do not shift any value. Energy rows go to the kJ or kcal column by the unit of their value; an energy value
+    without unit goes to the first of both which is still empty.
+    Returns a float array with one entry per column of lstNutrientColumns, NaN for nutrients not in the table.
+        nutrientRows: Tuple of all table rows, each one a tuple of its th texts and its td texts.
+    """
+    arrayNutrients = np.full(len(lstNutrientColumns), np.nan)
+    for lstThTexts, lstTdTexts in nutrientRows:
+        if not lstThTexts or not lstTdTexts:
+            continue
+        iColumn = labelColumn(" ".join(lstThTexts))
+        if iColumn is None:
+            continue
+        sValue = lstTdTexts[0]
+        if iColumn != _ENERGY:
+            if np.isnan(arrayNutrients[iColumn]):
+                arrayNutrients[iColumn] = parseNumber(sValue)
+            continue
+
+        lstEnergies = _regexEnergy.findall(sValue.lower())
+        if not lstEnergies:
+            iColumn = _iKj if np.isnan(arrayNutrients[_iKj]) else _iKcal
+            arrayNutrients[iColumn] = parseNumber(sValue)
+        for sNumber, sUnit in lstEnergies:
+            arrayNutrients[_iKj if sUnit == "kj" else _iKcal] = parseNumber(sNumber)
+    return arrayNutrients
+
+# ----------------------------------------------------------------------------------------------------------------------
+def cacheInfo():
+    """
+    Returns the statistics of the label cache of this process (hits, misses, maxsize, currsize).
+    """
+    return labelColumn.cache_info()
+
+# ----------------------------------------------------------------------------------------------------------------------
+def printStatistics():
+    info = cacheInfo()
+    iLookups = info.hits + info.misses
+    if iLookups == 0:
+        return
+    print("Nutrient label cache: {0} hits, {1} misses, hit rate {2:.1%}, {3} distinct labels"
+          .format(info.hits, info.misses, info.hits / iLookups, info.currsize))
+
+# ----------------------------------------------------------------------------------------------------------------------
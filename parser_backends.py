@@ -0,0 +1,227 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from bs4 import BeautifulSoup
+from lxml import etree
+from product_extractor import ProductPage, ProductPageExtractor
+
+import sys
+
+# ----------------------------------------------------------------------------------------------------------------------
+class BeautifulSoupBackend:
+    """
+    Parser backend building a complete BeautifulSoup tree (on top of lxml) and walking it once with the
+    ProductPageExtractor. Slowest backend, but the reference for all others and the fallback if they fail.
+    """
+
+    name = "bs4"
+
+    def __init__(self):
+        self._extractor = ProductPageExtractor()
+
+    def extract(self, contents):
+        """
+        Returns the ProductPage record of the specified page or None if it is no product page.
+            contents: Raw bytes of the page (bytes or mmap object).
+        """
+        # BeautifulSoup would read() an mmap object from its current position, so slice it instead.
+        return self._extractor.extract(BeautifulSoup(contents[:], "lxml"))
+
+# ----------------------------------------------------------------------------------------------------------------------
+class LxmlBackend:
+    """
+    Parser backend feeding the page to an lxml pull parser and reading the fields with precompiled XPath expressions.
+    Optional fields are only looked for up to the end of the product block (the element of the description), so the
+    parser stops as soon as the block and the required fields have been closed, also if an optional field is missing,
+    and the rest of the page (footer, scripts, recommendations) is never parsed. Elements are matched at their start
+    tag to keep the first match in document order, like soup.find() does.
+    """
+
+    name = "lxml"
+
+    # Selectors as (tag name, class string, field name), see ProductPageExtractor.
+    _lstSelectors = ProductPageExtractor._lstSelectors
+
+    # Size of the chunks fed to the pull parser; it bounds how much is parsed after the last field has been found.
+    _iChunkSize = 16384
+
+    # Field of the product block, which holds the optional fields of the product.
+    _sBlockField = "description"
+
+    # Fields every product page has, which are looked for after the product block as well.
+    _setRequiredFields = {"description", "breadcrumb"}
+
+    _xpathFirstH1 = etree.XPath("descendant::h1[1]")
+    _xpathListItems = etree.XPath("descendant::li")
+    _xpathFirstLink = etree.XPath("descendant::a[1]")
+    _xpathRows = etree.XPath("descendant::tr")
+    _xpathHeaderCells = etree.XPath("descendant::th")
+    _xpathDataCells = etree.XPath("descendant::td")
+    # Text nodes of an element without the contents of script, style and template elements, which BeautifulSoup's
+    # .text leaves out as well.
+    _xpathText = etree.XPath("descendant-or-self::text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+
+    def __init__(self):
+        self._dictSelectorsByName = {}
+        for sName, sClass, sField in self._lstSelectors:
+            self._dictSelectorsByName.setdefault(sName, []).append((sClass, sField))
+        self._tplTags = tuple(self._dictSelectorsByName.keys())
+
+    def findElements(self, contents):
+        """
+        Parses the page until all selectors have been matched, or the product block and the required fields, and
+        returns a dictionary of field name and first matching element.
+            contents: Raw bytes of the page (bytes or mmap object).
+        """
+        parser = etree.HTMLPullParser(events=("start", "end"), tag=self._tplTags, encoding=detectEncoding(contents))
+        dictElements = {}
+        setOpen = set()
+        iRemaining = len(self._lstSelectors)
+        bPastBlock = False
+
+        for iOffset in range(0, len(contents), self._iChunkSize):
+            parser.feed(contents[iOffset:iOffset + self._iChunkSize])
+            for sEvent, element in parser.read_events():
+                if sEvent == "end":
+                    if element in setOpen:
+                        setOpen.discard(element)
+                        bPastBlock = bPastBlock or element is dictElements.get(self._sBlockField)
+                    continue
+                for sClass, sField in self._dictSelectorsByName[element.tag]:
+                    if sField not in dictElements and (not bPastBlock or sField in self._setRequiredFields) and \
+                            matchesClass(element.get("class"), sClass):
+                        dictElements[sField] = element
+                        setOpen.add(element)
+                        iRemaining -= 1
+            if not setOpen and (iRemaining == 0 or
+                                (bPastBlock and self._setRequiredFields.issubset(dictElements.keys()))):
+                return dictElements
+
+        parser.close()
+        return dictElements
+
+    def extract(self, contents):
+        """
+        Returns the ProductPage record of the specified page or None if it is no product page.
+            contents: Raw bytes of the page (bytes or mmap object).
+        """
+        dictElements = self.findElements(contents)
+        description = dictElements.get("description")
+        if description is None:
+            return None
+
+        lstH1 = self._xpathFirstH1(description)
+        breadcrumb = dictElements.get("breadcrumb")
+        image = dictElements.get("image")
+        nutrientTable = dictElements.get("nutrientTable")
+        return ProductPage(title=self._text(lstH1[0]) if lstH1 else None,
+                           breadcrumb=[self._text(self._xpathFirstLink(li)[0]) for li in self._xpathListItems(breadcrumb)]
+                                      if breadcrumb is not None else None,
+                           image=str(image.attrib["src"]) if image is not None else None,
+                           price=self._fieldText(dictElements, "price"),
+                           priceNote=self._fieldText(dictElements, "priceNote"),
+                           productNote=self._fieldText(dictElements, "productNote"),
+                           feature=self._fieldText(dictElements, "feature"),
+                           nutrientsPerGramm=self._fieldText(dictElements, "nutrientsPerGramm"),
+                           nutrientRows=self._tableRows(nutrientTable) if nutrientTable is not None else None)
+
+    def _text(self, element):
+        return "".join(self._xpathText(element))
+
+    def _fieldText(self, dictElements, sField):
+        element = dictElements.get(sField)
+        return self._text(element) if element is not None else None
+
+    def _tableRows(self, table):
+        return tuple((tuple(self._text(th) for th in self._xpathHeaderCells(tr)),
+                      tuple(self._text(td) for td in self._xpathDataCells(tr)))
+                     for tr in self._xpathRows(table))
+
+# ----------------------------------------------------------------------------------------------------------------------
+class FallbackBackend:
+    """
+    Parser backend trying the primary backend first and falling back to the BeautifulSoup backend if the primary one
+    cannot parse the page at all.
+    """
+
+    def __init__(self, primary):
+        self._primary = primary
+        self._fallback = BeautifulSoupBackend()
+        self.name = primary.name
+
+    def extract(self, contents):
+        """
+        Returns the ProductPage record of the specified page or None if it is no product page.
+            contents: Raw bytes of the page (bytes or mmap object).
+        """
+        try:
+            return self._primary.extract(contents)
+        except etree.LxmlError:
+            return self._fallback.extract(contents)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def matchesClass(sClassAttribute, sClass):
+    """
+    Returns True if the class attribute matches the class the same way BeautifulSoup's find(class_=sClass) does.
+        sClassAttribute: Raw class attribute of the element or None.
+        sClass: Class string, may contain several space separated classes.
+    """
+    if not sClassAttribute:
+        return False
+    lstClasses = sClassAttribute.split()
+    return sClass in lstClasses or " ".join(lstClasses) == sClass
+
+# ----------------------------------------------------------------------------------------------------------------------
+def detectEncoding(contents):
+    """
+    Returns the encoding the lxml parser should use for the page or None to let lxml detect it. lxml only detects
+    byte order marks and charset declarations and would assume Latin-1 otherwise, whereas BeautifulSoup falls back
+    to UTF-8 - which is what pages without declaration are written in.
+        contents: Raw bytes of the page (bytes or mmap object).
+    """
+    head = contents[:2048].lower()
+    if head.startswith((b"\xef\xbb\xbf", b"\xff\xfe", b"\xfe\xff")) or b"charset" in head:
+        return None
+    return "utf-8"
+
+# ----------------------------------------------------------------------------------------------------------------------
+def getParserBackend(sName="lxml"):
+    """
+    Returns a new parser backend of the specified name.
+        sName: "lxml" for the lxml backend with BeautifulSoup fallback, "bs4" for the BeautifulSoup backend.
+    """
+    if sName == "lxml":
+        return FallbackBackend(LxmlBackend())
+    if sName == "bs4":
+        return BeautifulSoupBackend()
+    raise ValueError("Unknown parser backend '{0}'.".format(sName))
+
+# ----------------------------------------------------------------------------------------------------------------------
+def checkBackendParity(lstFilePaths):
+    """
+    Runs the specified pages through the lxml and the BeautifulSoup backend and prints every page whose records
+    differ. Returns the list of file paths with differing records.
+        lstFilePaths: List of html file paths.
+    """
+    lxmlBackend = LxmlBackend()
+    bs4Backend = BeautifulSoupBackend()
+    lstMismatches = []
+    for filePath in lstFilePaths:
+        with open(filePath, 'rb') as fileHandler:
+            contents = fileHandler.read()
+        lstResults = []
+        for backend in [lxmlBackend, bs4Backend]:
+            try:
+                lstResults.append(backend.extract(contents))
+            except Exception:
+                # The backends raise different exception types for broken pages; raising at all is what counts.
+                lstResults.append("exception")
+        if lstResults[0] != lstResults[1]:
+            print("Mismatch: {0}\n    lxml: {1}\n    bs4:  {2}".format(filePath, lstResults[0], lstResults[1]))
+            lstMismatches.append(filePath)
+    print("{0} of {1} pages differ.".format(len(lstMismatches), len(lstFilePaths)))
+    return lstMismatches
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == '__main__':
+    checkBackendParity(sys.argv[1:])
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,190 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from bs4 import BeautifulSoup, Tag
+from collections import namedtuple
+
+import sys
+import time
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Raw fields of one product page. Texts are unprocessed, None marks a missing element.
+#     title: Text of the first h1 within the detail description.
+#     breadcrumb: List of the link texts of all breadcrumb items.
+#     image: Source attribute of the zoom image.
+#     price: Text of the price div.
+#     priceNote: Text of the price note paragraph.
+#     productNote: Text of the product note paragraph.
+#     feature: Text of the characteristics list.
+#     nutrientsPerGramm: Text of the span naming the reference quantity of the nutrient table.
+#     nutrientRows: Tuple of all rows of the nutrient table, each one a tuple of its th texts and its td texts.
+ProductPage = namedtuple("ProductPage", ["title", "breadcrumb", "image", "price", "priceNote", "productNote", "feature",
+                                         "nutrientsPerGramm", "nutrientRows"])
+
+# ----------------------------------------------------------------------------------------------------------------------
+def hasClass(tag, sClass):
+    """
+    Returns True if the tag matches the class the same way BeautifulSoup's find(class_=sClass) does, i.e. either one
+    of its classes or its whole class attribute equals the specified class string.
+        tag: BeautifulSoup tag.
+        sClass: Class string, may contain several space separated classes.
+    """
+    lstClasses = tag.get("class")
+    if not lstClasses:
+        return False
+    return sClass in lstClasses or " ".join(lstClasses) == sClass
+
+# ----------------------------------------------------------------------------------------------------------------------
+def getTableRows(table):
+    """
+    Returns the rows of the specified table as a tuple of (th texts, td texts) tuples.
+        table: BeautifulSoup tag of the table.
+    """
+    return tuple((tuple(th.text for th in tr.find_all("th")), tuple(td.text for td in tr.find_all("td")))
+                 for tr in table.find_all("tr"))
+
+# ----------------------------------------------------------------------------------------------------------------------
+class ProductPageExtractor:
+    """
+    Collects all fields needed by the crawler in one single walk through the document instead of one soup.find()
+    call per field (and selector repetition). The first match of every selector in document order is kept, exactly
+    like soup.find() does.
+    """
+
+    # Selectors as (tag name, class string, field name).
+    _lstSelectors = [("div", "col-sm-6 detail-description", "description"),
+                     ("div", "breadcrumb", "breadcrumb"),
+                     ("img", "img-responsive jq-img-zoom", "image"),
+                     ("div", "price", "price"),
+                     ("p", "price-note", "priceNote"),
+                     ("p", "product-note", "productNote"),
+                     ("ul", "characteristics clearfix", "feature"),
+                     ("span", "listTitlePerGramm", "nutrientsPerGramm"),
+                     ("table", "table-striped", "nutrientTable")]
+
+    def __init__(self):
+        self._dictSelectorsByName = {}
+        for sName, sClass, sField in self._lstSelectors:
+            self._dictSelectorsByName.setdefault(sName, []).append((sClass, sField))
+
+    def findElements(self, soup):
+        """
+        Walks the document once and returns a dictionary of field name and first matching tag.
+            soup: BeautifulSoup object of the page.
+        """
+        dictElements = {}
+        iRemaining = len(self._lstSelectors)
+        for element in soup.descendants:
+            if not isinstance(element, Tag):
+                continue
+            lstSelectors = self._dictSelectorsByName.get(element.name)
+            if lstSelectors is None:
+                continue
+            for sClass, sField in lstSelectors:
+                if sField not in dictElements and hasClass(element, sClass):
+                    dictElements[sField] = element
+                    iRemaining -= 1
+            if iRemaining == 0:
+                break
+        return dictElements
+
+    def extract(self, soup):
+        """
+        Returns the ProductPage record of the specified document or None if it is no product page.
+            soup: BeautifulSoup object of the page.
+        """
+        dictElements = self.findElements(soup)
+        description = dictElements.get("description")
+        if description is None:
+            return None
+
+        h1 = description.h1
+        breadcrumb = dictElements.get("breadcrumb")
+        image = dictElements.get("image")
+        nutrientTable = dictElements.get("nutrientTable")
+        return ProductPage(title=h1.text if h1 is not None else None,
+                           breadcrumb=[li.a.text for li in breadcrumb.find_all("li")] if breadcrumb is not None else None,
+                           image=image["src"] if image is not None else None,
+                           price=self._text(dictElements, "price"),
+                           priceNote=self._text(dictElements, "priceNote"),
+                           productNote=self._text(dictElements, "productNote"),
+                           feature=self._text(dictElements, "feature"),
+                           nutrientsPerGramm=self._text(dictElements, "nutrientsPerGramm"),
+                           nutrientRows=getTableRows(nutrientTable) if nutrientTable is not None else None)
+
+    def _text(self, dictElements, sField):
+        element = dictElements.get(sField)
+        return element.text if element is not None else None
+
+# ----------------------------------------------------------------------------------------------------------------------
+def extractWithRepeatedFinds(soup):
+    """
+    Returns the ProductPage record of the specified document by the former soup.find() calls, one tree walk per call.
+    Only used as reference for compareExtractionTimings().
+        soup: BeautifulSoup object of the page.
+    """
+    if not soup.find("div", class_="col-sm-6 detail-description"):
+        return None
+    h1 = soup.find("div", class_="col-sm-6 detail-description").h1
+    breadcrumb = soup.find("div", class_="breadcrumb")
+    image = None
+    if soup.find("img", class_="img-responsive jq-img-zoom"):
+        image = soup.find("img", class_="img-responsive jq-img-zoom")["src"]
+    priceNote = None
+    if soup.find("p", class_="price-note"):
+        priceNote = soup.find("p", class_="price-note").text
+    productNote = None
+    if soup.find("p", class_="product-note"):
+        productNote = soup.find("p", class_="product-note").text
+    characteristics = soup.find("ul", class_="characteristics clearfix")
+    nutrientsPerGramm = None
+    if soup.find("span", class_="listTitlePerGramm"):
+        nutrientsPerGramm = soup.find("span", class_="listTitlePerGramm").text
+    price = soup.find("div", class_="price")
+    nutrientTable = soup.find("table", class_="table-striped")
+    return ProductPage(title=h1.text if h1 is not None else None,
+                       breadcrumb=[li.a.text for li in breadcrumb.find_all("li")] if breadcrumb is not None else None,
+                       image=image,
+                       price=price.text if price is not None else None,
+                       priceNote=priceNote,
+                       productNote=productNote,
+                       feature=characteristics.text if characteristics is not None else None,
+                       nutrientsPerGramm=nutrientsPerGramm,
+                       nutrientRows=getTableRows(nutrientTable) if nutrientTable is not None else None)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def compareExtractionTimings(lstFilePaths, iRepetitions=5):
+    """
+    Prints the per page extraction time of ProductPageExtractor and of the repeated soup.find() calls and checks
+    that both return the same record. Returns the list of (file path, seconds single pass, seconds repeated finds).
+        lstFilePaths: List of html file paths.
+        iRepetitions: Number of repetitions per page; the best time is reported.
+    """
+    extractor = ProductPageExtractor()
+    lstTimings = []
+    for filePath in lstFilePaths:
+        with open(filePath, 'rb') as fileHandler:
+            soup = BeautifulSoup(fileHandler.read(), "lxml")
+
+        dSinglePass = dRepeated = float("inf")
+        for i in range(iRepetitions):
+            beginTime = time.perf_counter()
+            page = extractor.extract(soup)
+            dSinglePass = min(dSinglePass, time.perf_counter() - beginTime)
+            beginTime = time.perf_counter()
+            pageReference = extractWithRepeatedFinds(soup)
+            dRepeated = min(dRepeated, time.perf_counter() - beginTime)
+
+        if page != pageReference:
+            print("Mismatch: {0}".format(filePath))
+        print("{0:9.3f} ms {1:9.3f} ms {2}".format(dSinglePass * 1000, dRepeated * 1000, filePath))
+        lstTimings.append((filePath, dSinglePass, dRepeated))
+
+    dTotalSinglePass = sum(timing[1] for timing in lstTimings)
+    dTotalRepeated = sum(timing[2] for timing in lstTimings)
+    print("Total single pass: {0:.3f} ms, repeated finds: {1:.3f} ms".format(dTotalSinglePass * 1000, dTotalRepeated * 1000))
+    return lstTimings
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == '__main__':
+    compareExtractionTimings(sys.argv[1:])
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,109 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from collections import namedtuple
+from functools import lru_cache
+from itertools import groupby
+
+import re
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Result of parseQuantity().
+#     sNumber: Text before the unit, e.g. "1 " of "1 kg = 3,98 €", or "" if the text does not begin with a number.
+#     sUnit: Text from the first unit character on, e.g. "kg = 3,98 €", or "" if there is none.
+#     dValue: Numeric value of sNumber (decimal comma allowed) or None if sNumber is no plain number.
+#     sNormalizedUnit: Lower case leading unit of sUnit with its common spellings unified, e.g. "kg", "ml", "stück".
+Quantity = namedtuple("Quantity", ["sNumber", "sUnit", "dValue", "sNormalizedUnit"])
+
+# Characters which start the unit of a quantity, matched against the lower case text.
+_regexUnitStart = re.compile(r"[a-zäöü€%$]")
+
+# Leading unit word of the unit text.
+_regexUnitWord = re.compile(r"[a-zäöüß€%$]+")
+
+# Groups of a product name: letters, digits or a single other character.
+_regexNameGroups = re.compile(r"[^\W\d_]+|\d+|.", re.DOTALL)
+
+# Spellings of units mapped to their normalized form.
+_dictUnitAliases = {"gr": "g", "gramm": "g", "kilogramm": "kg", "ltr": "l", "liter": "l", "milliliter": "ml",
+                    "stk": "stück", "st": "stück"}
+
+_emptyQuantity = Quantity("", "", None, "")
+
+# ----------------------------------------------------------------------------------------------------------------------
+@lru_cache(maxsize=4096)
+def parseQuantity(sText):
+    """
+    Splits a quantity like "250 g", "100 ml" or "1 kg = 3,98 €" into number and unit. The same few hundred quantities
+    repeat across thousands of products, so the results are cached (see cacheInfo()).
+    Returns the Quantity of the text; both parts are empty if the text does not begin with a digit.
+        sText: Text of the quantity.
+    """
+    sLower = sText.lower().strip()
+    if not sLower or sLower[0] not in "0123456789":
+        return _emptyQuantity
+
+    match = _regexUnitStart.search(sLower)
+    if match is None:
+        sNumber, sUnit = sText, ""
+    else:
+        # The index refers to the stripped text, exactly like the former CsvHandler.splitStringByDimensionIfPossible().
+        sNumber, sUnit = sText[:match.start()], sText[match.start():]
+
+    try:
+        dValue = float(sNumber.replace(',', '.'))
+    except ValueError:
+        dValue = None
+    matchUnit = _regexUnitWord.match(sUnit.lower())
+    sNormalizedUnit = ""
+    if matchUnit is not None:
+        sNormalizedUnit = _dictUnitAliases.get(matchUnit.group(), matchUnit.group())
+    return Quantity(sNumber, sUnit, dValue, sNormalizedUnit)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def splitNameGroups(sName):
+    """
+    Splits a product name into groups of letters, groups of digits and single other characters, e.g.
+    "Milch 3,5% 1l" into ["Milch", " ", "3", ",", "5", "%", " ", "1", "l"], to access the package size at its end.
+    Like the former utility.seperateStringNumber(), a name of one character has no groups.
+        sName: Product name; raises a ValueError if it is empty.
+    """
+    if not sName:
+        raise ValueError("Empty product name.")
+    if len(sName) == 1:
+        return []
+    lstGroups = _regexNameGroups.findall(sName)
+    # Numbers like "½" or "²" are no decimal digits and end up in groups of their own or among the letters; group
+    # those rare names by character class instead.
+    if any(sGroup.isalnum() and not sGroup.isalpha() and not sGroup.isdecimal() for sGroup in lstGroups):
+        lstGroups = []
+        for sClass, iterChars in groupby(sName, key=_characterClass):
+            if sClass is None:
+                lstGroups.extend(iterChars)
+            else:
+                lstGroups.append("".join(iterChars))
+    return lstGroups
+
+def _characterClass(sChar):
+    if sChar.isalpha():
+        return "alpha"
+    if sChar.isnumeric():
+        return "numeric"
+    return None
+
+# ----------------------------------------------------------------------------------------------------------------------
+def cacheInfo():
+    """
+    Returns the statistics of the quantity cache of this process (hits, misses, maxsize, currsize).
+    Every worker process has its own cache.
+    """
+    return parseQuantity.cache_info()
+
+# ----------------------------------------------------------------------------------------------------------------------
+def printStatistics():
+    info = cacheInfo()
+    iLookups = info.hits + info.misses
+    if iLookups == 0:
+        return
+    print("Quantity cache: {0} hits, {1} misses, hit rate {2:.1%}, {3} of {4} entries used"
+          .format(info.hits, info.misses, info.hits / iLookups, info.currsize, info.maxsize))
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,260 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from datetime import datetime
+
+import csv
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import time
+
+# ----------------------------------------------------------------------------------------------------------------------
+class CsvSink:
+    """
+    Writes rows to a CSV file which is opened once for the whole crawl. Rows are buffered and written in batches,
+    either when iMaxBufferedRows rows are buffered or when the last flush is older than dMaxBufferedSeconds.
+    Quoting is left to the csv module.
+    """
+
+    def __init__(self, filePath, lstColumns, iMaxBufferedRows=1000, dMaxBufferedSeconds=5.0, iResumeOffset=None):
+        """
+        Creates (or truncates) the CSV file and writes the header.
+            filePath: Path to the CSV file.
+            lstColumns: List of column names; defines the header and the order of the values of every row.
+            iMaxBufferedRows: Number of buffered rows which triggers a flush.
+            dMaxBufferedSeconds: Time since the last flush which triggers a flush.
+            iResumeOffset: Size returned by sync() to cut the existing file to and append to, instead of creating it.
+        """
+        self._filePath = filePath
+        self._lstColumns = lstColumns
+        self._iMaxBufferedRows = iMaxBufferedRows
+        self._dMaxBufferedSeconds = dMaxBufferedSeconds
+        self._lstBuffer = []
+        self._dLastFlush = time.monotonic()
+        if iResumeOffset is not None:
+            # Rows written after the checkpoint are dropped; they are crawled again.
+            os.truncate(filePath, iResumeOffset)
+            self._fileHandler = open(filePath, 'a', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._fileHandler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            return
+        self._fileHandler = open(filePath, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._fileHandler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        self._writer.writerow(lstColumns)
+
+    def filePath(self):
+        """
+        Returns the CSV file path.
+        """
+        return self._filePath
+
+    def columns(self):
+        """
+        Returns the list of column names.
+        """
+        return self._lstColumns
+
+    def convertRow(self, dictData):
+        """
+        Returns the row of values to buffer. Raises a KeyError if a column is missing.
+            dictData: Dictionary which contains all the data.
+        """
+        return [dictData[column] for column in self._lstColumns]
+
+    def writeRow(self, lstRow):
+        """
+        Buffers one row returned by convertRow().
+            lstRow: List of values in column order.
+        """
+        self._lstBuffer.append(lstRow)
+
+    def write(self, dictData):
+        """
+        Buffers one row. Raises a KeyError if a column is missing, in which case nothing is buffered.
+            dictData: Dictionary which contains all the data.
+        """
+        self.writeRow(self.convertRow(dictData))
+
+    def flushIfDue(self):
+        """
+        Flushes the buffered rows if the size or the time limit has been reached.
+        """
+        if len(self._lstBuffer) >= self._iMaxBufferedRows or \
+                time.monotonic() - self._dLastFlush >= self._dMaxBufferedSeconds:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered rows to the file.
+        """
+        self._writer.writerows(self._lstBuffer)
+        self._fileHandler.flush()
+        self._lstBuffer.clear()
+        self._dLastFlush = time.monotonic()
+
+    def sync(self):
+        """
+        Flushes all buffered rows and forces them to disk.
+        Returns the size of the file in bytes, which marks the end of the rows written so far.
+        """
+        self.flush()
+        os.fsync(self._fileHandler.fileno())
+        return os.fstat(self._fileHandler.fileno()).st_size
+
+    def close(self):
+        """
+        Flushes all buffered rows and closes the file.
+        """
+        if self._fileHandler.closed:
+            return
+        self.flush()
+        self._fileHandler.close()
+
+# ----------------------------------------------------------------------------------------------------------------------
+class ParquetSink:
+    """
+    Writes rows to a typed Parquet file, one row group per flush, with the same buffering policy as CsvSink.
+    The schema follows the SQL data types used for the upload, so the file can be loaded without any text parsing:
+    TEXT and JSON columns are strings, DECIMAL columns are doubles and TIMESTAMP columns are timestamps. Values which
+    do not fit the type of their column (e.g. "272 kJ" in a DECIMAL column) are written as null.
+    """
+
+    def __init__(self, filePath, dictAdjustDataTypes, iMaxBufferedRows=10000, dMaxBufferedSeconds=60.0):
+        """
+        Creates (or overwrites) the Parquet file.
+            filePath: Path to the Parquet file.
+            dictAdjustDataTypes: Dictionary of column name and SQL data type, see
+                                 data_upload.createDataTypeAdjustmentDict().
+            iMaxBufferedRows: Number of buffered rows which triggers a flush.
+            dMaxBufferedSeconds: Time since the last flush which triggers a flush.
+        """
+        self._filePath = filePath
+        self._schema = createArrowSchema(dictAdjustDataTypes)
+        self._lstConverters = [_dictConverters[str(field.type)] for field in self._schema]
+        self._iMaxBufferedRows = iMaxBufferedRows
+        self._dMaxBufferedSeconds = dMaxBufferedSeconds
+        self._lstBuffer = []
+        self._dLastFlush = time.monotonic()
+        self._writer = pq.ParquetWriter(filePath, self._schema)
+
+    def filePath(self):
+        """
+        Returns the Parquet file path.
+        """
+        return self._filePath
+
+    def columns(self):
+        """
+        Returns the list of column names.
+        """
+        return self._schema.names
+
+    def convertRow(self, dictData):
+        """
+        Returns the row of values converted to the types of their columns. Raises a KeyError if a column is missing.
+            dictData: Dictionary which contains all the data.
+        """
+        return [converter(dictData[field.name]) for field, converter in zip(self._schema, self._lstConverters)]
+
+    def writeRow(self, lstRow):
+        """
+        Buffers one row returned by convertRow().
+            lstRow: List of values in column order.
+        """
+        self._lstBuffer.append(lstRow)
+
+    def write(self, dictData):
+        """
+        Buffers one row. Raises a KeyError if a column is missing, in which case nothing is buffered.
+            dictData: Dictionary which contains all the data.
+        """
+        self.writeRow(self.convertRow(dictData))
+
+    def writeCsvFile(self, csvFilePath):
+        """
+        Writes all rows of a CSV file written by CsvSink, e.g. to rebuild the Parquet file of a resumed crawl. The
+        values are converted from their text to the types of their columns like the crawled values by convertRow().
+            csvFilePath: Path to the CSV file.
+        """
+        with open(csvFilePath, 'r', newline='', encoding='utf-8') as fileHandler:
+            reader = csv.reader(fileHandler)
+            lstHeader = next(reader)
+            lstIndices = [lstHeader.index(field.name) for field in self._schema]
+            lstConverters = [_dictCsvConverters[str(field.type)] for field in self._schema]
+            for lstTexts in reader:
+                self._lstBuffer.append([converter(lstTexts[iIndex])
+                                        for iIndex, converter in zip(lstIndices, lstConverters)])
+                if len(self._lstBuffer) >= self._iMaxBufferedRows:
+                    self.flush()
+        self.flush()
+
+    def flushIfDue(self):
+        """
+        Flushes the buffered rows if the size or the time limit has been reached.
+        """
+        if len(self._lstBuffer) >= self._iMaxBufferedRows or \
+                time.monotonic() - self._dLastFlush >= self._dMaxBufferedSeconds:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered rows to the file as one row group.
+        """
+        if self._lstBuffer:
+            lstColumns = [list(column) for column in zip(*self._lstBuffer)]
+            self._writer.write_table(pa.Table.from_arrays(lstColumns, schema=self._schema))
+            self._lstBuffer.clear()
+        self._dLastFlush = time.monotonic()
+
+    def close(self):
+        """
+        Flushes all buffered rows and closes the file.
+        """
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+
+# ----------------------------------------------------------------------------------------------------------------------
+def createArrowSchema(dictAdjustDataTypes):
+    """
+    Returns the Arrow schema of the specified SQL data types.
+        dictAdjustDataTypes: Dictionary of column name and SQL data type, see data_upload.createDataTypeAdjustmentDict().
+    """
+    lstFields = []
+    for sColumn, sDataType in dictAdjustDataTypes.items():
+        if sDataType.startswith("DECIMAL"):
+            lstFields.append(pa.field(sColumn, pa.float64()))
+        elif sDataType == "TIMESTAMP":
+            lstFields.append(pa.field(sColumn, pa.timestamp("s")))
+        else:
+            lstFields.append(pa.field(sColumn, pa.string()))
+    return pa.schema(lstFields)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _toString(value):
+    if value is None or value == "":
+        return None
+    return value if isinstance(value, str) else str(value)
+
+def _toDouble(value):
+    return value if isinstance(value, float) else None
+
+def _toTimestamp(value):
+    if isinstance(value, str) and value != "":
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return None
+
+# Converter of a crawled value to the Arrow type of its column.
+_dictConverters = {"string": _toString, "double": _toDouble, "timestamp[s]": _toTimestamp}
+
+def _csvToDouble(sText):
+    # Crawled strings which float() accepts have been normalized to floats, so only those were floats.
+    try:
+        return float(sText)
+    except ValueError:
+        return None
+
+# Converter of the CSV text of a value to the Arrow type of its column.
+_dictCsvConverters = {"string": _toString, "double": _csvToDouble, "timestamp[s]": _toTimestamp}
+
+# ----------------------------------------------------------------------------------------------------------------------
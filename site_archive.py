@@ -0,0 +1,384 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from datetime import datetime, timezone
+
+import crawler
+import gzip
+import multiprocessing
+import os
+import queue
+import tarfile
+import threading
+import traceback
+import uuid
+import webpage_downloader as wd
+import webpage_navigator as wn
+import zipfile
+import zlib
+
+# ----------------------------------------------------------------------------------------------------------------------
+def archiveFormat(archivePath):
+    """
+    Returns the format of a site archive, "zip", "tar" (also compressed) or "warc" (also gzip compressed).
+    Raises a ValueError for other files.
+        archivePath: Path to the archive.
+    """
+    sLowerPath = archivePath.lower()
+    if sLowerPath.endswith((".warc", ".warc.gz")):
+        return "warc"
+    if zipfile.is_zipfile(archivePath):
+        return "zip"
+    if tarfile.is_tarfile(archivePath):
+        return "tar"
+    raise ValueError("Unknown archive format of '{0}'.".format(archivePath))
+
+# ----------------------------------------------------------------------------------------------------------------------
+def hasIndex(archivePath):
+    """
+    Returns True if the pages of the archive can be read without reading the archive up to them, i.e. for zip and
+    uncompressed tar archives, which can be split into parts cheaply (see iterArchivePages()).
+        archivePath: Path to the tar, zip or WARC archive.
+    """
+    sFormat = archiveFormat(archivePath)
+    if sFormat != "tar":
+        return sFormat == "zip"
+    try:
+        with tarfile.open(archivePath, "r:"):
+            return True
+    except tarfile.ReadError:
+        return False
+
+# ----------------------------------------------------------------------------------------------------------------------
+def iterArchivePages(archivePath, iPart=0, iParts=1, lstIncludePatterns=None, lstExcludePatterns=None):
+    """
+    Streams the html pages of a site archive, decompressing one member after another, without unpacking the archive.
+    The archive can be split into iParts parts, which are read independently, e.g. by parallel workers; the pages
+    are assigned to the parts round-robin in archive order. Zip and plain tar archives are only read where the
+    pages of the part are. Compressed tar archives and WARC files have no index, so the reader of every part
+    decompresses the whole archive and skips the pages of the other parts; they are better read in one part (see
+    hasIndex()).
+    Yields tuples of the path of the page within the archive and its raw bytes.
+        archivePath: Path to the tar, zip or WARC archive.
+        iPart: Number of the part to read, from 0 to iParts - 1.
+        iParts: Number of parts the archive is split into.
+        lstIncludePatterns: Name patterns of the pages to yield; None uses webpage_navigator.lstDefaultIncludePatterns.
+        lstExcludePatterns: Name patterns of the pages to skip; None uses webpage_navigator.lstDefaultExcludePatterns.
+    """
+    regexInclude = wn.compilePatterns(wn.lstDefaultIncludePatterns if lstIncludePatterns is None else lstIncludePatterns)
+    regexExclude = wn.compilePatterns(wn.lstDefaultExcludePatterns if lstExcludePatterns is None else lstExcludePatterns)
+
+    def isPage(sMemberPath):
+        sName = sMemberPath.rsplit("/", 1)[-1]
+        return regexInclude is not None and regexInclude.match(sName) is not None and \
+            (regexExclude is None or regexExclude.match(sName) is None)
+
+    sFormat = archiveFormat(archivePath)
+    iPage = -1
+    if sFormat == "zip":
+        with zipfile.ZipFile(archivePath) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not isPage(info.filename):
+                    continue
+                iPage += 1
+                if iPage % iParts == iPart:
+                    yield info.filename, archive.read(info)
+    elif sFormat == "tar":
+        # Iterating reads the member headers only; the data of skipped members is passed over (seeked in plain tar).
+        with tarfile.open(archivePath, "r:*") as archive:
+            for member in archive:
+                if not member.isfile() or not isPage(member.name):
+                    continue
+                iPage += 1
+                if iPage % iParts == iPart:
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        for sMemberPath, readPayload in _iterWarcResponses(archivePath):
+            if not isPage(sMemberPath):
+                continue
+            iPage += 1
+            if iPage % iParts == iPart:
+                contents = readPayload()
+                if contents is not None:
+                    yield sMemberPath, contents
+
+# ----------------------------------------------------------------------------------------------------------------------
+def iterParsedChunks(archivePath, iPart=0, iParts=1, iChunkSize=64):
+    """
+    Parses the pages of one part of a site archive one after another (see iterArchivePages()).
+    Yields lists of the ParseResults of up to iChunkSize pages; the file path of every result is the path of the
+    archive joined with the path of the page within the archive.
+        archivePath: Path to the tar, zip or WARC archive.
+        iPart: Number of the part to parse, from 0 to iParts - 1.
+        iParts: Number of parts the archive is split into.
+        iChunkSize: Maximum number of results per list.
+    """
+    lstResults = []
+    for sMemberPath, contents in iterArchivePages(archivePath, iPart, iParts):
+        lstResults.append(crawler.parseProductInfo(os.path.join(archivePath, sMemberPath), contents=contents))
+        if len(lstResults) >= iChunkSize:
+            yield lstResults
+            lstResults = []
+    if lstResults:
+        yield lstResults
+
+# ----------------------------------------------------------------------------------------------------------------------
+def crawlArchiveParallel(archivePath, session, iWorkers=None, iChunkSize=64, iMaxPendingChunks=4):
+    """
+    Parses the pages of a site archive in worker processes and merges the results while the archive is still being
+    read. Zip and plain tar archives (see hasIndex()) are split into parts, each worker reading its own part (see
+    iterArchivePages()). Compressed tar archives and WARC files are decompressed only once, by a reader process which
+    hands the raw pages over to the workers in chunks of iChunkSize pages, round-robin in archive order. Every worker
+    hands its results over in chunks of iChunkSize pages through a queue of its own, which holds at most
+    iMaxPendingChunks chunks (as do the queues of raw pages); a process whose queue is full waits, so the memory does
+    not grow with the size of the archive. The chunks are merged round-robin over the parts (first chunk of every
+    part, second chunk of every part, ...), so the output does not depend on the scheduling of the workers.
+        archivePath: Path to the tar, zip or WARC archive.
+        session: CrawlSession the product information is written to.
+        iWorkers: Number of worker processes, one per part of the archive; None uses the number of CPUs.
+        iChunkSize: Number of pages whose results are handed over at once.
+        iMaxPendingChunks: Maximum number of chunks per worker parsed but not merged yet (or read but not parsed).
+    """
+    iParts = iWorkers if iWorkers is not None else os.cpu_count()
+    lstQueues = [multiprocessing.Queue(maxsize=iMaxPendingChunks) for _ in range(iParts)]
+    reader = None
+    if hasIndex(archivePath):
+        lstProcesses = [multiprocessing.Process(target=_parsePartToQueue, daemon=True,
+                                                args=(archivePath, iPart, iParts, iChunkSize, lstQueues[iPart],
+                                                      crawler.workerInitArgs()))
+                        for iPart in range(iParts)]
+    else:
+        lstPageQueues = [multiprocessing.Queue(maxsize=iMaxPendingChunks) for _ in range(iParts)]
+        reader = multiprocessing.Process(target=_readChunksToQueues, daemon=True,
+                                         args=(archivePath, iChunkSize, lstPageQueues))
+        lstProcesses = [multiprocessing.Process(target=_parseQueueToQueue, daemon=True,
+                                                args=(archivePath, lstPageQueues[iPart], lstQueues[iPart],
+                                                      crawler.workerInitArgs()))
+                        for iPart in range(iParts)]
+    lstAllProcesses = lstProcesses + ([reader] if reader is not None else [])
+    for process in lstAllProcesses:
+        process.start()
+    try:
+        lstActiveParts = list(range(iParts))
+        while lstActiveParts:
+            for iPart in list(lstActiveParts):
+                lstResults = _nextChunk(archivePath, iPart, lstQueues[iPart], lstProcesses[iPart], reader)
+                if lstResults is None:
+                    lstActiveParts.remove(iPart)
+                    continue
+                for result in lstResults:
+                    crawler.mergeProductInfo(result, session)
+    finally:
+        for process in lstAllProcesses:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+def _parsePartToQueue(archivePath, iPart, iParts, iChunkSize, queueResults, tplInitArgs):
+    # Target of the worker processes: puts the chunks of results of the part, then None when the part is done, or
+    # the traceback as string if parsing fails.
+    try:
+        crawler.initWorker(*tplInitArgs)
+        for lstResults in iterParsedChunks(archivePath, iPart, iParts, iChunkSize):
+            queueResults.put(lstResults)
+        queueResults.put(None)
+    except BaseException:
+        queueResults.put(traceback.format_exc())
+
+def _readChunksToQueues(archivePath, iChunkSize, lstPageQueues):
+    # Target of the reader process: puts the chunks of (path within the archive, raw bytes) of the pages round-robin
+    # into the queues of the workers, then None into every queue, or the traceback as string if reading fails.
+    try:
+        lstPages = []
+        iChunk = 0
+        for tplPage in iterArchivePages(archivePath):
+            lstPages.append(tplPage)
+            if len(lstPages) >= iChunkSize:
+                lstPageQueues[iChunk % len(lstPageQueues)].put(lstPages)
+                iChunk += 1
+                lstPages = []
+        if lstPages:
+            lstPageQueues[iChunk % len(lstPageQueues)].put(lstPages)
+        for queuePages in lstPageQueues:
+            queuePages.put(None)
+    except BaseException:
+        sTraceback = traceback.format_exc()
+        for queuePages in lstPageQueues:
+            queuePages.put(sTraceback)
+
+def _parseQueueToQueue(archivePath, queuePages, queueResults, tplInitArgs):
+    # Target of the worker processes of an archive read by a reader process: parses the chunks of raw pages and puts
+    # the chunks of results, then None or the traceback as string like _parsePartToQueue().
+    try:
+        crawler.initWorker(*tplInitArgs)
+        while True:
+            item = queuePages.get()
+            if item is None or isinstance(item, str):
+                queueResults.put(item)
+                return
+            queueResults.put([crawler.parseProductInfo(os.path.join(archivePath, sMemberPath), contents=contents)
+                              for sMemberPath, contents in item])
+    except BaseException:
+        queueResults.put(traceback.format_exc())
+
+def _nextChunk(archivePath, iPart, queueResults, process, reader=None):
+    # Returns the next chunk of results of the part or None once the part is done. Raises a RuntimeError if the worker
+    # (or the reader process) failed or died, e.g. killed for lack of memory, instead of waiting for it forever.
+    while True:
+        try:
+            item = queueResults.get(timeout=1.0)
+        except queue.Empty:
+            if reader is not None and not reader.is_alive() and reader.exitcode != 0:
+                raise RuntimeError("Reader of '{0}' exited with code {1}.".format(archivePath, reader.exitcode))
+            if process.is_alive():
+                continue
+            try:
+                item = queueResults.get(timeout=1.0)
+            except queue.Empty:
+                raise RuntimeError("Worker of part {0} of '{1}' exited with code {2}.".format(
+                    iPart, archivePath, process.exitcode)) from None
+        if isinstance(item, str):
+            raise RuntimeError("Parsing part {0} of '{1}' failed:\n{2}".format(iPart, archivePath, item))
+        return item
+
+# ----------------------------------------------------------------------------------------------------------------------
+class WarcWriter:
+    """
+    Archives html pages as response records of a gzip compressed WARC file, which can be crawled again with
+    crawlArchiveParallel(). Every record is a gzip member of its own, as usual for WARC files. The records are
+    compressed and written by a background thread, so adding a page only blocks while iMaxPending pages are waiting
+    to be written.
+    """
+
+    def __init__(self, archivePath, iMaxPending=256):
+        """
+        Creates (or truncates) the archive.
+            archivePath: Path to the WARC file, e.g. pages.warc.gz.
+            iMaxPending: Maximum number of pages waiting to be written.
+        """
+        self._archivePath = archivePath
+        self._fileHandler = open(archivePath, 'wb')
+        self._queuePages = queue.Queue(maxsize=iMaxPending)
+        self._lstErrors = []
+        self._iPages = 0
+        self._thread = threading.Thread(target=self._write, name="warc", daemon=True)
+        self._thread.start()
+
+    def archivePath(self):
+        """
+        Returns the path to the WARC file.
+        """
+        return self._archivePath
+
+    def countOfPages(self):
+        """
+        Returns the number of pages written so far.
+        """
+        return self._iPages
+
+    def add(self, sUrl, contents):
+        """
+        Queues a page to be archived.
+            sUrl: Url of the page.
+            contents: Raw bytes of the page.
+        """
+        if self._lstErrors:
+            raise self._lstErrors[0]
+        self._queuePages.put((sUrl, contents))
+
+    def close(self):
+        """
+        Writes the pending pages and closes the archive. Re-raises the error of the background thread, if any.
+        """
+        self._queuePages.put(None)
+        self._thread.join()
+        self._fileHandler.close()
+        if self._lstErrors:
+            raise self._lstErrors[0]
+
+    def _write(self):
+        while True:
+            item = self._queuePages.get()
+            if item is None:
+                return
+            if self._lstErrors:
+                continue
+            try:
+                self._fileHandler.write(gzip.compress(_warcRecord(*item), compresslevel=6))
+                self._iPages += 1
+            except Exception as exception:
+                # Kept running to drain the queue, so add() never blocks forever.
+                self._lstErrors.append(exception)
+
+def _warcRecord(sUrl, contents):
+    httpBlock = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: " + str(len(contents)).encode() + \
+        b"\r\n\r\n" + contents
+    sHeaders = ("WARC/1.0\r\nWARC-Type: response\r\nWARC-Record-ID: <urn:uuid:{0}>\r\nWARC-Date: {1}\r\n"
+                "WARC-Target-URI: {2}\r\nContent-Type: application/http; msgtype=response\r\n"
+                "Content-Length: {3}\r\n\r\n").format(
+        uuid.uuid4(), datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"), sUrl, len(httpBlock))
+    return sHeaders.encode("utf-8") + httpBlock + b"\r\n\r\n"
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _iterWarcResponses(archivePath):
+    # Yields the mirror path of every response record and a function reading its html payload, which returns None
+    # for other payloads. Payloads which are not read are skipped. Compressed WARC files are gzip streams of one
+    # member per record, which gzip reads as one stream.
+    with open(archivePath, "rb") as rawHandler:
+        bCompressed = rawHandler.read(2) == b"\x1f\x8b"
+    fileHandler = gzip.open(archivePath, "rb") if bCompressed else open(archivePath, "rb")
+    with fileHandler:
+        while True:
+            sLine = fileHandler.readline()
+            if not sLine:
+                return
+            if not sLine.strip():
+                continue
+            if not sLine.startswith(b"WARC/"):
+                raise ValueError("Invalid WARC record in '{0}'.".format(archivePath))
+            dictHeaders = _readHeaders(fileHandler)
+            iLength = int(dictHeaders.get("content-length", "0"))
+            iEnd = fileHandler.tell() + iLength
+            sTargetUri = dictHeaders.get("warc-target-uri", "")
+            if dictHeaders.get("warc-type") == "response" and sTargetUri:
+                yield wd.mirrorPath(sTargetUri), lambda: _readHttpPayload(fileHandler, iEnd)
+            if fileHandler.tell() < iEnd:
+                fileHandler.seek(iEnd)
+
+def _readHeaders(fileHandler):
+    dictHeaders = {}
+    for sLine in iter(fileHandler.readline, b""):
+        if not sLine.strip():
+            break
+        sName, _, sValue = sLine.decode("latin-1").partition(":")
+        dictHeaders[sName.strip().lower()] = sValue.strip()
+    return dictHeaders
+
+def _readHttpPayload(fileHandler, iEnd):
+    sStatusLine = fileHandler.readline()
+    dictHeaders = _readHeaders(fileHandler)
+    contents = fileHandler.read(iEnd - fileHandler.tell())
+    lstStatus = sStatusLine.split()
+    if len(lstStatus) < 2 or lstStatus[1] != b"200" or "html" not in dictHeaders.get("content-type", "html"):
+        return None
+    if dictHeaders.get("transfer-encoding", "").lower() == "chunked":
+        contents = _dechunk(contents)
+    sEncoding = dictHeaders.get("content-encoding", "").lower()
+    if sEncoding in ("gzip", "x-gzip"):
+        contents = gzip.decompress(contents)
+    elif sEncoding == "deflate":
+        contents = zlib.decompress(contents)
+    elif sEncoding not in ("", "identity"):
+        return None
+    return contents
+
+def _dechunk(contents):
+    lstChunks = []
+    iPosition = 0
+    while True:
+        iLineEnd = contents.index(b"\r\n", iPosition)
+        iSize = int(contents[iPosition:iLineEnd].split(b";")[0], 16)
+        if iSize == 0:
+            return b"".join(lstChunks)
+        lstChunks.append(contents[iLineEnd + 2:iLineEnd + 2 + iSize])
+        iPosition = iLineEnd + 2 + iSize + 2
+
+# ----------------------------------------------------------------------------------------------------------------------
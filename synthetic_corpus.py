@@ -0,0 +1,191 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from html import escape
+
+import argparse
+import os
+import random
+import utility as ut
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Categories of the synthetic shop as (category, sub category, list of (product name, package size)).
+_lstCategories = [
+    ("Lebensmittel", "Milch", [("Weihenstephan Frische Vollmilch 3,5%", "1l"), ("Kerrygold Original Irische Butter", "250 g"),
+                               ("Müller Milchreis Klassik", "200g"), ("Bärenmarke Die Ergiebige Kondensmilch 7,5%", "340 g"),
+                               ("Landliebe Landjoghurt Erdbeere", "150 g"), ("Alpro Haferdrink Original", "1 l")]),
+    ("Lebensmittel", "Kaffee", [("Jacobs Krönung Classic gemahlen", "500g"), ("Dallmayr Prodomo Ganze Bohne", "1 kg"),
+                                ("Tchibo Feine Milde Kaffeepads", "36 Stück"), ("Lavazza Espresso Italiano", "250 g")]),
+    ("Lebensmittel", "Konserven", [("Hengstenberg Knax Gurken", "670 g"), ("Bonduelle Goldmais", "3 x 150 g"),
+                                   ("Erasco Linsen-Eintopf mit Würstchen", "800 g"), ("Mutti Polpa Tomaten", "400g")]),
+    ("Getraenke", "Saft", [("Hohes C Orange 100% Saft", "1,5 l"), ("Granini Trinkgenuss Multivitamin", "1 l"),
+                           ("Valensina Frühstücks-Orange", "0,75 l"), ("Albi Apfel Direktsaft", "1l")]),
+    ("Getraenke", "Wasser", [("Gerolsteiner Sprudel", "0,75 l"), ("Volvic Naturelle", "1,5l")]),
+    ("Suesswaren", "Schokolade", [("Ritter Sport Alpenmilch", "100 g"), ("Milka Alpenmilch Schokolade", "100g"),
+                                  ("Lindt Excellence 70% Cacao", "100 g"), ("Kinder Riegel 10er", "210 g")]),
+]
+
+# Characteristics of the characteristics list.
+_lstFeatures = ["laktosefrei", "bio", "vegan", "glutenfrei", "ohne Zuckerzusatz", "regional", "Fairtrade"]
+
+# Reference quantities of the nutrient table, as written on the shop.
+_lstNutrientReferences = ["Nährwerte je 100 g:", "Nährwerte je 100 ml (unzubereitet):", "Nährwerte pro 100 g (zubereitet):",
+                          "Nährwerte je 100g:"]
+
+# Variants of a product page; every page draws each one with the given probability.
+#     noImage: Page without zoom image.
+#     noPriceNote: Page without price note, e.g. for single items.
+#     noProductNote: Page without product note.
+#     noFeature: Page without characteristics list.
+#     noNutrients: Page without nutrient table and reference quantity (non-food items).
+#     shortNutrients: Nutrient table with fewer than 8 rows.
+#     noPrice: Page without price, which makes the crawler fail on it (counts as exception).
+_dictVariantProbabilities = {"noImage": 0.05, "noPriceNote": 0.1, "noProductNote": 0.1, "noFeature": 0.3,
+                             "noNutrients": 0.1, "shortNutrients": 0.05, "noPrice": 0.01}
+
+# ----------------------------------------------------------------------------------------------------------------------
+def generateCorpus(dirPath, iProductPages=1000, iOtherPages=200, iSeed=0, iFillerBytes=20000):
+    """
+    Generates a synthetic mirror of the edeka24 webpage with the markup the crawler expects, so the crawler can be
+    measured without downloading the live site. The pages are laid out like a pywebcopy download below
+    dirPath/www.edeka24.de. The same seed always produces the same corpus.
+    Returns the list of all generated file paths.
+        dirPath: Directory the mirror is written to; it is wiped first.
+        iProductPages: Number of product pages.
+        iOtherPages: Number of non-product pages (category lists, info pages).
+        iSeed: Seed of the random generator.
+        iFillerBytes: Approximate size of the navigation, recommendation and script markup of every page.
+    """
+    random.seed(iSeed)
+    ut.createDirIfNotExist(dirPath, removeIfExists=True)
+    siteDirPath = os.path.join(dirPath, "www.edeka24.de")
+    lstFilePaths = [_writePage(os.path.join(siteDirPath, "index.html"), _otherPage("Startseite", iFillerBytes))]
+
+    for iPage in range(iProductPages):
+        sCategory, sSubCategory, lstProducts = random.choice(_lstCategories)
+        sName, sPackageSize = random.choice(lstProducts)
+        fileName = "{0}-{1}.html".format(_slug(sName), iPage)
+        filePath = os.path.join(siteDirPath, sCategory, sSubCategory, fileName)
+        lstFilePaths.append(_writePage(filePath, productPage(sCategory, sSubCategory, sName, sPackageSize, iFillerBytes)))
+
+    for iPage in range(iOtherPages):
+        sCategory, sSubCategory, lstProducts = random.choice(_lstCategories)
+        filePath = os.path.join(siteDirPath, sCategory, sSubCategory, "liste-{0}.html".format(iPage))
+        lstFilePaths.append(_writePage(filePath, _otherPage(sSubCategory, iFillerBytes)))
+    return lstFilePaths
+
+# ----------------------------------------------------------------------------------------------------------------------
+def productPage(sCategory, sSubCategory, sName, sPackageSize, iFillerBytes=20000):
+    """
+    Returns the HTML of one product page with randomly drawn prices, nutrients and variants.
+        sCategory: Category of the breadcrumb.
+        sSubCategory: Sub category of the breadcrumb.
+        sName: Product name without package size.
+        sPackageSize: Package size appended to the product name.
+        iFillerBytes: Approximate size of the navigation, recommendation and script markup.
+    """
+    setVariants = {sVariant for sVariant, dProbability in _dictVariantProbabilities.items() if random.random() < dProbability}
+    dPrice = round(random.uniform(0.29, 39.99), 2)
+    lstParts = [_header(sName, iFillerBytes // 2),
+                '<div class="breadcrumb"><ul><li><a href="../../index.html">Startseite</a></li>'
+                '<li><a href="../index.html">{0}</a></li><li><a href="index.html">{1}</a></li></ul></div>\n'
+                .format(escape(sCategory), escape(sSubCategory)),
+                '<div class="row">\n']
+    if "noImage" not in setVariants:
+        lstParts.append('<div class="col-sm-6"><img class="img-responsive jq-img-zoom" src="../../img/{0}.jpg"></div>\n'
+                        .format(_slug(sName)))
+    lstParts.append('<div class="col-sm-6 detail-description">\n<h1>\n{0} {1}\n</h1>\n'.format(escape(sName),
+                                                                                             escape(sPackageSize)))
+    if "noPrice" not in setVariants:
+        lstParts.append('<div class="price">{0} €</div>\n'.format(_germanNumber(dPrice, 2, bThousands=True)))
+    if "noPriceNote" not in setVariants:
+        sQuantity, dFactor = random.choice([("1 kg", 4.0), ("1 l", 1.0), ("100 g", 0.4), ("1 Stück", 0.5)])
+        lstParts.append('<p class="price-note">{0} = {1} €</p>\n'.format(sQuantity, _germanNumber(dPrice * dFactor, 2)))
+    if "noProductNote" not in setVariants:
+        lstParts.append('<p class="product-note">inkl. MwSt. zzgl. Versand</p>\n')
+    if "noFeature" not in setVariants:
+        lstFeatures = random.sample(_lstFeatures, random.randint(1, 3))
+        lstParts.append('<ul class="characteristics clearfix">{0}</ul>\n'
+                        .format("".join("<li>{0}</li>".format(sFeature) for sFeature in lstFeatures)))
+    if "noNutrients" not in setVariants:
+        lstParts.append('<span class="listTitlePerGramm">{0}</span>\n'.format(random.choice(_lstNutrientReferences)))
+        lstParts.append(_nutrientTable("shortNutrients" in setVariants))
+    lstParts.append('<div class="description-text"><p>{0}</p></div>\n</div></div>\n'.format(
+        escape(sName) + " - " + " ".join(random.choice(_lstFeatures) for i in range(40))))
+    lstParts.append(_footer(iFillerBytes // 2))
+    return "".join(lstParts)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _nutrientTable(bShort):
+    dKcal = random.uniform(20, 550)
+    lstRows = [("Brennwert", "{0} kJ".format(round(dKcal * 4.184))),
+               ("Brennwert", "{0} kcal".format(round(dKcal))),
+               ("Fett", "{0} g".format(_germanNumber(random.uniform(0, 40), 1))),
+               ("davon gesättigte Fettsäuren", "{0} g".format(_germanNumber(random.uniform(0, 20), 1))),
+               ("Kohlenhydrate", "{0} g".format(_germanNumber(random.uniform(0, 70), 1))),
+               ("davon Zucker", "{0} g".format(_germanNumber(random.uniform(0, 50), 1))),
+               ("Eiweiß", "{0} g".format(_germanNumber(random.uniform(0, 30), 1))),
+               ("Salz", random.choice(["<0,01 g", "{0} g".format(_germanNumber(random.uniform(0, 3), 2))]))]
+    if bShort:
+        lstRows = lstRows[:random.randint(1, 7)]
+    return '<table class="table table-striped">\n{0}</table>\n'.format(
+        "".join("<tr><th>{0}</th><td>{1}</td></tr>\n".format(sHeader, escape(sValue)) for sHeader, sValue in lstRows))
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _otherPage(sTitle, iFillerBytes):
+    lstItems = ['<li class="product-item"><a href="produkt-{0}.html">Produkt {0}</a>'
+                '<div class="price">{1} €</div></li>'.format(i, _germanNumber(random.uniform(0.29, 39.99), 2))
+                for i in range(random.randint(10, 40))]
+    return "{0}<div class=\"product-list\"><h1>{1}</h1><ul>{2}</ul></div>\n{3}".format(
+        _header(sTitle, iFillerBytes // 2), escape(sTitle), "".join(lstItems), _footer(iFillerBytes // 2))
+
+def _header(sTitle, iFillerBytes):
+    lstLinks = []
+    iSize = 0
+    while iSize < iFillerBytes:
+        sCategory, sSubCategory, lstProducts = random.choice(_lstCategories)
+        sLink = '<li class="nav-item"><a href="../../{0}/{1}/index.html">{1}</a></li>'.format(sCategory, sSubCategory)
+        lstLinks.append(sLink)
+        iSize += len(sLink)
+    return ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{0}</title>'
+            '<link rel="stylesheet" href="../../css/main.css"></head><body>\n'
+            '<nav class="main-navigation"><ul>{1}</ul></nav>\n'.format(escape(sTitle), "".join(lstLinks)))
+
+def _footer(iFillerBytes):
+    sScript = "<script>window.dataLayer = window.dataLayer || []; dataLayer.push({0});</script>\n".format(
+        "{'event': 'pageview', 'value': " + str(random.random()) + "}")
+    lstParts = ['<div class="recommendations">']
+    iSize = len(sScript)
+    while iSize < iFillerBytes:
+        sItem = '<div class="item"><a href="#">{0}</a><span class="price">{1} €</span></div>'.format(
+            random.choice(random.choice(_lstCategories)[2])[0], _germanNumber(random.uniform(0.29, 39.99), 2))
+        lstParts.append(sItem)
+        iSize += len(sItem)
+    lstParts.append("</div>\n")
+    lstParts.append(sScript)
+    lstParts.append("</body></html>\n")
+    return "".join(lstParts)
+
+def _germanNumber(dValue, iDecimals, bThousands=False):
+    sValue = "{0:,.{1}f}".format(dValue, iDecimals) if bThousands else "{0:.{1}f}".format(dValue, iDecimals)
+    return sValue.replace(",", "_").replace(".", ",").replace("_", ".")
+
+def _slug(sName):
+    return "".join(c if c.isalnum() else "-" for c in sName.lower()).strip("-")
+
+def _writePage(filePath, sHtml):
+    ut.createDirIfNotExist(os.path.dirname(filePath))
+    with open(filePath, 'w', encoding='utf-8') as fileHandler:
+        fileHandler.write(sHtml)
+    return filePath
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates a synthetic mirror of the edeka24 webpage.")
+    parser.add_argument("dirPath", help="directory the mirror is written to (wiped first)")
+    parser.add_argument("--products", type=int, default=1000, help="number of product pages")
+    parser.add_argument("--others", type=int, default=200, help="number of non-product pages")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    arguments = parser.parse_args()
+    lstFilePaths = generateCorpus(arguments.dirPath, arguments.products, arguments.others, arguments.seed)
+    print("{0} pages written to {1}".format(len(lstFilePaths), arguments.dirPath))
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,235 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+import argparse
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ----------------------------------------------------------------------------------------------------------------------
+class CatalogueServer(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in of the edeka24 webpage serving a synthetic mirror (see synthetic_corpus.generateCorpus()),
+    so the downloader can be run and measured without touching the live site. The files of the host directory are
+    served as they are; missing category index pages are generated as lists of the pages of their directory, so every
+    page can be reached from the start page like in the shop. robots.txt names a sitemap index (/sitemap.xml), which
+    lists one sitemap with all pages except the index pages, with their file time as lastmod. Connections are kept
+    alive (HTTP/1.1) and pages are compressed with gzip or br if the client accepts it. Every page carries an ETag
+    (content hash) and Last-Modified header (file time) and conditional requests are answered with 304 Not Modified.
+    An artificial latency per request imitates the network. The server counts connections, requests, 304 responses,
+    the bytes sent and the peak number of concurrent requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, siteDirPath, sHost="127.0.0.1", iPort=0, dLatencySeconds=0.0):
+        """
+            siteDirPath: Host directory of the mirror, e.g. <corpus>/www.edeka24.de.
+            sHost: Address the server listens on.
+            iPort: Port the server listens on; 0 picks a free one (see url()).
+            dLatencySeconds: Time every response is delayed.
+        """
+        super().__init__((sHost, iPort), _CatalogueHandler)
+        self._siteDirPath = os.path.realpath(siteDirPath)
+        self._dLatencySeconds = dLatencySeconds
+        self._lock = threading.Lock()
+        self._iConnections = 0
+        self._iRequests = 0
+        self._iActive = 0
+        self._iMaxActive = 0
+        self._iNotModified = 0
+        self._iBytesSent = 0
+
+    def url(self):
+        """
+        Returns the url of the start page.
+        """
+        sHost, iPort = self.server_address[:2]
+        return "http://{0}:{1}/".format(sHost, iPort)
+
+    def start(self):
+        """
+        Serves in a background thread until shutdown() is called.
+        Returns the thread.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def counts(self):
+        """
+        Returns a dictionary of the number of connections, requests, 304 responses, bytes sent (body, after
+        compression) and the peak number of concurrent requests.
+        """
+        with self._lock:
+            return {"connections": self._iConnections, "requests": self._iRequests, "not_modified": self._iNotModified,
+                    "bytes_sent": self._iBytesSent, "max_active": self._iMaxActive}
+
+    def process_request(self, request, clientAddress):
+        with self._lock:
+            self._iConnections += 1
+        super().process_request(request, clientAddress)
+
+    def page(self, sPath):
+        """
+        Returns a tuple of the contents of the page at the url path, its modification time and its content type, or
+        None if there is none.
+            sPath: Url path of the page.
+        """
+        sRelativePath = unquote(urlsplit(sPath).path).lstrip("/")
+        if sRelativePath in ("robots.txt", "sitemap.xml", "sitemap-pages.xml"):
+            return self._sitemapFile(sRelativePath)
+        if sRelativePath == "" or sRelativePath.endswith("/"):
+            sRelativePath += "index.html"
+        filePath = os.path.realpath(os.path.join(self._siteDirPath, sRelativePath))
+        if not filePath.startswith(self._siteDirPath + os.sep):
+            return None
+        if os.path.isfile(filePath):
+            with open(filePath, 'rb') as fileHandler:
+                return fileHandler.read(), os.path.getmtime(filePath), "text/html; charset=utf-8"
+        dirPath = os.path.dirname(filePath)
+        if os.path.basename(filePath) != "index.html" or not os.path.isdir(dirPath):
+            return None
+        lstLinks = []
+        for entry in sorted(os.scandir(dirPath), key=lambda entry: entry.name):
+            if entry.is_dir():
+                lstLinks.append('<li><a href="{0}/index.html">{0}</a></li>'.format(entry.name))
+            elif entry.name.endswith(".html") and entry.name != "index.html":
+                lstLinks.append('<li><a href="{0}">{0}</a></li>'.format(entry.name))
+        sTitle = os.path.basename(dirPath)
+        sHtml = ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{0}</title></head><body>\n'
+                '<div class="product-list"><h1>{0}</h1><ul>{1}</ul></div>\n</body></html>\n'.format(
+                    escape(sTitle), "".join(lstLinks)))
+        return sHtml.encode("utf-8"), os.path.getmtime(dirPath), "text/html; charset=utf-8"
+
+    def _sitemapFile(self, sName):
+        sRootUrl = self.url()
+        dModified = os.path.getmtime(self._siteDirPath)
+        if sName == "robots.txt":
+            return "User-agent: *\nSitemap: {0}sitemap.xml\n".format(sRootUrl).encode("utf-8"), dModified, "text/plain"
+        if sName == "sitemap.xml":
+            sXml = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                    '<sitemap><loc>{0}sitemap-pages.xml</loc></sitemap></sitemapindex>\n'.format(sRootUrl))
+            return sXml.encode("utf-8"), dModified, "application/xml"
+        lstEntries = []
+        for dirPath, lstDirNames, lstFileNames in os.walk(self._siteDirPath):
+            lstDirNames.sort()
+            for fileName in sorted(lstFileNames):
+                if not fileName.endswith(".html") or fileName == "index.html":
+                    continue
+                filePath = os.path.join(dirPath, fileName)
+                sLastModified = datetime.fromtimestamp(os.path.getmtime(filePath), timezone.utc).strftime(
+                    "%Y-%m-%dT%H:%M:%S+00:00")
+                sUrl = sRootUrl + quote(os.path.relpath(filePath, self._siteDirPath).replace(os.sep, "/"))
+                lstEntries.append("<url><loc>{0}</loc><lastmod>{1}</lastmod></url>".format(escape(sUrl), sLastModified))
+        sXml = ('<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                '{0}</urlset>\n'.format("".join(lstEntries)))
+        return sXml.encode("utf-8"), dModified, "application/xml"
+
+    def _beginRequest(self):
+        with self._lock:
+            self._iRequests += 1
+            self._iActive += 1
+            self._iMaxActive = max(self._iMaxActive, self._iActive)
+
+    def _endRequest(self, iStatus, iBytes):
+        with self._lock:
+            self._iActive -= 1
+            self._iBytesSent += iBytes
+            if iStatus == 304:
+                self._iNotModified += 1
+
+class _CatalogueHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server._beginRequest()
+        iStatus, iBytes = 500, 0
+        try:
+            if self.server._dLatencySeconds > 0.0:
+                time.sleep(self.server._dLatencySeconds)
+            tplPage = self.server.page(self.path)
+            if tplPage is None:
+                iStatus, iBytes = self._respond(404, b"<html><body>Not found</body></html>")
+                return
+            body, dModified, sContentType = tplPage
+            dictValidators = {"ETag": '"{0}"'.format(hashlib.md5(body).hexdigest()),
+                              "Last-Modified": formatdate(dModified, usegmt=True)}
+            if self._notModified(dictValidators["ETag"], int(dModified)):
+                iStatus, iBytes = self._respond(304, None, dictValidators)
+            else:
+                iStatus, iBytes = self._respond(200, body, dictValidators, sContentType)
+        finally:
+            self.server._endRequest(iStatus, iBytes)
+
+    def _notModified(self, sEtag, iModified):
+        sIfNoneMatch = self.headers.get("If-None-Match")
+        if sIfNoneMatch is not None:
+            return sEtag in [sTag.strip() for sTag in sIfNoneMatch.split(",")] or sIfNoneMatch.strip() == "*"
+        sIfModifiedSince = self.headers.get("If-Modified-Since")
+        if sIfModifiedSince is not None:
+            try:
+                return iModified <= parsedate_to_datetime(sIfModifiedSince).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _respond(self, iStatus, body, dictHeaders=None, sContentType="text/html; charset=utf-8"):
+        # Returns the status and the number of body bytes sent.
+        if body is None:
+            self.send_response(iStatus)
+            for sName, sValue in (dictHeaders or {}).items():
+                self.send_header(sName, sValue)
+            self.end_headers()
+            return iStatus, 0
+        sAcceptEncoding = self.headers.get("Accept-Encoding", "")
+        sEncoding = None
+        if "br" in sAcceptEncoding and brotli is not None:
+            sEncoding, body = "br", brotli.compress(body)
+        elif "gzip" in sAcceptEncoding:
+            sEncoding, body = "gzip", gzip.compress(body, compresslevel=5)
+        self.send_response(iStatus)
+        self.send_header("Content-Type", sContentType)
+        if sEncoding is not None:
+            self.send_header("Content-Encoding", sEncoding)
+        for sName, sValue in (dictHeaders or {}).items():
+            self.send_header(sName, sValue)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return iStatus, len(body)
+
+    def log_message(self, sFormat, *args):
+        pass
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serves a synthetic mirror of the edeka24 webpage over HTTP.")
+    parser.add_argument("dirPath", help="directory of the mirror written by synthetic_corpus.py")
+    parser.add_argument("--port", type=int, default=8000, help="port the server listens on")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every response is delayed")
+    arguments = parser.parse_args()
+    server = CatalogueServer(os.path.join(arguments.dirPath, "www.edeka24.de"), iPort=arguments.port,
+                             dLatencySeconds=arguments.latency)
+    print("Serving {0} at {1}".format(arguments.dirPath, server.url()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,8 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+
+# The modules of the crawler live in the repository root, which is not a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ----------------------------------------------------------------------------------------------------------------------
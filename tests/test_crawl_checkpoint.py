@@ -0,0 +1,100 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawl_checkpoint as ccp
+import crawler
+import os
+import pytest
+import re
+import synthetic_corpus
+import webpage_navigator as wn
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Crawl time of the rows, which differs between otherwise identical crawls.
+_regexTimestamp = re.compile(rb"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d")
+
+class _Interrupt(Exception):
+    pass
+
+class _InterruptedCheckpoint(ccp.CrawlCheckpoint):
+    # Interrupts the crawl after iStopPage pages, once their rows have been written after the last checkpoint.
+    def __init__(self, checkpointPath, iIntervalPages, iStopPage):
+        super().__init__(checkpointPath, iIntervalPages)
+        self._iStopPage = iStopPage
+
+    def saveIfDue(self, iPagesDone, session):
+        super().saveIfDue(iPagesDone, session)
+        if iPagesDone == self._iStopPage:
+            session.flush()
+            raise _Interrupt()
+
+@pytest.fixture(scope="module")
+def mirror(tmp_path_factory):
+    dirPath = str(tmp_path_factory.mktemp("corpus"))
+    synthetic_corpus.generateCorpus(dirPath, iProductPages=60, iOtherPages=5, iSeed=17, iFillerBytes=1000)
+    return dirPath
+
+def _rows(csvFilePath):
+    with open(csvFilePath, 'rb') as fileHandler:
+        return _regexTimestamp.sub(b"TIMESTAMP", fileHandler.read())
+
+def _interruptedCrawl(mirror, csvFilePath, checkpointPath):
+    # Crawls the mirror until the interruption after 25 pages; the checkpoint is saved after 20 pages.
+    checkpoint = _InterruptedCheckpoint(checkpointPath, iIntervalPages=10, iStopPage=25)
+    with crawler.CrawlSession(csvFilePath) as session:
+        with pytest.raises(_Interrupt):
+            wn.crawlThroughSubDirsParallel(mirror, session, iWorkers=2, checkpoint=checkpoint)
+    return wn.collectHtmlFiles(mirror)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_resumed_crawl_equals_uninterrupted_crawl(mirror, tmp_path):
+    with crawler.CrawlSession(str(tmp_path / "complete.csv")) as session:
+        wn.crawlThroughSubDirsParallel(mirror, session, iWorkers=2)
+
+    csvFilePath = str(tmp_path / "interrupted.csv")
+    checkpointPath = str(tmp_path / "checkpoint.json")
+    lstFilePaths = _interruptedCrawl(mirror, csvFilePath, checkpointPath)
+    iSizeAtInterruption = os.path.getsize(csvFilePath)
+    checkpoint = ccp.CrawlCheckpoint(checkpointPath, iIntervalPages=10)
+    filePath, iFirstPage, iResumeOffset = checkpoint.load(lstFilePaths)
+    assert (filePath, iFirstPage) == (csvFilePath, 20)
+    # The rows of the pages after the checkpoint are in the file and are cut off by the resumed crawl.
+    assert 0 < iResumeOffset < iSizeAtInterruption
+    with crawler.CrawlSession() as session:
+        session.setFilePath(filePath, iResumeOffset)
+        wn.crawlThroughSubDirsParallel(mirror, session, iWorkers=2, checkpoint=checkpoint, iFirstPage=iFirstPage)
+    checkpoint.remove()
+    assert _rows(csvFilePath) == _rows(str(tmp_path / "complete.csv"))
+    assert checkpoint.load(lstFilePaths) is None
+
+@pytest.mark.parametrize("sChange", ["rewritten", "truncated", "appended"])
+def test_changed_file_is_not_resumed(mirror, tmp_path, sChange):
+    csvFilePath = str(tmp_path / "interrupted.csv")
+    checkpointPath = str(tmp_path / "checkpoint.json")
+    lstFilePaths = _interruptedCrawl(mirror, csvFilePath, checkpointPath)
+    checkpoint = ccp.CrawlCheckpoint(checkpointPath)
+    iResumeOffset = checkpoint.load(lstFilePaths)[2]
+    with open(csvFilePath, 'rb') as fileHandler:
+        contents = fileHandler.read()
+    if sChange == "rewritten":
+        # The same size, one row changed.
+        contents = contents[:iResumeOffset // 2] + contents[iResumeOffset // 2:].replace(b",", b";", 1)
+    elif sChange == "truncated":
+        contents = contents[:iResumeOffset - 1]
+    with open(csvFilePath, 'wb') as fileHandler:
+        fileHandler.write(contents)
+    if sChange == "appended":
+        # Rows written after the checkpoint are expected; they are cut off when the crawl is resumed.
+        with open(csvFilePath, 'ab') as fileHandler:
+            fileHandler.write(b"appended,row\r\n")
+        assert checkpoint.load(lstFilePaths)[2] == iResumeOffset
+    else:
+        assert checkpoint.load(lstFilePaths) is None
+
+def test_checkpoint_of_another_page_list_is_not_resumed(mirror, tmp_path):
+    checkpointPath = str(tmp_path / "checkpoint.json")
+    lstFilePaths = _interruptedCrawl(mirror, str(tmp_path / "interrupted.csv"), checkpointPath)
+    checkpoint = ccp.CrawlCheckpoint(checkpointPath)
+    assert checkpoint.load(lstFilePaths) is not None
+    assert checkpoint.load(lstFilePaths[:-1]) is None
+    assert checkpoint.load(lstFilePaths[:-1] + [lstFilePaths[-1] + ".moved"]) is None
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,51 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawl_fused as cfu
+import crawler
+import csv
+import os
+import pytest
+import synthetic_corpus
+import synthetic_server
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture
+def server(tmp_path):
+    corpusDirPath = str(tmp_path / "corpus")
+    synthetic_corpus.generateCorpus(corpusDirPath, iProductPages=30, iOtherPages=2, iSeed=7, iFillerBytes=500)
+    server = synthetic_server.CatalogueServer(os.path.join(corpusDirPath, "www.edeka24.de"))
+    thread = server.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_pages_are_parsed_while_downloading(server, tmp_path):
+    csvFilePath = str(tmp_path / "products.csv")
+    with crawler.CrawlSession(csvFilePath) as session:
+        fusedCrawl = cfu.FusedCrawl(session, iWorkers=2, iMaxPendingPages=4)
+        fusedCrawl.run(server.url(), str(tmp_path / "download"))
+        iExceptions = session.statistics().countOfExceptions()
+    with open(csvFilePath, 'r', newline='', encoding="utf-8") as fileHandler:
+        lstRows = list(csv.reader(fileHandler))
+    assert len(lstRows) - 1 + iExceptions == 30
+    assert not os.path.exists(str(tmp_path / "download"))
+
+def test_failed_merge_stops_the_crawl(server, tmp_path, monkeypatch):
+    mergeProductInfo = crawler.mergeProductInfo
+    lstMerged = []
+
+    def failingMerge(result, session, manifest=None):
+        if len(lstMerged) == 3:
+            raise OSError("No space left on device")
+        lstMerged.append(result)
+        return mergeProductInfo(result, session, manifest)
+
+    monkeypatch.setattr(crawler, "mergeProductInfo", failingMerge)
+    with crawler.CrawlSession(str(tmp_path / "products.csv")) as session:
+        fusedCrawl = cfu.FusedCrawl(session, iWorkers=2, iMaxPendingPages=4)
+        with pytest.raises(OSError, match="No space left"):
+            fusedCrawl.run(server.url(), str(tmp_path / "download"))
+    assert len(lstMerged) == 3
+
+# ----------------------------------------------------------------------------------------------------------------------
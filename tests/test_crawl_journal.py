@@ -0,0 +1,19 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawl_journal as cj
+import json
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_entries_are_written_before_close(tmp_path):
+    journalPath = str(tmp_path / "failures.jsonl")
+    journal = cj.FailureJournal(journalPath, iRecentEntries=2)
+    for i in range(3):
+        journal.record("parse", "ValueError", "page-{0}.html".format(i), "x" * 500)
+    with open(journalPath, 'r', encoding="utf-8") as fileHandler:
+        lstEntries = [json.loads(sLine) for sLine in fileHandler]
+    assert [dictEntry["path"] for dictEntry in lstEntries] == ["page-0.html", "page-1.html", "page-2.html"]
+    assert len(lstEntries[0]["message"]) == 200
+    assert [entry.filePath for entry in journal.recentEntries()] == ["page-1.html", "page-2.html"]
+    assert journal.counts() == {("ValueError", "parse"): 3}
+    journal.close()
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,43 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawl_manifest as cm
+import crawler
+import random
+import synthetic_corpus
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _crawl(manifestPath, filePath):
+    manifest = cm.CrawlManifest(manifestPath)
+    result, sPreviousHash = manifest.lookup(filePath)
+    if result is None:
+        result = crawler.parseProductInfo(filePath, sPreviousHash)
+    result = manifest.update(result)
+    manifest.close()
+    return result
+
+def _writeProductPage(dirPath):
+    random.seed(1)
+    filePath = str(dirPath / "milka-alpenmilch-1.html")
+    with open(filePath, 'w', encoding="utf-8") as fileHandler:
+        fileHandler.write(synthetic_corpus.productPage("Suesswaren", "Schokolade", "Milka Alpenmilch", "100 g", 1000))
+    return filePath
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_unchanged_page_reuses_record(tmp_path):
+    filePath = _writeProductPage(tmp_path)
+    manifestPath = str(tmp_path / "manifest.sqlite")
+    assert not _crawl(manifestPath, filePath).bUnchanged
+    result = _crawl(manifestPath, filePath)
+    assert result.bUnchanged
+    assert result.dictData["product_name"] == "Milka Alpenmilch 100 g"
+
+def test_other_record_format_version_parses_again(tmp_path, monkeypatch):
+    filePath = _writeProductPage(tmp_path)
+    manifestPath = str(tmp_path / "manifest.sqlite")
+    _crawl(manifestPath, filePath)
+    monkeypatch.setattr(crawler, "iRecordFormatVersion", crawler.iRecordFormatVersion + 1)
+    result = _crawl(manifestPath, filePath)
+    assert not result.bUnchanged
+    assert result.dictData is not None
+    assert _crawl(manifestPath, filePath).bUnchanged
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,95 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawl_pipeline as cpl
+import crawler
+import csv
+import pytest
+import synthetic_corpus
+import threading
+import webpage_navigator as wn
+
+# ----------------------------------------------------------------------------------------------------------------------
+class _Uploader:
+    # Collects the uploaded rows; fails on the row with the specified number.
+
+    def __init__(self, iFailingRow=None):
+        self.lstRows = []
+        self.bClosed = False
+        self._iFailingRow = iFailingRow
+
+    def uploadRow(self, dictRow):
+        if len(self.lstRows) + 1 == self._iFailingRow:
+            raise ConnectionError("Lost connection to the database")
+        self.lstRows.append(dictRow)
+
+    def close(self):
+        self.bClosed = True
+
+@pytest.fixture(scope="module")
+def mirror(tmp_path_factory):
+    dirPath = str(tmp_path_factory.mktemp("corpus"))
+    synthetic_corpus.generateCorpus(dirPath, iProductPages=60, iOtherPages=8, iSeed=17, iFillerBytes=1000)
+    return dirPath
+
+def _readRows(csvFilePath):
+    with open(csvFilePath, 'r', newline='', encoding='utf-8') as fileHandler:
+        return list(csv.reader(fileHandler))[1:]
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.mark.parametrize("iQueueSize", [2, 256])
+def test_rows_like_parallel_crawl(mirror, tmp_path, iQueueSize):
+    uploader = _Uploader()
+    with crawler.CrawlSession(str(tmp_path / "pipeline.csv")) as session:
+        pipeline = cpl.CrawlPipeline(mirror, session, iWorkers=2, iQueueSize=iQueueSize, uploader=uploader)
+        pipeline.run()
+        statistics = session.statistics()
+    with crawler.CrawlSession(str(tmp_path / "parallel.csv")) as session:
+        wn.crawlThroughSubDirsParallel(mirror, session, iWorkers=2)
+        statisticsParallel = session.statistics()
+
+    lstRows = _readRows(str(tmp_path / "pipeline.csv"))
+    # The rows are written in file order; only the crawl times may differ.
+    assert [lstRow[:-1] for lstRow in lstRows] == [lstRow[:-1] for lstRow in _readRows(str(tmp_path / "parallel.csv"))]
+    assert len(lstRows) == statistics.successes() == statisticsParallel.successes()
+    assert statistics.successes() + statistics.countOfExceptions() == 60
+    assert statistics.rejectedPages() == 8
+    assert [dictRow["product_name"] for dictRow in uploader.lstRows] == [lstRow[0] for lstRow in lstRows]
+    assert uploader.bClosed
+    assert pipeline._dictStatistics["walk"].items() == pipeline._dictStatistics["parse"].items() == 68
+    assert pipeline._dictStatistics["write"].items() == 68
+    assert pipeline._dictStatistics["upload"].items() == len(lstRows)
+
+def test_failing_upload_stops_all_stages(mirror, tmp_path):
+    uploader = _Uploader(iFailingRow=5)
+    with crawler.CrawlSession(str(tmp_path / "pipeline.csv")) as session:
+        session._iMaxPendingRecords = 1
+        pipeline = cpl.CrawlPipeline(mirror, session, iWorkers=2, iQueueSize=2, uploader=uploader)
+        with pytest.raises(ConnectionError, match="Lost connection"):
+            pipeline.run()
+    assert len(uploader.lstRows) == 4
+    assert uploader.bClosed
+    # The stages stopped early instead of crawling the whole mirror.
+    assert pipeline._dictStatistics["write"].items() < 68
+    assert [thread.name for thread in threading.enumerate() if thread.name in ("walk", "parse", "write", "upload")] \
+        == []
+
+def test_failing_write_stops_all_stages(mirror, tmp_path, monkeypatch):
+    mergeProductInfo = crawler.mergeProductInfo
+    lstMerged = []
+
+    def failingMerge(result, session, manifest=None):
+        if len(lstMerged) == 10:
+            raise OSError("No space left on device")
+        lstMerged.append(result)
+        return mergeProductInfo(result, session, manifest)
+
+    monkeypatch.setattr(crawler, "mergeProductInfo", failingMerge)
+    uploader = _Uploader()
+    with crawler.CrawlSession(str(tmp_path / "pipeline.csv")) as session:
+        pipeline = cpl.CrawlPipeline(mirror, session, iWorkers=2, iQueueSize=2, uploader=uploader)
+        with pytest.raises(OSError, match="No space left"):
+            pipeline.run()
+    assert len(lstMerged) == 10
+    assert uploader.bClosed
+    assert pipeline._dictStatistics["walk"].items() < 68
+
+# ----------------------------------------------------------------------------------------------------------------------
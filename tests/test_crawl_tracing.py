@@ -0,0 +1,52 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import cProfile
+import crawl_tracing as ct
+import pstats
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_percentiles_nearest_rank():
+    tracer = ct.CrawlTracer()
+    for iPage in range(1, 101):
+        tracer.addPage("page{0}.html".format(iPage), {"parse": iPage / 1000})
+    assert tracer.percentiles("parse") == [0.05, 0.095, 0.099]
+    assert tracer.percentiles("parse", [0, 100]) == [0.001, 0.1]
+    assert tracer.percentiles("write") == [0.0, 0.0, 0.0]
+
+def test_histogram_power_of_two_buckets():
+    tracer = ct.CrawlTracer()
+    for dMilliseconds in [0.0, 0.01, 0.3, 0.5, 1.0, 3.0, 4.0, 5.0]:
+        tracer.addPage("page.html", {"read": dMilliseconds / 1000})
+    assert tracer.histogram("read") == [(2.0 ** -4, 2), (0.5, 2), (1.0, 1), (4.0, 2), (8.0, 1)]
+    assert tracer.histogram("parse") == []
+
+def test_batch_stage_is_spread_over_its_records():
+    tracer = ct.CrawlTracer()
+    tracer.addBatch("write", 0.75, 3)
+    tracer.addBatch("write", 1.0, 0)
+    assert tracer.percentiles("write", [50]) == [0.25]
+    assert sum(iCount for dUpperBound, iCount in tracer.histogram("write")) == 3
+
+def test_slowest_pages_by_total_time():
+    tracer = ct.CrawlTracer(iSlowestPages=3)
+    lstTotals = [5, 1, 9, 3, 7, 2, 8]
+    for iPage, iTotal in enumerate(lstTotals):
+        tracer.addPage("page{0}.html".format(iPage), {"read": iTotal / 2000, "parse": iTotal / 2000})
+    lstSlowest = tracer.slowestPages()
+    assert [filePath for dTotal, filePath, dictTimings in lstSlowest] == ["page2.html", "page6.html", "page4.html"]
+    assert [round(dTotal * 1000) for dTotal, filePath, dictTimings in lstSlowest] == [9, 8, 7]
+    assert lstSlowest[0][2] == {"read": 0.0045, "parse": 0.0045}
+
+def test_profiles_are_aggregated(tmp_path):
+    tracer = ct.CrawlTracer()
+    for iPage in range(2):
+        profile = cProfile.Profile()
+        profile.runcall(sorted, range(10))
+        profile.create_stats()
+        tracer.addPage("page{0}.html".format(iPage), {"parse": 0.001}, profile.stats)
+    profilePath = str(tmp_path / "crawl.pstats")
+    tracer.dumpProfile(profilePath)
+    dictStats = pstats.Stats(profilePath).stats
+    assert [tplStats[1] for tplKey, tplStats in dictStats.items() if tplKey[2] == "<built-in method builtins.sorted>"] \
+        == [2]
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,99 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawler
+import os
+import pytest
+import synthetic_corpus
+
+# ----------------------------------------------------------------------------------------------------------------------
+class _CountingBackend:
+    # Parser backend which counts the pages handed to the parser.
+
+    def __init__(self, backend):
+        self.name = backend.name
+        self._backend = backend
+        self.iPages = 0
+
+    def extract(self, contents):
+        self.iPages += 1
+        return self._backend.extract(contents)
+
+@pytest.fixture
+def corpus(tmp_path):
+    lstFilePaths = synthetic_corpus.generateCorpus(str(tmp_path / "corpus"), iProductPages=6, iOtherPages=4, iSeed=3,
+                                                   iFillerBytes=2000)
+    lstProductPaths = [filePath for filePath in lstFilePaths
+                       if not os.path.basename(filePath).startswith(("liste-", "index"))]
+    return lstProductPaths, [filePath for filePath in lstFilePaths if filePath not in lstProductPaths]
+
+def _getAbsolutePathByChdir(absoluteFilePath, relativeFilePath):
+    # The former implementation, which changed the process working directory; it is restored here in any case.
+    currentPath = os.getcwd()
+    try:
+        os.chdir(os.path.dirname(absoluteFilePath))
+        os.chdir(os.path.dirname(relativeFilePath))
+        return os.path.join(os.getcwd(), os.path.basename(relativeFilePath))
+    except Exception:
+        return relativeFilePath
+    finally:
+        os.chdir(currentPath)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_other_pages_are_rejected_without_parsing(corpus, monkeypatch):
+    lstProductPaths, lstOtherPaths = corpus
+    backend = _CountingBackend(crawler._backend)
+    monkeypatch.setattr(crawler, "_backend", backend)
+    assert len(lstOtherPaths) == 5
+    for filePath in lstOtherPaths:
+        result = crawler.parseProductInfo(filePath)
+        assert result.bRejected and result.dictData is None and not result.bException
+        assert result.iBytes == os.path.getsize(filePath)
+    assert backend.iPages == 0
+    for filePath in lstProductPaths:
+        result = crawler.parseProductInfo(filePath)
+        assert not result.bRejected
+    assert backend.iPages == len(lstProductPaths)
+
+def test_rejected_pages_and_time_saved_are_reported(corpus, tmp_path):
+    lstProductPaths, lstOtherPaths = corpus
+    with crawler.CrawlSession(str(tmp_path / "products.csv")) as session:
+        for filePath in lstProductPaths + lstOtherPaths:
+            crawler.mergeProductInfo(crawler.parseProductInfo(filePath), session)
+        statistics = session.statistics()
+    assert statistics.rejectedPages() == len(lstOtherPaths)
+    assert statistics.successes() + statistics.countOfExceptions() == len(lstProductPaths)
+
+def test_time_saved_estimate():
+    statistics = crawler.CrawlStatistics()
+    assert statistics.estimatedSecondsSaved() == 0.0
+    statistics.addParsedPage(1000, 0.02)
+    statistics.addParsedPage(3000, 0.06)
+    statistics.addRejectedPage(2000, 0.001)
+    statistics.addRejectedPage(500, 0.0005)
+    assert statistics.rejectedPages() == 2
+    # 2500 rejected bytes at 0.08 s per 4000 parsed bytes, less the 1.5 ms taken to scan them.
+    assert statistics.estimatedSecondsSaved() == pytest.approx(0.05 - 0.0015)
+    merged = crawler.CrawlStatistics()
+    merged.merge(statistics)
+    assert merged.rejectedPages() == 2
+    assert merged.estimatedSecondsSaved() == pytest.approx(statistics.estimatedSecondsSaved())
+
+@pytest.mark.parametrize("sRelativePath", [
+    "../images/milka.jpg", "images/milka.jpg", "./milka.jpg", "milka.jpg", "../../milka.jpg", "missing/milka.jpg",
+    "../linked/milka.jpg", "../linked/../images/milka.jpg", "../images/", "", "IMAGE_PATH/milka.jpg"])
+def test_image_paths_resolve_like_changing_directories(tmp_path, sRelativePath):
+    pageDirPath = tmp_path / "site" / "Lebensmittel"
+    pageDirPath.mkdir(parents=True)
+    (tmp_path / "site" / "images").mkdir()
+    os.symlink(str(tmp_path / "site" / "images"), str(tmp_path / "site" / "linked"))
+    sRelativePath = sRelativePath.replace("IMAGE_PATH", str(tmp_path / "site" / "images"))
+    pageFilePath = str(pageDirPath / "milka.html")
+    currentPath = os.getcwd()
+    assert crawler.getAbsolutePath(pageFilePath, sRelativePath) == _getAbsolutePathByChdir(pageFilePath, sRelativePath)
+    assert os.getcwd() == currentPath
+
+def test_image_path_of_missing_page_directory(tmp_path):
+    pageFilePath = str(tmp_path / "missing" / "milka.html")
+    assert crawler.getAbsolutePath(pageFilePath, "../images/milka.jpg") == \
+        _getAbsolutePathByChdir(pageFilePath, "../images/milka.jpg") == "../images/milka.jpg"
+
+# ----------------------------------------------------------------------------------------------------------------------
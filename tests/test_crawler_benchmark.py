@@ -0,0 +1,25 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawler_benchmark as cb
+
+# ----------------------------------------------------------------------------------------------------------------------
+_dictCorpus = {"products": 500, "others": 100, "seed": 0, "filler_bytes": 20000, "pages": 601}
+
+def _results(dCrawlPagesPerSecond):
+    return {"reference": {"pages_per_second": 1000.0, "peak_memory_kib": 80.0},
+            "crawl": {"pages_per_second": dCrawlPagesPerSecond, "peak_memory_kib": 1400.0}}
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_regression_on_the_same_corpus():
+    dictBaselines = dict(_results(600.0), corpus=_dictCorpus)
+    assert cb.checkBaselines(_results(590.0), dictBaselines, dictCorpus=dict(_dictCorpus)) == []
+    assert cb.checkBaselines(_results(300.0), dictBaselines, dictCorpus=dict(_dictCorpus)) == \
+        [("crawl", "pages_per_second", 300.0, 600.0)]
+
+def test_baselines_of_another_corpus_are_not_compared(capsys):
+    dictCorpus = dict(_dictCorpus, products=100, pages=201)
+    assert cb.checkBaselines(_results(300.0), dict(_results(600.0), corpus=_dictCorpus), dictCorpus=dictCorpus) == []
+    assert "another corpus" in capsys.readouterr().out
+    # Baselines stored without the parameters of their corpus are not compared either.
+    assert cb.checkBaselines(_results(300.0), _results(600.0), dictCorpus=dictCorpus) == []
+
+# ----------------------------------------------------------------------------------------------------------------------
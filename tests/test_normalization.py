@@ -0,0 +1,49 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import math
+import normalization as nz
+import pytest
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Values the batch normalization has to treat exactly like normalizeValue().
+_lstValues = ["1,99", "1.299,00", "<0,01 g", "> 5 kg", "=3", "12_5", '"Milka"', 'Nuss "extra"', "250 g", "1 kg",
+              "nan", "NaN g", "-nan", "inf", "-Infinity", "1e400", "-1e400", "1e-400", "1e5", ".5", "5.", "+3", "1..2",
+              "", " ", "g", "kg", '""', " 1,5 g", "1 2", "　", "٣", "١٫٥",
+              "１２", "१.२", "١e٣", "Milka Alpenmilch 100 g", "Eiweiß", "0x10", "1_000", "½",
+              None, 0, 3.5, float("nan"), True]
+
+def _assertSame(batchValue, reference):
+    assert type(batchValue) is type(reference), (batchValue, reference)
+    if isinstance(reference, float) and math.isnan(reference):
+        assert math.isnan(batchValue)
+    else:
+        assert batchValue == reference
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.mark.parametrize("value", _lstValues)
+def test_value_like_scalar_normalization(value):
+    _assertSame(nz.normalizeValues([value])[0], nz.normalizeValue(value))
+
+def test_batch_like_scalar_normalization():
+    for batchValue, value in zip(nz.normalizeValues(_lstValues), _lstValues):
+        _assertSame(batchValue, nz.normalizeValue(value))
+
+def test_edge_cases():
+    lstValues = nz.normalizeValues(["nan", "1e400", "١٢", "", "<0,01 g"])
+    assert math.isnan(lstValues[0])
+    assert lstValues[1] == float("inf")
+    assert lstValues[2] == 12.0
+    assert lstValues[3] == ""
+    assert lstValues[4] == 0.01
+
+def test_records():
+    lstRecords = [{"price": "1,99", "name": '"Milka"', "fat_in_g": "nan"},
+                  {"price": None, "name": "Eiweiß", "fat_in_g": "1e400"},
+                  {"price": "", "name": "１２", "fat_in_g": 4.5}]
+    lstNormalized = nz.normalizeRecords(lstRecords)
+    assert lstNormalized[0]["price"] == 1.99 and lstNormalized[0]["name"] == "Milka"
+    assert lstNormalized[2]["name"] == 12.0
+    assert lstRecords[0]["price"] == "1,99"
+    assert nz.checkNormalizationParity(lstRecords) == []
+    assert nz.normalizeRecords([]) == []
+
+# ----------------------------------------------------------------------------------------------------------------------
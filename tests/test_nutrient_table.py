@@ -0,0 +1,49 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import math
+import nutrient_table as nt
+import pytest
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _nutrients(lstRows):
+    arrayNutrients = nt.extractNutrients(tuple(((sLabel,), (sValue,)) for sLabel, sValue in lstRows))
+    return {sColumn: dValue for sColumn, dValue in zip(nt.lstNutrientColumns, arrayNutrients) if not math.isnan(dValue)}
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.mark.parametrize("sLabel, sColumn", [
+    ("Fett", "fat_in_g"),
+    ("davon gesättigte Fettsäuren", "hereof_saturated_fatty_acids_in_g"),
+    ("- davon: gesättigte Fettsäuren", "hereof_saturated_fatty_acids_in_g"),
+    ("Kohlenhydrate", "carbohydrates_in_g"),
+    ("davon Zucker", "hereof_sugar_in_g"),
+    ("Eiweiß", "protein_in_g"),
+    ("Protein", "protein_in_g"),
+    ("Salz", "salt_in_g")])
+def test_label_columns(sLabel, sColumn):
+    assert nt.labelColumn(sLabel) == nt.lstNutrientColumns.index(sColumn)
+
+@pytest.mark.parametrize("sLabel", ["davon einfach ungesättigte Fettsäuren", "davon mehrfach ungesättigte Fettsäuren",
+                                    "Fettsäuren", "davon Zuckeralkohole", "mehrwertige Alkohole", "Ballaststoffe",
+                                    "Natrium", ""])
+def test_labels_without_column(sLabel):
+    assert nt.labelColumn(sLabel) is None
+
+def test_unsaturated_fatty_acids_do_not_shift_saturated():
+    dictNutrients = _nutrients([("Fett", "10 g"), ("davon einfach ungesättigte Fettsäuren", "4 g"),
+                                ("davon mehrfach ungesättigte Fettsäuren", "3 g"),
+                                ("davon gesättigte Fettsäuren", "2 g")])
+    assert dictNutrients == {"fat_in_g": 10.0, "hereof_saturated_fatty_acids_in_g": 2.0}
+
+def test_polyols_do_not_shift_sugar():
+    dictNutrients = _nutrients([("Kohlenhydrate", "60 g"), ("davon Zuckeralkohole", "30 g"), ("davon Zucker", "5 g")])
+    assert dictNutrients == {"carbohydrates_in_g": 60.0, "hereof_sugar_in_g": 5.0}
+
+def test_energy_rows_by_unit():
+    assert _nutrients([("Brennwert", "250 kcal"), ("Brennwert", "1.046 kJ")]) == \
+        {"calorific_value_in_kJ": 1046.0, "calorific_value_in_kcal": 250.0}
+    assert _nutrients([("Energie", "1046 kJ / 250 kcal")]) == \
+        {"calorific_value_in_kJ": 1046.0, "calorific_value_in_kcal": 250.0}
+
+def test_short_and_reordered_table():
+    assert _nutrients([("Salz", "<0,01 g"), ("Eiweiß", "3,5 g")]) == {"salt_in_g": 0.01, "protein_in_g": 3.5}
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,84 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import parser_backends as pb
+import pytest
+import random
+import synthetic_corpus
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _extractBoth(contents):
+    return pb.LxmlBackend().extract(contents), pb.BeautifulSoupBackend().extract(contents)
+
+def _productPage(sBody, sAfterBlock=""):
+    return ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Test</title></head><body>\n'
+            '<div class="breadcrumb"><ul><li><a href="/">Startseite</a></li><li><a href="/s/">Süßwaren</a></li>'
+            '</ul></div>\n<div class="col-sm-6 detail-description">\n<h1>Milka Alpenmilch 100 g</h1>\n{0}\n</div>\n'
+            '{1}</body></html>\n'.format(sBody, sAfterBlock)).encode("utf-8")
+
+class _ReadBytes(bytes):
+    # Page contents remembering how far they have been sliced, i.e. fed to the pull parser.
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self.iEnd = max(getattr(self, "iEnd", 0), min(key.stop, len(self)))
+        return bytes.__getitem__(self, key)
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.mark.parametrize("iSeed", range(20))
+def test_synthetic_product_pages(iSeed):
+    random.seed(iSeed)
+    contents = synthetic_corpus.productPage("Suesswaren", "Schokolade", "Milka Alpenmilch", "100 g",
+                                            iFillerBytes=4000).encode("utf-8")
+    lxmlPage, bs4Page = _extractBoth(contents)
+    assert lxmlPage is not None
+    assert lxmlPage == bs4Page
+
+def test_script_and_style_text_is_ignored():
+    contents = _productPage('<div class="price">1,99 €<script>var x=1;</script><style>.a{}</style></div>\n'
+                            '<p class="price-note">1 kg = <template>t</template>19,90 €</p>')
+    lxmlPage, bs4Page = _extractBoth(contents)
+    assert lxmlPage.price == "1,99 €"
+    assert lxmlPage.priceNote == "1 kg = 19,90 €"
+    assert lxmlPage == bs4Page
+
+def test_comments_and_nested_markup():
+    contents = _productPage('<div class="price"><!-- alt: 2,49 € --><span>1,</span><b>99</b> €</div>\n'
+                            '<ul class="characteristics clearfix"><li>vegan</li><li>laktosefrei<br>glutenfrei</li></ul>\n'
+                            '<table class="table table-striped"><tr><th>Fett</th><td>10 g<script>x()</script></td></tr>'
+                            '<tr><th>Salz</th><td>&lt;0,01 g</td></tr></table>')
+    lxmlPage, bs4Page = _extractBoth(contents)
+    assert lxmlPage.price == "1,99 €"
+    assert lxmlPage.nutrientRows == ((("Fett",), ("10 g",)), (("Salz",), ("<0,01 g",)))
+    assert lxmlPage == bs4Page
+
+def test_missing_fields():
+    lxmlPage, bs4Page = _extractBoth(_productPage(""))
+    assert lxmlPage.price is None and lxmlPage.nutrientRows is None and lxmlPage.image is None
+    assert lxmlPage == bs4Page
+
+def test_optional_fields_end_with_the_product_block():
+    # Recommendations after the product block, long enough for several chunks, which must not be parsed for the
+    # missing nutrient reference.
+    sAfterBlock = '<div class="recommendations">{0}</div>\n'.format(
+        '<div class="item"><span class="listTitlePerGramm">je 100 g</span></div>' * 2000)
+    contents = _ReadBytes(_productPage('<div class="price">1,99 €</div>', sAfterBlock))
+    lxmlPage = pb.LxmlBackend().extract(contents)
+    assert lxmlPage.price == "1,99 €" and lxmlPage.nutrientsPerGramm is None
+    assert contents.iEnd <= 2 * pb.LxmlBackend._iChunkSize < len(contents)
+
+def test_required_fields_after_the_product_block():
+    contents = _productPage('<div class="price">1,99 €</div>').replace(b'<div class="breadcrumb">', b'<div class="x">')
+    contents = contents.replace(b"</body>", b'<div class="breadcrumb"><ul><li><a href="/">Startseite</a></li></ul>'
+                                            b'</div></body>')
+    lxmlPage, bs4Page = _extractBoth(contents)
+    assert lxmlPage.breadcrumb == ["Startseite"]
+    assert lxmlPage == bs4Page
+
+def test_no_product_page():
+    assert _extractBoth(b"<html><body><div class='price'>1,99 \xe2\x82\xac</div></body></html>") == (None, None)
+
+def test_page_without_charset_declaration_is_utf8():
+    contents = _productPage('<div class="price">1,99 €</div>').replace(b'<meta charset="utf-8">', b"")
+    lxmlPage, bs4Page = _extractBoth(contents)
+    assert lxmlPage.breadcrumb == ["Startseite", "Süßwaren"]
+    assert lxmlPage == bs4Page
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,67 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from bs4 import BeautifulSoup
+
+import crawler
+import os
+import product_extractor as pe
+import pytest
+import synthetic_corpus
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture(scope="module")
+def corpusFilePaths(tmp_path_factory):
+    dirPath = str(tmp_path_factory.mktemp("corpus"))
+    return synthetic_corpus.generateCorpus(dirPath, iProductPages=60, iOtherPages=5, iSeed=11, iFillerBytes=3000)
+
+def _buildProductInfo(filePath, page):
+    # Returns the data dictionary of the page or the type of the exception raised while building it.
+    if page is None:
+        return None
+    try:
+        return crawler.buildProductInfo(filePath, page)
+    except Exception as exception:
+        return type(exception)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_single_walk_like_repeated_finds(corpusFilePaths):
+    extractor = pe.ProductPageExtractor()
+    iProductPages = 0
+    for filePath in corpusFilePaths:
+        with open(filePath, 'rb') as fileHandler:
+            soup = BeautifulSoup(fileHandler.read(), "lxml")
+        page = extractor.extract(soup)
+        pageReference = pe.extractWithRepeatedFinds(soup)
+        assert page == pageReference, filePath
+        assert _buildProductInfo(filePath, page) == _buildProductInfo(filePath, pageReference), filePath
+        iProductPages += page is not None
+    assert iProductPages == 60
+
+def test_crawler_records_like_repeated_finds(corpusFilePaths):
+    # The records the crawler builds with its parser backend equal the ones of the former soup.find() calls.
+    for filePath in corpusFilePaths:
+        with open(filePath, 'rb') as fileHandler:
+            contents = fileHandler.read()
+        pageReference = pe.extractWithRepeatedFinds(BeautifulSoup(contents, "lxml"))
+        try:
+            dictData = crawler.extractProductInfo(filePath, contents)
+        except Exception as exception:
+            dictData = type(exception)
+        assert dictData == _buildProductInfo(filePath, pageReference), os.path.basename(filePath)
+
+def test_first_match_in_document_order():
+    soup = BeautifulSoup('<div class="col-sm-6 detail-description"><h1>Name</h1></div>'
+                         '<p class="product-note extra">first</p><p class="product-note">second</p>'
+                         '<div class="price old">1,99 €</div><div class="price">2,49 €</div>', "lxml")
+    page = pe.ProductPageExtractor().extract(soup)
+    assert page == pe.extractWithRepeatedFinds(soup)
+    assert page.productNote == "first" and page.price == "1,99 €"
+
+def test_class_matching_like_find():
+    soup = BeautifulSoup('<ul class="characteristics clearfix"></ul><ul class="clearfix characteristics"></ul>'
+                         '<ul class="characteristics"></ul>', "lxml")
+    lstLists = soup.find_all("ul")
+    assert [pe.hasClass(ul, "characteristics clearfix") for ul in lstLists] == [True, False, False]
+    assert [pe.hasClass(ul, "characteristics") for ul in lstLists] == [True, True, True]
+    assert soup.find("ul", class_="characteristics clearfix") is lstLists[0]
+
+# ----------------------------------------------------------------------------------------------------------------------
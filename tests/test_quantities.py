@@ -0,0 +1,65 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import pytest
+import quantities as qu
+
+# ----------------------------------------------------------------------------------------------------------------------
+# The former implementations, which the cached and regular expression based ones have to behave exactly like.
+def _seperateStringNumber(string):
+    previous_character = string[0]
+    groups = []
+    newword = string[0]
+    for x, i in enumerate(string[1:]):
+        if i.isalpha() and previous_character.isalpha():
+            newword += i
+        elif i.isnumeric() and previous_character.isnumeric():
+            newword += i
+        else:
+            groups.append(newword)
+            newword = i
+        previous_character = i
+        if x == len(string) - 2:
+            groups.append(newword)
+            newword = ''
+    return groups
+
+def _splitStringByDimensionIfPossible(sNum):
+    sNumLower = sNum.lower().strip()
+    if len(sNumLower) == 0 or sNumLower[0] not in "0123456789":
+        return "", ""
+    for iIndex in range(len(sNumLower)):
+        if sNumLower[iIndex] in "abcdefghijklmnopqrstuvwxyzüäö€%$":
+            return sNum[:iIndex], sNum[iIndex:]
+    return sNum, ""
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.mark.parametrize("sName", [
+    "Milka Alpenmilch 100 g", "Milch 3,5% 1l", "Coca-Cola 6x1,5l", "Eier 10 Stück", "Rama", "Rama Original",
+    "Knorr Fix für Spaghetti Bolognese 38g", "H-Milch 1,5 % 12 x 1 l", "Weißwein 0,75l", "7Up", "99", "A",
+    "x", "Ab", "Müller Müllermilch Schoko 400ml", "Tee (20 Beutel)", "Käse  200 g ", "Öl\t1 l",
+    # Numbers which are no decimal digits use the groupby fallback.
+    "Schoko ½ Tafel", "Wasser 1,5m² Folie", "Pizza ¾ 350 g", "Band Ⅻ 12", "٣ Eier", "１２ Stück"])
+def test_name_groups_like_former_implementation(sName):
+    assert qu.splitNameGroups(sName) == _seperateStringNumber(sName)
+
+def test_empty_name():
+    with pytest.raises(ValueError):
+        qu.splitNameGroups("")
+
+@pytest.mark.parametrize("sText", [
+    "250 g", "100 ml", "1 kg = 3,98 €", "1kg", "0,75 l", "1 Stück", "6 x 1,5 l", "10 St.", " 200 g", "500",
+    "1,5", "100 g = 1,99 €", "1 l = 0,89 €", "20 Beutel", "12%", "3 $", "Ölflasche", "ca. 250 g", "", " ",
+    "1 Ü-Ei", "1 Kilogramm", "2 ltr", "5 gr", "3 Stk"])
+def test_quantity_split_like_former_implementation(sText):
+    quantity = qu.parseQuantity(sText)
+    assert (quantity.sNumber, quantity.sUnit) == _splitStringByDimensionIfPossible(sText)
+
+@pytest.mark.parametrize("sText, dValue, sNormalizedUnit", [
+    ("250 g", 250.0, "g"), ("0,75 l", 0.75, "l"), ("1 kg = 3,98 €", 1.0, "kg"), ("5 gr", 5.0, "g"),
+    ("1 Kilogramm", 1.0, "kg"), ("2 ltr", 2.0, "l"), ("3 Stk", 3.0, "stück"), ("10 St.", 10.0, "stück"),
+    ("500", 500.0, ""), ("6 x 1,5 l", 6.0, "x"), ("ca. 250 g", None, ""), ("", None, "")])
+def test_quantity_values_and_units(sText, dValue, sNormalizedUnit):
+    quantity = qu.parseQuantity(sText)
+    assert quantity.dValue == dValue
+    assert quantity.sNormalizedUnit == sNormalizedUnit
+
+# ----------------------------------------------------------------------------------------------------------------------
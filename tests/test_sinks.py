@@ -0,0 +1,116 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from datetime import datetime
+
+import csv
+import math
+import pyarrow.parquet as pq
+import pytest
+import sinks
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Data types like data_upload.createDataTypeAdjustmentDict(), one column of every kind.
+_dictDataTypes = {"product_name": "TEXT", "category": "JSON", "price": "DECIMAL(8,2)", "fat_in_g": "DECIMAL(8,2)",
+                  "package_size_dim": "TEXT", "timestamp": "TIMESTAMP"}
+
+def _record(sName, price, fat="", sTimestamp="2024-05-31 08:15:00"):
+    return {"product_name": sName, "category": '["Lebensmittel", "Milch"]', "price": price, "fat_in_g": fat,
+            "package_size_dim": "g", "timestamp": sTimestamp}
+
+def _readCsv(filePath):
+    with open(filePath, 'r', newline='', encoding='utf-8') as fileHandler:
+        return list(csv.reader(fileHandler))
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_csv_round_trip(tmp_path):
+    filePath = str(tmp_path / "products.csv")
+    sink = sinks.CsvSink(filePath, list(_dictDataTypes), iMaxBufferedRows=2)
+    for record in [_record('Milka "Alpenmilch", 100 g', 1.99), _record("Butter\nirisch", 2.49, 81.0)]:
+        sink.write(record)
+    sink.flushIfDue()
+    sink.close()
+    sink.close()
+    assert _readCsv(filePath) == [list(_dictDataTypes),
+                                  ['Milka "Alpenmilch", 100 g', '["Lebensmittel", "Milch"]', "1.99", "", "g",
+                                   "2024-05-31 08:15:00"],
+                                  ["Butter\nirisch", '["Lebensmittel", "Milch"]', "2.49", "81.0", "g",
+                                   "2024-05-31 08:15:00"]]
+
+def test_csv_missing_column_buffers_nothing(tmp_path):
+    sink = sinks.CsvSink(str(tmp_path / "products.csv"), list(_dictDataTypes))
+    record = _record("Milka", 1.99)
+    del record["price"]
+    with pytest.raises(KeyError):
+        sink.write(record)
+    sink.close()
+    assert _readCsv(sink.filePath()) == [list(_dictDataTypes)]
+
+def test_csv_resume_truncates_to_offset(tmp_path):
+    filePath = str(tmp_path / "products.csv")
+    sink = sinks.CsvSink(filePath, list(_dictDataTypes))
+    sink.write(_record("Milka", 1.99))
+    iOffset = sink.sync()
+    # Rows written after the checkpoint, the last one only partially, are dropped on resume.
+    sink.write(_record("Butter", 2.49))
+    sink.close()
+    with open(filePath, 'a', encoding='utf-8') as fileHandler:
+        fileHandler.write('"Torn ro')
+    sink = sinks.CsvSink(filePath, list(_dictDataTypes), iResumeOffset=iOffset)
+    sink.write(_record("Kaffee", 4.99))
+    sink.close()
+    assert [lstRow[0] for lstRow in _readCsv(filePath)] == ["product_name", "Milka", "Kaffee"]
+
+def test_arrow_schema_of_sql_types():
+    schema = sinks.createArrowSchema(_dictDataTypes)
+    assert schema.names == list(_dictDataTypes)
+    assert [str(field.type) for field in schema] == ["string", "string", "double", "double", "string", "timestamp[s]"]
+
+def test_parquet_round_trip(tmp_path):
+    filePath = str(tmp_path / "products.parquet")
+    sink = sinks.ParquetSink(filePath, _dictDataTypes, iMaxBufferedRows=2)
+    for record in [_record("Milka", 1.99, 30.5), _record("Butter", 2.49), _record("Kaffee", 4.99, 0.0, "")]:
+        sink.write(record)
+        sink.flushIfDue()
+    sink.close()
+    sink.close()
+    parquetFile = pq.ParquetFile(filePath)
+    assert parquetFile.num_row_groups == 2
+    table = parquetFile.read()
+    # Parquet has no timestamps in seconds; they are stored in milliseconds.
+    assert [str(field.type) for field in table.schema] == ["string", "string", "double", "double", "string",
+                                                           "timestamp[ms]"]
+    assert table.to_pylist() == [
+        {"product_name": "Milka", "category": '["Lebensmittel", "Milch"]', "price": 1.99, "fat_in_g": 30.5,
+         "package_size_dim": "g", "timestamp": datetime(2024, 5, 31, 8, 15)},
+        {"product_name": "Butter", "category": '["Lebensmittel", "Milch"]', "price": 2.49, "fat_in_g": None,
+         "package_size_dim": "g", "timestamp": datetime(2024, 5, 31, 8, 15)},
+        {"product_name": "Kaffee", "category": '["Lebensmittel", "Milch"]', "price": 4.99, "fat_in_g": 0.0,
+         "package_size_dim": "g", "timestamp": None}]
+
+def test_parquet_values_not_fitting_their_column_are_null(tmp_path):
+    filePath = str(tmp_path / "products.parquet")
+    sink = sinks.ParquetSink(filePath, _dictDataTypes)
+    sink.write(_record("", "272 kJ", "n/a"))
+    sink.write(_record(12.0, float("nan"), float("inf")))
+    sink.close()
+    lstRows = pq.read_table(filePath).to_pylist()
+    assert lstRows[0]["product_name"] is None
+    assert lstRows[0]["price"] is None and lstRows[0]["fat_in_g"] is None
+    assert lstRows[1]["product_name"] == "12.0"
+    assert math.isnan(lstRows[1]["price"]) and lstRows[1]["fat_in_g"] == float("inf")
+
+def test_parquet_from_csv_like_crawled_values(tmp_path):
+    csvFilePath = str(tmp_path / "products.csv")
+    lstRecords = [_record("Milka", 1.99, 30.5), _record("Butter", "272 kJ"), _record("", 4.99, 0.0, "")]
+    csvSink = sinks.CsvSink(csvFilePath, list(_dictDataTypes))
+    crawledSink = sinks.ParquetSink(str(tmp_path / "crawled.parquet"), _dictDataTypes)
+    for record in lstRecords:
+        csvSink.write(record)
+        crawledSink.write(record)
+    csvSink.close()
+    crawledSink.close()
+    rebuiltSink = sinks.ParquetSink(str(tmp_path / "rebuilt.parquet"), _dictDataTypes)
+    rebuiltSink.writeCsvFile(csvFilePath)
+    rebuiltSink.close()
+    assert pq.read_table(str(tmp_path / "rebuilt.parquet")).equals(pq.read_table(str(tmp_path / "crawled.parquet")))
+
+# ----------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,88 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawler
+import csv
+import io
+import pytest
+import random
+import site_archive as sa
+import synthetic_corpus
+import tarfile
+import zipfile
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _pages(iPages):
+    random.seed(3)
+    return [("www.edeka24.de/Getraenke/Saft/saft-{0}.html".format(i),
+             synthetic_corpus.productPage("Getraenke", "Saft", "Saft {0}".format(i), "1 l", 1000).encode("utf-8"))
+            for i in range(iPages)]
+
+def _writeZipArchive(archivePath, iPages):
+    with zipfile.ZipFile(archivePath, 'w') as archive:
+        for sMemberPath, contents in _pages(iPages):
+            archive.writestr(sMemberPath, contents)
+
+def _writeTarArchive(archivePath, iPages, sMode):
+    with tarfile.open(archivePath, sMode) as archive:
+        for sMemberPath, contents in _pages(iPages):
+            info = tarfile.TarInfo(sMemberPath)
+            info.size = len(contents)
+            archive.addfile(info, io.BytesIO(contents))
+
+def _writeWarcArchive(archivePath, iPages):
+    writer = sa.WarcWriter(archivePath)
+    for sMemberPath, contents in _pages(iPages):
+        writer.add("https://" + sMemberPath, contents)
+    writer.close()
+
+def _crawl(archivePath, csvFilePath, **dictArguments):
+    with crawler.CrawlSession(csvFilePath) as session:
+        sa.crawlArchiveParallel(archivePath, session, **dictArguments)
+    with open(csvFilePath, 'r', newline='', encoding="utf-8") as fileHandler:
+        return [row[:-1] for row in csv.reader(fileHandler)]
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_parsed_chunks_are_bounded(tmp_path):
+    archivePath = str(tmp_path / "site.zip")
+    _writeZipArchive(archivePath, 11)
+    lstSizes = [len(lstResults) for lstResults in sa.iterParsedChunks(archivePath, 0, 2, iChunkSize=4)]
+    assert lstSizes == [4, 2]
+
+def test_parallel_crawl_is_complete_and_deterministic(tmp_path):
+    archivePath = str(tmp_path / "site.zip")
+    _writeZipArchive(archivePath, 23)
+    lstRows = _crawl(archivePath, str(tmp_path / "a.csv"), iWorkers=3, iChunkSize=2, iMaxPendingChunks=1)
+    lstExpectedNames = [result.dictData["product_name"] for lstResults in sa.iterParsedChunks(archivePath)
+                        for result in lstResults if result.dictData is not None and not result.bException]
+    assert len(lstExpectedNames) > 20
+    assert sorted(row[0] for row in lstRows[1:]) == sorted(lstExpectedNames)
+    assert _crawl(archivePath, str(tmp_path / "b.csv"), iWorkers=3, iChunkSize=2, iMaxPendingChunks=1) == lstRows
+
+@pytest.mark.parametrize("sName", ["site.tar", "site.tar.gz", "site.warc.gz"])
+def test_round_trip(tmp_path, sName):
+    archivePath = str(tmp_path / sName)
+    if sName.endswith(".warc.gz"):
+        _writeWarcArchive(archivePath, 23)
+    else:
+        _writeTarArchive(archivePath, 23, "w" if sName.endswith(".tar") else "w:gz")
+    assert sa.hasIndex(archivePath) == sName.endswith(".tar")
+    lstPages = list(sa.iterArchivePages(archivePath))
+    assert lstPages == [(sMemberPath, contents) for sMemberPath, contents in _pages(23)]
+    lstRows = _crawl(archivePath, str(tmp_path / "a.csv"), iWorkers=3, iChunkSize=2, iMaxPendingChunks=1)
+    lstExpectedNames = [result.dictData["product_name"] for lstResults in sa.iterParsedChunks(archivePath)
+                        for result in lstResults if result.dictData is not None and not result.bException]
+    assert len(lstExpectedNames) > 20
+    if sa.hasIndex(archivePath):
+        assert sorted(row[0] for row in lstRows[1:]) == sorted(lstExpectedNames)
+    else:
+        # Read once and handed over in chunks round-robin, so the rows are in archive order.
+        assert [row[0] for row in lstRows[1:]] == lstExpectedNames
+    assert _crawl(archivePath, str(tmp_path / "b.csv"), iWorkers=3, iChunkSize=2, iMaxPendingChunks=1) == lstRows
+
+def test_failing_worker_raises(tmp_path):
+    archivePath = str(tmp_path / "site.warc")
+    with open(archivePath, 'wb') as fileHandler:
+        fileHandler.write(b"no warc record\r\n")
+    with pytest.raises(RuntimeError, match="Invalid WARC record"):
+        _crawl(archivePath, str(tmp_path / "a.csv"), iWorkers=2)
+
+# ----------------------------------------------------------------------------------------------------------------------
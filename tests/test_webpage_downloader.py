@@ -0,0 +1,177 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import asyncio
+import download_cache as dc
+import os
+import pytest
+import synthetic_corpus
+import synthetic_server
+import webpage_downloader as wd
+import webpage_navigator as wn
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture
+def site(tmp_path):
+    corpusDirPath = str(tmp_path / "corpus")
+    synthetic_corpus.generateCorpus(corpusDirPath, iProductPages=40, iOtherPages=4, iSeed=5, iFillerBytes=500)
+    siteDirPath = os.path.join(corpusDirPath, "www.edeka24.de")
+    # All pages unchanged for a while, so the Last-Modified dates differ from the ones set by the tests.
+    for dirPath, lstDirNames, lstFileNames in os.walk(siteDirPath):
+        for fileName in lstFileNames:
+            os.utime(os.path.join(dirPath, fileName), (1.6e9, 1.6e9))
+    server = synthetic_server.CatalogueServer(siteDirPath)
+    thread = server.start()
+    yield server, siteDirPath
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+def _productPaths(siteDirPath):
+    return sorted(os.path.relpath(os.path.join(dirPath, fileName), siteDirPath)
+                  for dirPath, lstDirNames, lstFileNames in os.walk(siteDirPath)
+                  for fileName in lstFileNames if fileName.endswith(".html") and fileName != "index.html"
+                  and not fileName.startswith("liste-"))
+
+def _fetch(server, dirDownload, **dictArguments):
+    fetcher = wd.SiteFetcher(dirDownload, **dictArguments)
+    lstFilePaths = asyncio.run(fetcher.run([server.url()]))
+    return fetcher, lstFilePaths
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_mirror_layout(site, tmp_path):
+    server, siteDirPath = site
+    dirDownload = str(tmp_path / "download")
+    fetcher, lstFilePaths = _fetch(server, dirDownload, iMaxConnectionsPerHost=4)
+    hostDirPath = os.path.join(dirDownload, wd.sProjectName, "127.0.0.1")
+    assert os.path.isfile(os.path.join(hostDirPath, "index.html"))
+    lstProductPaths = _productPaths(siteDirPath)
+    assert len(lstProductPaths) == 40
+    for sRelativePath in lstProductPaths:
+        with open(os.path.join(siteDirPath, sRelativePath), 'rb') as fileHandler:
+            contents = fileHandler.read()
+        with open(os.path.join(hostDirPath, sRelativePath), 'rb') as fileHandler:
+            assert fileHandler.read() == contents
+    assert set(lstFilePaths) >= {os.path.join(hostDirPath, sRelativePath) for sRelativePath in lstProductPaths}
+    assert server.counts()["max_active"] <= 4
+
+def test_unmodified_pages_are_not_downloaded_again(site, tmp_path, capsys):
+    server, siteDirPath = site
+    dirDownload = str(tmp_path / "download")
+    cache = dc.DownloadCache(str(tmp_path / "cache.sqlite"))
+    fetcher, lstFilePaths = _fetch(server, dirDownload, cache=cache)
+    dictCounts = server.counts()
+    assert dictCounts["not_modified"] == 0
+
+    # One product page changes; all other pages are answered with 304 Not Modified and kept.
+    sChangedPath = _productPaths(siteDirPath)[0]
+    changedFilePath = os.path.join(siteDirPath, sChangedPath)
+    with open(changedFilePath, 'ab') as fileHandler:
+        fileHandler.write(b"<!-- changed -->")
+    os.utime(changedFilePath, (1.7e9, 1.7e9))
+    fetcher, lstSecondFilePaths = _fetch(server, dirDownload, cache=cache)
+    cache.close()
+    iRequests = server.counts()["requests"] - dictCounts["requests"]
+    iNotModified = server.counts()["not_modified"]
+    assert sorted(lstSecondFilePaths) == sorted(lstFilePaths)
+    assert iNotModified == len(lstFilePaths) - 1
+    # The same urls are requested, all but the changed page conditionally.
+    assert iRequests == dictCounts["requests"]
+    # Every page answered with 304 saves its stored size.
+    iBytesSaved = sum(os.path.getsize(filePath) for filePath in lstSecondFilePaths
+                      if not filePath.endswith(sChangedPath))
+    assert (fetcher._iNotModified, fetcher._iBytesSaved) == (iNotModified, iBytesSaved)
+    capsys.readouterr()
+    fetcher.printStatistics()
+    assert "Not modified: {0} of {1} requests ({2:.1%}), {3:.1f} MiB not downloaded again".format(
+        iNotModified, iRequests, iNotModified / iRequests, iBytesSaved / 2 ** 20) in capsys.readouterr().out
+    with open(os.path.join(dirDownload, wd.sProjectName, "127.0.0.1", sChangedPath), 'rb') as fileHandler:
+        assert fileHandler.read().endswith(b"<!-- changed -->")
+
+def test_page_edited_in_place_is_downloaded_again(site, tmp_path):
+    server, siteDirPath = site
+    dirDownload = str(tmp_path / "download")
+    cache = dc.DownloadCache(str(tmp_path / "cache.sqlite"))
+    _fetch(server, dirDownload, cache=cache)
+    sEditedPath = _productPaths(siteDirPath)[0]
+    editedFilePath = os.path.join(dirDownload, wd.sProjectName, "127.0.0.1", sEditedPath)
+    with open(editedFilePath, 'rb') as fileHandler:
+        contents = fileHandler.read()
+    # The same number of bytes, changed in the mirror only; the server still has the original page.
+    with open(editedFilePath, 'wb') as fileHandler:
+        fileHandler.write(contents.replace(b"<h1>", b"<H1>", 1))
+    iNotModified = server.counts()["not_modified"]
+    fetcher, lstFilePaths = _fetch(server, dirDownload, cache=cache)
+    cache.close()
+    assert server.counts()["not_modified"] - iNotModified == len(lstFilePaths) - 1
+    with open(editedFilePath, 'rb') as fileHandler:
+        assert fileHandler.read() == contents
+
+def test_page_touched_with_unchanged_content_keeps_its_validators(site, tmp_path):
+    server, siteDirPath = site
+    dirDownload = str(tmp_path / "download")
+    cache = dc.DownloadCache(str(tmp_path / "cache.sqlite"))
+    fetcher, lstFilePaths = _fetch(server, dirDownload, cache=cache)
+    os.utime(lstFilePaths[0], (1.5e9, 1.5e9))
+    iNotModified = server.counts()["not_modified"]
+    _fetch(server, dirDownload, cache=cache)
+    assert server.counts()["not_modified"] - iNotModified == len(lstFilePaths)
+    cache.close()
+
+def test_budget_fetches_recently_changed_products_first(site, tmp_path):
+    server, siteDirPath = site
+    lstRecentPaths = _productPaths(siteDirPath)[-3:]
+    for iPage, sRelativePath in enumerate(lstRecentPaths):
+        os.utime(os.path.join(siteDirPath, sRelativePath), (1.7e9 + iPage, 1.7e9 + iPage))
+    dirDownload = str(tmp_path / "download")
+    fetcher, lstFilePaths = _fetch(server, dirDownload, iMaxConnectionsPerHost=1, iMaxPages=5, bPriority=True)
+    hostDirPath = os.path.join(dirDownload, wd.sProjectName, "127.0.0.1")
+    assert lstFilePaths[:3] == [os.path.join(hostDirPath, sRelativePath) for sRelativePath in reversed(lstRecentPaths)]
+    assert len(lstFilePaths) == 5
+    assert sum(len(lstFileNames) for dirPath, lstDirNames, lstFileNames in os.walk(hostDirPath)) == 5
+
+def test_budget_index_holds_only_fetched_pages(site, tmp_path):
+    server, siteDirPath = site
+    dirDownload = str(tmp_path / "download")
+    _fetch(server, dirDownload)
+    # Pages of the earlier run stay in the mirror but are not indexed for the crawl of the budgeted download.
+    fetcher, lstFilePaths = _fetch(server, dirDownload, iMaxConnectionsPerHost=1, iMaxPages=5, bPriority=True)
+    indexPath = str(tmp_path / "file_index.txt")
+    lstIndexedPaths = wn.writeFileIndex(dirDownload, indexPath, lstFilePaths=lstFilePaths)
+    assert lstIndexedPaths == sorted(sFilePath for sFilePath in lstFilePaths if not sFilePath.endswith("index.html"))
+    assert len(lstIndexedPaths) == 5
+    assert wn.readFileIndex(indexPath, dirDownload) == lstIndexedPaths
+    assert len(wn.writeFileIndex(dirDownload, indexPath)) > 40
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def _drain(frontier, iWorkers):
+    # Urls handed out to a few workers, which queue the links of the pages they process.
+    async def work(lstUrls):
+        while True:
+            sUrl = await frontier.get()
+            if sUrl is None:
+                return
+            lstUrls.append(sUrl)
+            await asyncio.sleep(0)
+            for iLink in range(2):
+                frontier.add("{0}-{1}.html".format(sUrl[:-len(".html")], iLink))
+            frontier.taskDone()
+
+    async def run():
+        lstUrls = []
+        await asyncio.wait_for(asyncio.gather(*(work(lstUrls) for _ in range(iWorkers))), timeout=5.0)
+        await asyncio.wait_for(frontier.join(), timeout=5.0)
+        return lstUrls
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("iWorkers", [1, 4])
+def test_frontier_returns_none_once_the_crawl_is_over(iWorkers):
+    frontier = wd.UrlFrontier(["http://shop.test/a.html"], iMaxPages=15)
+    lstUrls = _drain(frontier, iWorkers)
+    assert len(lstUrls) == 15 and len(set(lstUrls)) == 15
+
+@pytest.mark.parametrize("iWorkers", [1, 4])
+def test_priority_frontier_returns_none_once_the_budget_is_used_up(iWorkers):
+    frontier = wd.PriorityFrontier(["http://shop.test/a.html"], iMaxPages=10)
+    lstUrls = _drain(frontier, iWorkers)
+    assert len(lstUrls) == 10 and len(set(lstUrls)) == 10
+    assert frontier.stop() == 0
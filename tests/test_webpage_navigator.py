@@ -0,0 +1,121 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawler
+import os
+import pytest
+import re
+import synthetic_corpus
+import webpage_navigator as wn
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Crawl time of the rows, which differs between otherwise identical crawls.
+_regexTimestamp = re.compile(rb"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d")
+
+@pytest.fixture(scope="module")
+def mirror(tmp_path_factory):
+    dirPath = str(tmp_path_factory.mktemp("corpus"))
+    synthetic_corpus.generateCorpus(dirPath, iProductPages=80, iOtherPages=10, iSeed=13, iFillerBytes=1000)
+    return dirPath
+
+def _touch(dirPath, *lstNames):
+    for sName in lstNames:
+        filePath = os.path.join(dirPath, sName)
+        os.makedirs(os.path.dirname(filePath), exist_ok=True)
+        with open(filePath, 'w') as fileHandler:
+            fileHandler.write("<html></html>")
+
+def _relativePaths(dirPath, lstFilePaths):
+    return [os.path.relpath(filePath, dirPath) for filePath in lstFilePaths]
+
+def _crawl(mirror, csvFilePath, iWorkers=None, iChunkSize=16):
+    with crawler.CrawlSession(csvFilePath) as session:
+        if iWorkers is None:
+            wn.crawlThroughSubDirs(mirror, session)
+        else:
+            wn.crawlThroughSubDirsParallel(mirror, session, iWorkers=iWorkers, iChunkSize=iChunkSize)
+        statistics = session.statistics()
+    with open(csvFilePath, 'rb') as fileHandler:
+        contents = _regexTimestamp.sub(b"TIMESTAMP", fileHandler.read())
+    return contents, (statistics.countOfCrawls(), statistics.successes(), statistics.countOfFails(),
+                      statistics.countOfExceptions(), statistics.rejectedPages())
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_parallel_crawl_is_deterministic(mirror, tmp_path):
+    contents, tplCounts = _crawl(mirror, str(tmp_path / "sequential.csv"))
+    assert tplCounts[1] + tplCounts[3] == 80
+    assert tplCounts[4] == 10
+    for iWorkers, iChunkSize in [(1, 16), (3, 16), (3, 1), (3, 7)]:
+        csvFilePath = str(tmp_path / "parallel_{0}_{1}.csv".format(iWorkers, iChunkSize))
+        assert _crawl(mirror, csvFilePath, iWorkers, iChunkSize) == (contents, tplCounts)
+
+def test_include_and_exclude_patterns(tmp_path):
+    dirPath = str(tmp_path)
+    _touch(dirPath, "index.html", "a.html", "b.htm", "c.txt", "d/index.html", "d/e.html", "skip/f.html",
+           "d/skip/g.html", "d/listing-1.html")
+    assert _relativePaths(dirPath, wn.iterHtmlFiles(dirPath)) == \
+        ["a.html", "d/e.html", "d/listing-1.html", "d/skip/g.html", "skip/f.html"]
+    assert _relativePaths(dirPath, wn.iterHtmlFiles(dirPath, lstIncludePatterns=["*.html", "*.htm"],
+                                                    lstExcludePatterns=["skip", "listing-*", "index.html"])) == \
+        ["a.html", "b.htm", "d/e.html"]
+    assert sorted(_relativePaths(dirPath, wn.iterHtmlFiles(dirPath, lstExcludePatterns=[]))) == \
+        ["a.html", "d/e.html", "d/index.html", "d/listing-1.html", "d/skip/g.html", "index.html", "skip/f.html"]
+    assert list(wn.iterHtmlFiles(dirPath, lstIncludePatterns=[])) == []
+
+def test_symbolic_link_loops_are_entered_once(tmp_path):
+    dirPath = str(tmp_path / "site")
+    _touch(dirPath, "a/a.html", "b/b.html")
+    os.symlink(dirPath, os.path.join(dirPath, "a", "root"))
+    os.symlink(os.path.join(dirPath, "a"), os.path.join(dirPath, "a", "self"))
+    os.symlink(os.path.join(dirPath, "b"), os.path.join(dirPath, "a", "to_b"))
+    os.symlink(os.path.join(dirPath, "b"), os.path.join(dirPath, "c"))
+    lstRelativePaths = _relativePaths(dirPath, wn.iterHtmlFiles(dirPath))
+    assert sorted(os.path.realpath(os.path.join(dirPath, sPath)) for sPath in lstRelativePaths) == \
+        [os.path.join(dirPath, "a", "a.html"), os.path.join(dirPath, "b", "b.html")]
+
+def test_file_index_round_trip(tmp_path):
+    dirPath = str(tmp_path / "site")
+    _touch(dirPath, "b/b.html", "a.html", "index.html", "c/skip.html")
+    indexPath = str(tmp_path / "file_index.txt")
+    lstFilePaths = wn.writeFileIndex(dirPath, indexPath, lstExcludePatterns=["skip.html", "index.html"])
+    assert _relativePaths(dirPath, lstFilePaths) == ["a.html", "b/b.html"]
+    assert wn.readFileIndex(indexPath) == lstFilePaths
+    assert wn.readFileIndex(indexPath, dirPath) == lstFilePaths
+    assert wn.collectHtmlFiles(dirPath, indexPath) == lstFilePaths
+    assert not os.path.exists(indexPath + ".tmp")
+
+def test_file_index_of_other_root_is_rejected(tmp_path):
+    dirPath = str(tmp_path / "site")
+    _touch(dirPath, "a.html", "b.html")
+    indexPath = str(tmp_path / "file_index.txt")
+    wn.writeFileIndex(dirPath, indexPath)
+    assert wn.readFileIndex(indexPath, str(tmp_path / "other")) is None
+    # collectHtmlFiles() replaces the index of another directory by one of its own.
+    otherDirPath = str(tmp_path / "other")
+    _touch(otherDirPath, "c.html")
+    assert _relativePaths(otherDirPath, wn.collectHtmlFiles(otherDirPath, indexPath)) == ["c.html"]
+    assert wn.readFileIndex(indexPath, dirPath) is None
+
+@pytest.mark.parametrize("sDamage", ["truncated", "extended", "header", "missing"])
+def test_incomplete_file_index_is_rejected(tmp_path, sDamage):
+    dirPath = str(tmp_path / "site")
+    _touch(dirPath, "a.html", "b.html", "c.html")
+    indexPath = str(tmp_path / "file_index.txt")
+    wn.writeFileIndex(dirPath, indexPath)
+    with open(indexPath, 'r') as fileHandler:
+        lstLines = fileHandler.read().splitlines(True)
+    if sDamage == "truncated":
+        lstLines = lstLines[:-1]
+    elif sDamage == "extended":
+        lstLines.append("d.html\n")
+    elif sDamage == "header":
+        lstLines[0] = lstLines[0][:10] + "\n"
+    else:
+        lstLines = []
+        os.remove(indexPath)
+    if lstLines:
+        with open(indexPath, 'w') as fileHandler:
+            fileHandler.write("".join(lstLines))
+    assert wn.readFileIndex(indexPath, dirPath) is None
+    assert _relativePaths(dirPath, wn.collectHtmlFiles(dirPath, indexPath)) == ["a.html", "b.html", "c.html"]
+    assert wn.readFileIndex(indexPath, dirPath) is not None
+
+# ----------------------------------------------------------------------------------------------------------------------
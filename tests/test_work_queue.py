@@ -0,0 +1,124 @@
+# ----------------------------------------------------------------------------------------------------------------------
+import crawler
+import os
+import pytest
+import random
+import re
+import synthetic_corpus
+import threading
+import time
+import work_queue as wq
+
+# ----------------------------------------------------------------------------------------------------------------------
+def _writePages(dirPath, iPages):
+    random.seed(2)
+    lstFilePaths = []
+    for i in range(iPages):
+        filePath = os.path.join(str(dirPath), "produkt-{0}.html".format(i))
+        with open(filePath, 'w', encoding="utf-8") as fileHandler:
+            fileHandler.write(synthetic_corpus.productPage("Getraenke", "Saft", "Saft {0}".format(i), "1 l", 1000))
+        lstFilePaths.append(filePath)
+    return lstFilePaths
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_runs(tmp_path):
+    workQueue = wq.WorkQueue(str(tmp_path / "queue.sqlite"))
+    assert workQueue.openRun() is None
+    workQueue.enqueue(str(tmp_path), [str(tmp_path / "a.html")], iBatchSize=1)
+    iRun = workQueue.openRun()
+    assert iRun is not None and not workQueue.isFinished(iRun)
+    lease = workQueue.claim("worker")
+    assert workQueue.complete(lease, "part")
+    assert workQueue.isFinished(iRun)
+    workQueue.closeRun()
+    assert workQueue.openRun() is None and workQueue.isFinished(iRun)
+    workQueue.enqueue(str(tmp_path), [str(tmp_path / "a.html")], iBatchSize=1)
+    assert workQueue.openRun() == iRun + 1 and workQueue.isFinished(iRun) and not workQueue.isFinished(iRun + 1)
+    workQueue.close()
+
+def test_worker_waits_for_the_run(tmp_path):
+    mirrorDirPath = tmp_path / "mirror"
+    mirrorDirPath.mkdir()
+    lstFilePaths = _writePages(mirrorDirPath, 6)
+    queuePath = str(tmp_path / "queue.sqlite")
+
+    # Finished batches of a previous run, which has been closed.
+    coordinatorQueue = wq.WorkQueue(queuePath)
+    coordinatorQueue.enqueue(str(mirrorDirPath), lstFilePaths[:1])
+    coordinatorQueue.complete(coordinatorQueue.claim("previous"), "part")
+    coordinatorQueue.closeRun()
+
+    lstCompleted = []
+
+    def work():
+        workerQueue = wq.WorkQueue(queuePath)
+        session = crawler.CrawlSession()
+        lstCompleted.append(wq.runWorker(workerQueue, session, iWorkers=1, sWorker="worker", dPollSeconds=0.05))
+        session.close()
+        workerQueue.close()
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    time.sleep(0.5)
+    assert thread.is_alive()
+    assert coordinatorQueue.enqueue(str(mirrorDirPath), lstFilePaths, iBatchSize=2) == 3
+    thread.join(60.0)
+    assert lstCompleted == [3]
+    assert coordinatorQueue.mergeParts(str(tmp_path / "merged.csv")) == 3
+    with open(str(tmp_path / "merged.csv"), 'r', encoding="utf-8") as fileHandler:
+        assert len(fileHandler.readlines()) == 1 + len(lstFilePaths)
+    coordinatorQueue.close()
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+class _LosingQueue(wq.WorkQueue):
+    # Loses the lease of the first batch it renews, as if another worker had taken it over.
+    def __init__(self, queuePath):
+        super().__init__(queuePath, dLeaseSeconds=0.2)
+        self._bLost = False
+
+    def renewIfDue(self, lease):
+        if not self._bLost:
+            self._bLost = True
+            return None
+        return super().renewIfDue(lease)
+
+def test_lost_batch_is_counted_once(tmp_path):
+    mirrorDirPath = tmp_path / "mirror"
+    mirrorDirPath.mkdir()
+    lstFilePaths = _writePages(mirrorDirPath, 4)
+    brokenFilePath = str(mirrorDirPath / "produkt-broken.html")
+    # A product page without price, which the crawler fails on.
+    with open(brokenFilePath, 'w', encoding="utf-8") as fileHandler:
+        fileHandler.write(re.sub('<div class="price">[^<]*</div>', "",
+                                 synthetic_corpus.productPage("Getraenke", "Saft", "Saft", "1 l", 1000)))
+    workQueue = _LosingQueue(str(tmp_path / "queue.sqlite"))
+    workQueue.enqueue(str(mirrorDirPath), [brokenFilePath] + lstFilePaths, iBatchSize=5)
+    session = crawler.CrawlSession()
+    # The batch is lost after its first page and crawled again once the lease has expired.
+    assert wq.runWorker(workQueue, session, iWorkers=1, sWorker="worker", dPollSeconds=0.05) == 1
+    session.close()
+    statistics = session.statistics()
+    assert statistics.successes() == len(lstFilePaths)
+    assert statistics.countOfExceptions() + statistics.countOfFails() == session.journal().countOfFailures() == 1
+    assert workQueue.mergeParts(str(tmp_path / "merged.csv")) == 1
+    workQueue.close()
+
+def test_failed_batch_is_not_merged(tmp_path):
+    mirrorDirPath = tmp_path / "mirror"
+    mirrorDirPath.mkdir()
+    lstFilePaths = _writePages(mirrorDirPath, 2)
+    workQueue = wq.WorkQueue(str(tmp_path / "queue.sqlite"), dLeaseSeconds=0.05, iMaxAttempts=1)
+    workQueue.enqueue(str(mirrorDirPath), lstFilePaths, iBatchSize=1)
+    # The worker of the first batch stalls; its lease expires and the batch is given up.
+    workQueue.claim("stalled")
+    time.sleep(0.1)
+    session = crawler.CrawlSession()
+    assert wq.runWorker(workQueue, session, iWorkers=1, sWorker="worker", dPollSeconds=0.05) == 1
+    session.close()
+    assert workQueue.counts()["failed"] == 1
+    mergedFilePath = str(tmp_path / "merged.csv")
+    with pytest.raises(RuntimeError, match="1 failed"):
+        workQueue.mergeParts(mergedFilePath)
+    assert not os.path.exists(mergedFilePath)
+    workQueue.close()
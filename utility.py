@@ -1,6 +1,8 @@
 # ----------------------------------------------------------------------------------------------------------------------
+from contextlib import contextmanager
 from pathlib import Path
 
+import mmap
 import os
 import shutil
 import sys
@@ -41,30 +43,20 @@ def createFileIfNotExist(filePath, removeIfExists=False):
         pathOfFile.touch(exist_ok=True)
         return
 
-# ----------------------------------------------------------------------------------------------------------------------
-def seperateStringNumber(string):
+#-----------------------------------------------------------------------------------------------------------------------
+@contextmanager
+def mapFile(filePath):
     """
-    Creates separate strings and numbers to access only package size from product name
-        string: Product Name.
+    Memory-maps the specified file read-only and yields its contents as mmap object (empty bytes for an empty file,
+    which cannot be mapped). Slicing the contents only reads the accessed pages, no str copy is made.
+        filePath: Path to the file.
     """
-    previous_character = string[0]
-    groups = []
-    newword = string[0]
-    for x, i in enumerate(string[1:]):
-        if i.isalpha() and previous_character.isalpha():
-            newword += i
-        elif i.isnumeric() and previous_character.isnumeric():
-            newword += i
-        else:
-            groups.append(newword)
-            newword = i
-
-        previous_character = i
-
-        if x == len(string) - 2:
-            groups.append(newword)
-            newword = ''
-    return groups
+    with open(filePath, "rb") as fileHandler:
+        if os.fstat(fileHandler.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fileHandler.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+            yield contents
 
 #-----------------------------------------------------------------------------------------------------------------------
 def replaceAll(text, dic):
@@ -1,25 +1,881 @@
-# ----------------------------------------------------------------------------------------------------------------------
-import datetime
-
-from datetime import datetime
-from pywebcopy import save_website
-
-# ----------------------------------------------------------------------------------------------------------------------
-def downloadWebPage(url, dirDownload):
-    """
-    Downloads whole webpage from the specified url.
-        url: The base url to download.
-        dirDownload: Directory path where the webpage should be downloaded to.
-    """
-
-    beginTime = datetime.now()
-    kwargs = {"bypass_robots": True, "project_name": "recognisable-name", "load_css": False, "load_images": False,
-              "load_javascript": False}
-    try:
-        save_website(url=url, project_folder=dirDownload, **kwargs)
-    except:
-        print("Downloading webpage from '{0}' failed".format(url))
-
-    print("Total run time taken by script: {0}".format(datetime.now() - beginTime))
-
-# ----------------------------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------------------------
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote, urldefrag, urljoin, urlsplit, urlunsplit
+
+import asyncio
+import crawler
+import download_cache as dc
+import gzip
+import hashlib
+import math
+import os
+import re
+import ssl
+import webpage_navigator as wn
+import xml.etree.ElementTree as ElementTree
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Name of the directory below the download directory the hosts are mirrored to, as pywebcopy named its project folder.
+sProjectName = "recognisable-name"
+
+# Links to files with these extensions are not followed; only html pages are mirrored (no css, images or scripts).
+_setSkippedExtensions = {".css", ".js", ".json", ".xml", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico",
+                         ".bmp", ".pdf", ".zip", ".gz", ".mp3", ".mp4", ".woff", ".woff2", ".ttf", ".eot"}
+
+# Links of the a tags of a page; the page is scanned as bytes without building a tree.
+_regexLinks = re.compile(rb"""<a\s[^>]*?href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+# Breadcrumb of a page, whose links lead to the category pages the page is listed on.
+_regexBreadcrumb = re.compile(rb"""<(div|nav|ol|ul)\s[^>]*?class\s*=\s*["'][^"']*breadcrumb[^"']*["'][^>]*>(.*?)</\1>""",
+                              re.IGNORECASE | re.DOTALL)
+
+# Url path patterns (fnmatch syntax) classifying the urls before they are fetched, see classifyUrl(). The listing
+# patterns (category pages) are checked first; paths matching neither are other pages.
+lstListingPatterns = ["*/", "*/index.html"]
+lstProductPatterns = ["*.html"]
+
+_regexListing = wn.compilePatterns(lstListingPatterns)
+_regexProduct = wn.compilePatterns(lstProductPatterns)
+
+# Maximum number of sitemaps read per crawl, including the ones listed in sitemap indexes.
+_iMaxSitemaps = 1000
+
+_sUserAgent = "Mozilla/5.0 (compatible; grocery_crawler)"
+
+# Characters which are left as they are when a url is percent-encoded (reserved characters and the percent sign).
+_sSafeCharacters = "/%:@!$&'()*+,;=?~"
+
+# ----------------------------------------------------------------------------------------------------------------------
+def downloadWebPage(url, dirDownload, iMaxConnectionsPerHost=8, dRequestsPerSecond=None, iMaxPages=None, journal=None,
+                    cache=None, bPriority=False, dBudgetSeconds=None):
+    """
+    Downloads whole webpage from the specified url.
+        url: The base url to download.
+        dirDownload: Directory path where the webpage should be downloaded to.
+        iMaxConnectionsPerHost: Maximum number of concurrent requests (and keep-alive connections) per host.
+        dRequestsPerSecond: Maximum number of requests per second per host; None does not limit the rate.
+        iMaxPages: Maximum number of pages requested; None downloads every page found.
+        journal: FailureJournal the failed downloads are recorded in; None only counts them.
+        cache: DownloadCache of the previous runs; pages not modified since are not downloaded again. None downloads
+               every page.
+        bPriority: Boolean if the crawl should be seeded from the sitemaps and fetch the most valuable pages first,
+                   see PriorityFrontier; iMaxPages is then the budget of pages fetched.
+        dBudgetSeconds: Time after which no further pages are requested; None downloads until done.
+    Returns the list of paths of the pages stored or found unchanged by the download, or None if the download failed.
+    """
+
+    beginTime = datetime.now()
+    fetcher = SiteFetcher(dirDownload, iMaxConnectionsPerHost=iMaxConnectionsPerHost,
+                          dRequestsPerSecond=dRequestsPerSecond, iMaxPages=iMaxPages, journal=journal,
+                          cache=cache, bPriority=bPriority, dBudgetSeconds=dBudgetSeconds)
+    lstFilePaths = None
+    try:
+        lstFilePaths = asyncio.run(fetcher.run([url]))
+    except Exception as exception:
+        print("Downloading webpage from '{0}' failed: {1}".format(url, exception))
+    fetcher.printStatistics()
+
+    print("Total run time taken by script: {0}".format(datetime.now() - beginTime))
+    return lstFilePaths
+
+# ----------------------------------------------------------------------------------------------------------------------
+def mirrorPath(sUrl):
+    """
+    Returns the path a page is stored at in a mirror, relative to the project folder: the host followed by the url
+    path, index.html for directories. Paths without extension get .html appended, so the crawler finds the page, and
+    a query is kept as a short hash in front of the extension, so pages differing in the query do not overwrite each
+    other.
+        sUrl: Url of the page.
+    """
+    parts = urlsplit(sUrl)
+    sPath = unquote(parts.path) or "/"
+    if sPath.endswith("/"):
+        sPath += "index.html"
+    sRoot, sExtension = os.path.splitext(sPath)
+    if not sExtension:
+        sExtension = ".html"
+    if parts.query:
+        sRoot += "_" + hashlib.md5(parts.query.encode("utf-8")).hexdigest()[:8]
+    lstSegments = [sSegment for sSegment in (sRoot + sExtension).split("/") if sSegment not in ("", ".", "..")]
+    return os.path.join(parts.hostname or "", *lstSegments)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def normalizeUrl(sUrl, sBaseUrl=None):
+    """
+    Returns the absolute url without fragment, with lower case scheme and host, without default port and with the
+    non-ascii characters of path and query percent-encoded, or None for links which are no http(s) urls (e.g. mailto:
+    or javascript:).
+        sUrl: Absolute url or link relative to the base url.
+        sBaseUrl: Url of the page the link was found on.
+    """
+    sUrl = sUrl.strip()
+    if sBaseUrl is not None:
+        sUrl = urljoin(sBaseUrl, sUrl)
+    parts = urlsplit(urldefrag(sUrl)[0])
+    sScheme = parts.scheme.lower()
+    if sScheme not in ("http", "https") or not parts.hostname:
+        return None
+    sNetloc = parts.hostname.lower()
+    if parts.port is not None and parts.port != (443 if sScheme == "https" else 80):
+        sNetloc += ":{0}".format(parts.port)
+    sPath = quote(parts.path or "/", safe=_sSafeCharacters)
+    return urlunsplit((sScheme, sNetloc, sPath, quote(parts.query, safe=_sSafeCharacters), ""))
+
+# ----------------------------------------------------------------------------------------------------------------------
+def classifyUrl(sUrl):
+    """
+    Returns the class of the page at the url, "listing", "product" or "other", from its path alone (see
+    lstListingPatterns and lstProductPatterns), so the page can be scheduled before it is fetched.
+        sUrl: Normalized url of the page.
+    """
+    sPath = urlsplit(sUrl).path or "/"
+    if _regexListing is not None and _regexListing.match(sPath):
+        return "listing"
+    if _regexProduct is not None and _regexProduct.match(sPath):
+        return "product"
+    return "other"
+
+# ----------------------------------------------------------------------------------------------------------------------
+def parseSitemap(contents):
+    """
+    Parses a sitemap or sitemap index (sitemaps.org protocol), also gzip compressed.
+    Returns a tuple of the list of urls of further sitemaps and the list of tuples of url, lastmod and priority
+    (None where missing) of the pages. An invalid sitemap gives empty lists.
+        contents: Raw bytes of the sitemap.
+    """
+    lstSitemapUrls, lstEntries = [], []
+    try:
+        if contents[:2] == b"\x1f\x8b":
+            contents = gzip.decompress(contents)
+        root = ElementTree.fromstring(contents)
+    except (OSError, EOFError, ElementTree.ParseError):
+        return lstSitemapUrls, lstEntries
+    for element in root:
+        dictFields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in element}
+        if not dictFields.get("loc"):
+            continue
+        sTag = element.tag.rsplit("}", 1)[-1]
+        if sTag == "sitemap":
+            lstSitemapUrls.append(dictFields["loc"])
+        elif sTag == "url":
+            try:
+                dPriority = float(dictFields["priority"]) if dictFields.get("priority") else None
+            except ValueError:
+                dPriority = None
+            lstEntries.append((dictFields["loc"], dictFields.get("lastmod") or None, dPriority))
+    return lstSitemapUrls, lstEntries
+
+# ----------------------------------------------------------------------------------------------------------------------
+class HttpError(Exception):
+    """
+    Raised for responses which cannot be read, e.g. an invalid status line or an unsupported content encoding.
+    """
+
+# ----------------------------------------------------------------------------------------------------------------------
+class HttpClient:
+    """
+    Minimal asynchronous HTTP/1.1 client on top of asyncio streams. Connections are kept alive and pooled per host,
+    so a crawl of thousands of pages opens only as many connections as requests run concurrently. Responses are
+    requested compressed (gzip and deflate, br if the brotli package is installed) and decoded. Only GET requests
+    are supported, which is all a mirror needs.
+    """
+
+    def __init__(self, dTimeoutSeconds=30.0):
+        """
+            dTimeoutSeconds: Maximum time of a request, from connecting until the body is read.
+        """
+        self._dTimeoutSeconds = dTimeoutSeconds
+        self._dictIdleConnections = {}
+        self._sslContext = None
+        self._sAcceptEncoding = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+        self._iConnections = 0
+
+    def countOfConnections(self):
+        """
+        Returns the number of connections opened so far.
+        """
+        return self._iConnections
+
+    async def get(self, sUrl, dictRequestHeaders=None):
+        """
+        Requests the url and returns a tuple of status code, dictionary of the response headers (lower case names)
+        and the decoded body. A pooled connection closed by the server in the meantime is replaced by a new one.
+            sUrl: Absolute http(s) url.
+            dictRequestHeaders: Additional request headers, e.g. the conditional headers If-None-Match and
+                                If-Modified-Since.
+        """
+        parts = urlsplit(sUrl)
+        bHttps = parts.scheme == "https"
+        tplKey = (parts.scheme, parts.hostname, parts.port or (443 if bHttps else 80))
+        sTarget = urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        sHost = parts.netloc
+        lstHeaders = ["GET {0} HTTP/1.1".format(sTarget), "Host: {0}".format(sHost),
+                      "User-Agent: {0}".format(_sUserAgent), "Accept: text/html,*/*;q=0.8",
+                      "Accept-Encoding: {0}".format(self._sAcceptEncoding), "Connection: keep-alive"]
+        if dictRequestHeaders:
+            lstHeaders.extend("{0}: {1}".format(sName, sValue) for sName, sValue in dictRequestHeaders.items())
+        request = ("\r\n".join(lstHeaders) + "\r\n\r\n").encode("latin-1")
+
+        while True:
+            reader, writer, bReused = await self._connection(tplKey)
+            try:
+                writer.write(request)
+                iStatus, dictHeaders, body, bKeepAlive = await asyncio.wait_for(
+                    self._readResponse(reader), self._dTimeoutSeconds)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, HttpError) as exception:
+                writer.close()
+                if bReused and not isinstance(exception, asyncio.TimeoutError):
+                    # The server closed the idle connection; try again once per pooled connection.
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if bKeepAlive:
+                self._dictIdleConnections.setdefault(tplKey, []).append((reader, writer))
+            else:
+                writer.close()
+            return iStatus, dictHeaders, _decode(body, dictHeaders.get("content-encoding", ""))
+
+    async def close(self):
+        """
+        Closes all idle connections.
+        """
+        for lstConnections in self._dictIdleConnections.values():
+            for reader, writer in lstConnections:
+                writer.close()
+        self._dictIdleConnections.clear()
+
+    async def _connection(self, tplKey):
+        lstIdle = self._dictIdleConnections.get(tplKey)
+        while lstIdle:
+            reader, writer = lstIdle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        sScheme, sHostName, iPort = tplKey
+        if sScheme == "https" and self._sslContext is None:
+            self._sslContext = ssl.create_default_context()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(sHostName, iPort, ssl=self._sslContext if sScheme == "https" else None),
+            self._dTimeoutSeconds)
+        self._iConnections += 1
+        return reader, writer, False
+
+    async def _readResponse(self, reader):
+        sStatusLine = await reader.readline()
+        if not sStatusLine:
+            raise ConnectionResetError("Connection closed by the server.")
+        lstStatus = sStatusLine.split(None, 2)
+        if len(lstStatus) < 2 or not lstStatus[0].startswith(b"HTTP/") or not lstStatus[1].isdigit():
+            raise HttpError("Invalid status line {0!r}.".format(sStatusLine[:100]))
+        iStatus = int(lstStatus[1])
+        dictHeaders = await _readHeaders(reader)
+
+        sConnection = dictHeaders.get("connection", "").lower()
+        bKeepAlive = "close" not in sConnection and (lstStatus[0] != b"HTTP/1.0" or "keep-alive" in sConnection)
+        if iStatus in (204, 304) or 100 <= iStatus < 200:
+            body = b""
+        elif "chunked" in dictHeaders.get("transfer-encoding", "").lower():
+            lstChunks = []
+            while True:
+                iSize = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if iSize == 0:
+                    await _readHeaders(reader)
+                    break
+                lstChunks.append(await reader.readexactly(iSize))
+                await reader.readexactly(2)
+            body = b"".join(lstChunks)
+        elif "content-length" in dictHeaders:
+            body = await reader.readexactly(int(dictHeaders["content-length"]))
+        else:
+            # The body ends with the connection.
+            body = await reader.read()
+            bKeepAlive = False
+        return iStatus, dictHeaders, body, bKeepAlive
+
+async def _readHeaders(reader):
+    dictHeaders = {}
+    while True:
+        sLine = await reader.readline()
+        if not sLine.strip():
+            return dictHeaders
+        sName, _, sValue = sLine.decode("latin-1").partition(":")
+        sName = sName.strip().lower()
+        dictHeaders[sName] = dictHeaders[sName] + ", " + sValue.strip() if sName in dictHeaders else sValue.strip()
+
+def _decode(body, sEncoding):
+    sEncoding = sEncoding.strip().lower()
+    if sEncoding in ("", "identity"):
+        return body
+    if sEncoding in ("gzip", "x-gzip"):
+        return gzip.decompress(body)
+    if sEncoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate data without zlib header.
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    if sEncoding == "br" and brotli is not None:
+        return brotli.decompress(body)
+    raise HttpError("Unsupported content encoding '{0}'.".format(sEncoding))
+
+# ----------------------------------------------------------------------------------------------------------------------
+class HostLimiter:
+    """
+    Limits the requests to one host: at most iMaxConnections requests run at the same time and, if a rate is given,
+    consecutive requests are started at least 1 / dRequestsPerSecond seconds apart. Used as async context manager
+    around a request; all users have to run in the same event loop.
+    """
+
+    def __init__(self, iMaxConnections, dRequestsPerSecond=None):
+        """
+            iMaxConnections: Maximum number of concurrent requests.
+            dRequestsPerSecond: Maximum number of requests per second; None does not limit the rate.
+        """
+        self._semaphore = asyncio.Semaphore(iMaxConnections)
+        self._dInterval = 1.0 / dRequestsPerSecond if dRequestsPerSecond else 0.0
+        self._dNextTime = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self._dInterval > 0.0:
+            # Reserve the next free start time before sleeping, so waiting requests are spaced out evenly.
+            dNow = asyncio.get_running_loop().time()
+            dStartTime = max(dNow, self._dNextTime)
+            self._dNextTime = dStartTime + self._dInterval
+            if dStartTime > dNow:
+                await asyncio.sleep(dStartTime - dNow)
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback):
+        self._semaphore.release()
+
+# ----------------------------------------------------------------------------------------------------------------------
+class UrlFrontier:
+    """
+    Queue of the urls still to be downloaded, in the order they are found. Every url is queued only once (after
+    normalization), only urls of the hosts of the start urls are queued, and links to non-html files are skipped.
+    The number of queued urls can be limited. The crawl is over once no url is queued or being processed (handed out
+    by get() and not marked by taskDone() yet); get() then returns None to every worker.
+    """
+
+    def __init__(self, lstStartUrls, iMaxPages=None):
+        """
+            lstStartUrls: Urls the crawl starts with; their hosts are the ones which are mirrored.
+            iMaxPages: Maximum number of urls queued; None queues every url found.
+        """
+        self._queue = self._createQueue()
+        self._setSeen = set()
+        self._iMaxPages = iMaxPages
+        self._bStopped = False
+        self._iInProgress = 0
+        self._eventOver = asyncio.Event()
+        lstStartUrls = [normalizeUrl(sUrl) for sUrl in lstStartUrls]
+        self._setHosts = {urlsplit(sUrl).netloc for sUrl in lstStartUrls if sUrl is not None}
+        for sUrl in lstStartUrls:
+            if sUrl is not None:
+                self.add(sUrl)
+
+    def add(self, sUrl, sBaseUrl=None, sLastModified=None, dPriority=None, bBreadcrumb=False):
+        """
+        Queues the url if it has not been queued before and belongs to the mirrored hosts.
+        Returns True if the url has been queued.
+            sUrl: Absolute url or link relative to the base url.
+            sBaseUrl: Url of the page the link was found on.
+            sLastModified: Date of the last change of the page from a sitemap (lastmod); see PriorityFrontier.
+            dPriority: Priority of the page from a sitemap; see PriorityFrontier.
+            bBreadcrumb: Boolean if the link was found in the breadcrumb of a page; see PriorityFrontier.
+        """
+        sUrl = normalizeUrl(sUrl, sBaseUrl)
+        if sUrl is None or sUrl in self._setSeen or self._bStopped or not self._inScope(sUrl):
+            return False
+        if self._iMaxPages is not None and len(self._setSeen) >= self._iMaxPages:
+            return False
+        self._setSeen.add(sUrl)
+        self._queue.put_nowait(sUrl)
+        return True
+
+    def hosts(self):
+        """
+        Returns the set of the mirrored hosts.
+        """
+        return self._setHosts
+
+    def countOfUrls(self):
+        """
+        Returns the number of urls queued so far.
+        """
+        return len(self._setSeen)
+
+    async def get(self):
+        """
+        Returns the next url to download, waiting until one is queued, or None once the crawl is over.
+        """
+        self._checkOver()
+        sUrl = await self._queue.get()
+        if sUrl is None:
+            # Passed on to the next waiting worker.
+            self._queue.put_nowait(sUrl)
+            return None
+        self._iInProgress += 1
+        return sUrl
+
+    def taskDone(self):
+        """
+        Marks the url returned by the last get() of a worker as processed.
+        """
+        self._iInProgress -= 1
+        self._checkOver()
+
+    async def join(self):
+        """
+        Waits until the crawl is over, i.e. every queued url has been processed.
+        """
+        await self._eventOver.wait()
+
+    def stop(self):
+        """
+        Drops all queued urls and queues no further ones, e.g. when the time budget of the crawl is used up. The
+        urls handed out already are still processed; the crawl is over once they are.
+        Returns the number of dropped urls.
+        """
+        self._bStopped = True
+        iDropped = 0
+        while not self._queue.empty():
+            if self._queue.get_nowait() is not None:
+                iDropped += 1
+        self._checkOver()
+        return iDropped
+
+    def printStatistics(self):
+        print("Urls queued: {0}".format(len(self._setSeen)))
+
+    def _createQueue(self):
+        return asyncio.Queue()
+
+    def _overEntry(self):
+        # Queue entry get() returns None for.
+        return None
+
+    def _checkOver(self):
+        # Wakes the workers waiting in get() once no url is queued or being processed; the entry stays queued.
+        if self._iInProgress == 0 and self._queue.empty():
+            self._eventOver.set()
+            self._queue.put_nowait(self._overEntry())
+
+    def _inScope(self, sUrl):
+        parts = urlsplit(sUrl)
+        return parts.netloc in self._setHosts and os.path.splitext(parts.path)[1].lower() not in _setSkippedExtensions
+
+# ----------------------------------------------------------------------------------------------------------------------
+class PriorityFrontier(UrlFrontier):
+    """
+    Frontier handing out the most valuable urls first, for crawls seeded from sitemaps and limited by a budget.
+    The urls are classified before they are fetched (see classifyUrl()): product pages come first, then the category
+    pages linked from the breadcrumbs of pages, the other listing pages and all other pages last. Within a class, urls
+    with a higher sitemap priority come first, then the ones changed most recently (sitemap lastmod), then the ones
+    found first. A url found again with a better rank, e.g. in a breadcrumb or a sitemap, moves up; its outdated
+    queue entry is skipped. The budget iMaxPages limits the number of urls handed out (not the number queued), so a
+    limited crawl fetches the most valuable pages known at any time. Once the budget is used up, the frontier is
+    stopped and get() returns None.
+    """
+
+    # Rank of every url class, lower ranks are fetched first.
+    _dictClassRanks = {"product": 0, "breadcrumb": 1, "listing": 2, "other": 3}
+
+    def __init__(self, lstStartUrls, iMaxPages=None):
+        """
+            lstStartUrls: Urls the crawl starts with; their hosts are the ones which are mirrored.
+            iMaxPages: Maximum number of urls handed out; None hands out every url found.
+        """
+        self._dictKeys = {}
+        self._setHandedOut = set()
+        self._counterClasses = Counter()
+        self._iBudgetPages = iMaxPages
+        super().__init__(lstStartUrls)
+
+    def add(self, sUrl, sBaseUrl=None, sLastModified=None, dPriority=None, bBreadcrumb=False):
+        """
+        Queues the url if it belongs to the mirrored hosts and has not been handed out yet, or moves it up if it is
+        queued with a worse rank.
+        Returns True if the url has been queued for the first time.
+            sUrl: Absolute url or link relative to the base url.
+            sBaseUrl: Url of the page the link was found on.
+            sLastModified: Date of the last change of the page from a sitemap (lastmod, W3C datetime).
+            dPriority: Priority of the page from a sitemap, from 0.0 to 1.0; None uses the default 0.5.
+            bBreadcrumb: Boolean if the link was found in the breadcrumb of a page.
+        """
+        sUrl = normalizeUrl(sUrl, sBaseUrl)
+        if sUrl is None or sUrl in self._setHandedOut or self._bStopped or not self._inScope(sUrl):
+            return False
+        sClass = classifyUrl(sUrl)
+        if bBreadcrumb and sClass == "listing":
+            sClass = "breadcrumb"
+        tplRank = (self._dictClassRanks[sClass], -(dPriority if dPriority is not None else 0.5),
+                   -_timestamp(sLastModified))
+        tplPreviousKey = self._dictKeys.get(sUrl)
+        if tplPreviousKey is None:
+            tplKey = tplRank + (len(self._dictKeys),)
+        else:
+            tplKey = tuple(min(previous, current) for previous, current in zip(tplPreviousKey, tplRank)) + \
+                tplPreviousKey[3:]
+            if tplKey == tplPreviousKey:
+                return False
+        self._dictKeys[sUrl] = tplKey
+        self._setSeen.add(sUrl)
+        self._queue.put_nowait((tplKey, sUrl))
+        return tplPreviousKey is None
+
+    async def get(self):
+        """
+        Returns the most valuable url to download, waiting until one is queued, or None once the crawl is over. Once
+        the budget is used up, the queued urls are dropped and None is returned as soon as the urls handed out
+        already have been processed.
+        """
+        while True:
+            self._checkOver()
+            tplKey, sUrl = await self._queue.get()
+            if sUrl is None:
+                self._queue.put_nowait((tplKey, sUrl))
+                return None
+            if sUrl in self._setHandedOut or self._dictKeys[sUrl] != tplKey:
+                continue
+            if self._iBudgetPages is not None and len(self._setHandedOut) >= self._iBudgetPages:
+                self.stop()
+                continue
+            self._setHandedOut.add(sUrl)
+            self._counterClasses[tplKey[0]] += 1
+            self._iInProgress += 1
+            return sUrl
+
+    def stop(self):
+        """
+        Drops all queued urls and queues no further ones, e.g. when the time budget of the crawl is used up.
+        Returns the number of dropped urls, not counting outdated queue entries.
+        """
+        self._bStopped = True
+        iDropped = 0
+        while not self._queue.empty():
+            tplKey, sUrl = self._queue.get_nowait()
+            if sUrl is not None and sUrl not in self._setHandedOut and self._dictKeys[sUrl] == tplKey:
+                iDropped += 1
+        self._checkOver()
+        return iDropped
+
+    def printStatistics(self):
+        dictRankNames = {iRank: sClass for sClass, iRank in self._dictClassRanks.items()}
+        print("Urls fetched by class: {0}".format(", ".join(
+            "{0}: {1}".format(dictRankNames[iRank], iCount) for iRank, iCount in sorted(self._counterClasses.items()))))
+        if self._bStopped:
+            print("Budget used up, urls not fetched: {0}".format(len(self._dictKeys) - len(self._setHandedOut)))
+
+    def _createQueue(self):
+        return asyncio.PriorityQueue()
+
+    def _overEntry(self):
+        # Ranked after every url.
+        return (math.inf,), None
+
+def _timestamp(sLastModified):
+    # Seconds since the epoch of a W3C datetime (e.g. 2024-05-31 or 2024-05-31T08:15:00+02:00), 0.0 if unknown.
+    if not sLastModified:
+        return 0.0
+    try:
+        dateTime = datetime.fromisoformat(sLastModified.strip())
+    except ValueError:
+        return 0.0
+    if dateTime.tzinfo is None:
+        dateTime = dateTime.replace(tzinfo=timezone.utc)
+    return dateTime.timestamp()
+
+# ----------------------------------------------------------------------------------------------------------------------
+class SiteFetcher:
+    """
+    Concurrent site downloader replacing pywebcopy.save_website(). Workers take the urls from a UrlFrontier, request
+    them through a pooled keep-alive HttpClient within the limits of their host (HostLimiter), store the html pages
+    below dirDownload/sProjectName in the layout of mirrorPath() and queue the links found on the pages. Redirect
+    targets are queued like links. Requests failing with a connection error, a timeout, 429 or a 5xx status are
+    retried with exponential backoff.
+    With a DownloadCache the pages stored by a previous run are requested conditionally; on 304 Not Modified the
+    stored page is kept and only its links are read from disk.
+    With a consumer the pages are not stored at all but handed to the consumer as bytes, see crawl_fused.FusedCrawl.
+    With bPriority the urls are scheduled by a PriorityFrontier, which is seeded with the pages of the sitemaps of
+    the hosts (listed in robots.txt, otherwise /sitemap.xml) before the crawl starts, and the crawl can be limited by
+    a budget of pages and of time, so a time-boxed run fetches the most valuable pages first.
+    """
+
+    def __init__(self, dirDownload, iMaxConnectionsPerHost=8, dRequestsPerSecond=None, iMaxPages=None,
+                 dTimeoutSeconds=30.0, iRetries=2, journal=None, cache=None, consumer=None, bPriority=False,
+                 dBudgetSeconds=None):
+        """
+            dirDownload: Directory path where the webpage should be downloaded to.
+            iMaxConnectionsPerHost: Maximum number of concurrent requests (and keep-alive connections) per host.
+            dRequestsPerSecond: Maximum number of requests per second per host; None does not limit the rate.
+            iMaxPages: Maximum number of pages requested; None downloads every page found.
+            dTimeoutSeconds: Maximum time of a request.
+            iRetries: Number of times a failed request is repeated.
+            journal: FailureJournal the failed downloads are recorded in; None only counts them.
+            cache: DownloadCache of the previous runs; None downloads every page. Cannot be combined with a consumer,
+                   as the cache needs the pages stored in the mirror.
+            consumer: Object whose coroutine consume(sUrl, filePath, contents) is awaited for every html page instead
+                      of storing it at filePath; None stores the pages.
+            bPriority: Boolean if the crawl should be seeded from the sitemaps and fetch the most valuable pages first.
+            dBudgetSeconds: Time after which no further pages are requested (the pending ones are completed); None
+                            downloads until done.
+        """
+        if cache is not None and consumer is not None:
+            raise ValueError("A download cache cannot be combined with a page consumer.")
+        self._projectDirPath = os.path.join(dirDownload, sProjectName)
+        self._iMaxConnectionsPerHost = iMaxConnectionsPerHost
+        self._dRequestsPerSecond = dRequestsPerSecond
+        self._iMaxPages = iMaxPages
+        self._dTimeoutSeconds = dTimeoutSeconds
+        self._iRetries = iRetries
+        self._journal = journal
+        self._cache = cache
+        self._consumer = consumer
+        self._bPriority = bPriority
+        self._dBudgetSeconds = dBudgetSeconds
+        self._dictLimiters = {}
+        self._client = None
+        self._frontier = None
+        self._counterStatus = Counter()
+        self._iRequests = 0
+        self._iPages = 0
+        self._iBytes = 0
+        self._iFailures = 0
+        self._iNotModified = 0
+        self._iBytesSaved = 0
+        self._iUnchangedPages = 0
+        self._iSitemapUrls = 0
+        self._dSeconds = 0.0
+
+    async def run(self, lstStartUrls):
+        """
+        Downloads all pages reachable from the start urls on their hosts.
+        Returns the list of the paths of the stored pages.
+            lstStartUrls: Urls the crawl starts with.
+        """
+        loop = asyncio.get_running_loop()
+        dBeginTime = loop.time()
+        self._client = HttpClient(self._dTimeoutSeconds)
+        lstFilePaths = []
+        lstWorkers = []
+        try:
+            if self._bPriority:
+                self._frontier = PriorityFrontier(lstStartUrls, self._iMaxPages)
+                await self._seedFromSitemaps(lstStartUrls)
+            else:
+                self._frontier = UrlFrontier(lstStartUrls, self._iMaxPages)
+            iWorkers = self._iMaxConnectionsPerHost * max(1, len(self._frontier.hosts()))
+            # The workers return once the frontier is done with the crawl.
+            lstWorkers = [asyncio.ensure_future(self._work(lstFilePaths)) for _ in range(iWorkers)]
+            dTimeout = None
+            if self._dBudgetSeconds is not None:
+                dTimeout = max(0.0, self._dBudgetSeconds - (loop.time() - dBeginTime))
+            _, setPending = await asyncio.wait(lstWorkers, timeout=dTimeout)
+            if setPending:
+                # Time is up: no further urls are handed out, the pages being downloaded are completed.
+                self._frontier.stop()
+                await asyncio.wait(setPending)
+        finally:
+            # Only when the run itself is cancelled or fails; the frontier is stopped as well, so a worker which
+            # swallows the cancellation (asyncio.wait_for() does as the response is read) returns after its page.
+            lstWorkers = [worker for worker in lstWorkers if not worker.done()]
+            if lstWorkers:
+                self._frontier.stop()
+                for worker in lstWorkers:
+                    worker.cancel()
+                await asyncio.wait(lstWorkers)
+            await self._client.close()
+            self._dSeconds = loop.time() - dBeginTime
+        return lstFilePaths
+
+    def printStatistics(self):
+        """
+        Prints the number of requests, stored pages and bytes, connections and failures of the last run.
+        """
+        dSeconds = max(self._dSeconds, 1e-9)
+        print("Downloaded pages: {0} ({1:.1f} MiB) in {2:.1f} s, {3:.1f} requests/s".format(
+            self._iPages, self._iBytes / 2 ** 20, self._dSeconds, self._iRequests / dSeconds))
+        print("Requests: {0}, connections: {1}, failed urls: {2}".format(
+            self._iRequests, self._client.countOfConnections() if self._client is not None else 0, self._iFailures))
+        print("Status codes: {0}".format(", ".join("{0}: {1}".format(iStatus, iCount)
+                                                   for iStatus, iCount in sorted(self._counterStatus.items()))))
+        if self._cache is not None:
+            print("Not modified: {0} of {1} requests ({2:.1%}), {3:.1f} MiB not downloaded again".format(
+                self._iNotModified, self._iRequests, self._iNotModified / max(self._iRequests, 1),
+                self._iBytesSaved / 2 ** 20))
+            print("Downloaded again with unchanged content (not rewritten): {0}".format(self._iUnchangedPages))
+        if self._bPriority:
+            print("Pages listed in sitemaps: {0}".format(self._iSitemapUrls))
+        if self._frontier is not None:
+            self._frontier.printStatistics()
+
+    async def _seedFromSitemaps(self, lstStartUrls):
+        # Queues the pages of the sitemaps named in robots.txt of every host, or of /sitemap.xml if there are none.
+        lstSitemapUrls = []
+        for sStartUrl in lstStartUrls:
+            parts = urlsplit(normalizeUrl(sStartUrl) or "")
+            if not parts.netloc:
+                continue
+            sRootUrl = "{0}://{1}/".format(parts.scheme, parts.netloc)
+            robots = await self._fetchResource(sRootUrl + "robots.txt")
+            lstFound = []
+            for sLine in (robots or b"").decode("utf-8", "replace").splitlines():
+                sName, _, sValue = sLine.partition(":")
+                if sName.strip().lower() == "sitemap" and sValue.strip():
+                    lstFound.append(sValue.strip())
+            lstSitemapUrls.extend(lstFound or [sRootUrl + "sitemap.xml"])
+
+        setRead = set()
+        while lstSitemapUrls and len(setRead) < _iMaxSitemaps:
+            sSitemapUrl = lstSitemapUrls.pop(0)
+            if sSitemapUrl in setRead:
+                continue
+            setRead.add(sSitemapUrl)
+            contents = await self._fetchResource(sSitemapUrl)
+            if contents is None:
+                continue
+            lstNestedUrls, lstEntries = parseSitemap(contents)
+            lstSitemapUrls.extend(lstNestedUrls)
+            for sUrl, sLastModified, dPriority in lstEntries:
+                if self._frontier.add(sUrl, sLastModified=sLastModified, dPriority=dPriority):
+                    self._iSitemapUrls += 1
+
+    async def _fetchResource(self, sUrl):
+        # Returns the body of a robots.txt or sitemap, or None if it is not available.
+        limiter = self._limiter(urlsplit(sUrl).netloc)
+        try:
+            async with limiter:
+                self._iRequests += 1
+                iStatus, dictHeaders, body = await self._client.get(sUrl)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, HttpError):
+            return None
+        self._counterStatus[iStatus] += 1
+        return body if iStatus == 200 else None
+
+    def _limiter(self, sHost):
+        limiter = self._dictLimiters.get(sHost)
+        if limiter is None:
+            limiter = self._dictLimiters[sHost] = HostLimiter(self._iMaxConnectionsPerHost, self._dRequestsPerSecond)
+        return limiter
+
+    async def _work(self, lstFilePaths):
+        while True:
+            sUrl = await self._frontier.get()
+            if sUrl is None:
+                return
+            try:
+                filePath = await self._download(sUrl)
+                if filePath is not None:
+                    lstFilePaths.append(filePath)
+            except Exception as exception:
+                self._fail(sUrl, type(exception).__name__, str(exception))
+            finally:
+                self._frontier.taskDone()
+
+    async def _download(self, sUrl):
+        # Returns the path the page was stored at (or handed to the consumer with) or None if the url is no html page.
+        limiter = self._limiter(urlsplit(sUrl).netloc)
+        filePath = os.path.join(self._projectDirPath, mirrorPath(sUrl))
+        entry = self._cache.lookup(sUrl) if self._cache is not None else None
+        if entry is not None and entry.filePath != filePath:
+            entry = None
+        dictRequestHeaders = {}
+        if entry is not None and entry.sEtag is not None:
+            dictRequestHeaders["If-None-Match"] = entry.sEtag
+        if entry is not None and entry.sLastModified is not None:
+            dictRequestHeaders["If-Modified-Since"] = entry.sLastModified
+
+        for iAttempt in range(self._iRetries + 1):
+            bLastAttempt = iAttempt == self._iRetries
+            try:
+                async with limiter:
+                    self._iRequests += 1
+                    iStatus, dictHeaders, body = await self._client.get(sUrl, dictRequestHeaders)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                if bLastAttempt:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** iAttempt)
+                continue
+            self._counterStatus[iStatus] += 1
+            if (iStatus == 429 or iStatus >= 500) and not bLastAttempt:
+                await asyncio.sleep(0.5 * 2 ** iAttempt)
+                continue
+            break
+
+        loop = asyncio.get_running_loop()
+        if iStatus == 304 and entry is not None:
+            # The stored page is still current; its links are read from disk to continue the crawl.
+            self._iNotModified += 1
+            self._iBytesSaved += entry.iSize
+            self._queueLinks(await loop.run_in_executor(None, _readFile, filePath), sUrl)
+            return filePath
+        if iStatus in (301, 302, 303, 307, 308) and "location" in dictHeaders:
+            self._frontier.add(dictHeaders["location"], sUrl)
+            return None
+        if iStatus != 200:
+            if self._cache is not None:
+                self._cache.remove(sUrl)
+            self._fail(sUrl, "HTTP {0}".format(iStatus))
+            return None
+        if "html" not in dictHeaders.get("content-type", "text/html").lower():
+            return None
+        self._queueLinks(body, sUrl)
+        if self._consumer is not None:
+            self._iPages += 1
+            self._iBytes += len(body)
+            await self._consumer.consume(sUrl, filePath, body)
+            return filePath
+
+        sHash = crawler.hashContents(body) if self._cache is not None else None
+        if entry is not None and entry.sHash == sHash:
+            # Same content as stored; the file is left untouched, so its modification time stays.
+            self._iUnchangedPages += 1
+        else:
+            await loop.run_in_executor(None, _writeFile, filePath, body)
+        if self._cache is not None:
+            self._cache.update(sUrl, dc.CacheEntry(filePath, dictHeaders.get("etag"), dictHeaders.get("last-modified"),
+                                                   sHash, len(body), os.stat(filePath).st_mtime_ns))
+        self._iPages += 1
+        self._iBytes += len(body)
+        return filePath
+
+    def _queueLinks(self, body, sUrl):
+        # The category links of the breadcrumb are queued first, so the PriorityFrontier ranks them as such.
+        for matchBreadcrumb in _regexBreadcrumb.finditer(body):
+            for match in _regexLinks.finditer(matchBreadcrumb.group(2)):
+                sLink = (match.group(1) or match.group(2) or match.group(3)).decode("utf-8", "replace")
+                self._frontier.add(sLink.replace("&amp;", "&"), sUrl, bBreadcrumb=True)
+        for match in _regexLinks.finditer(body):
+            sLink = (match.group(1) or match.group(2) or match.group(3)).decode("utf-8", "replace")
+            if not sLink.startswith("#"):
+                self._frontier.add(sLink.replace("&amp;", "&"), sUrl)
+
+    def _fail(self, sUrl, sErrorType, sMessage=""):
+        self._iFailures += 1
+        if self._journal is not None:
+            self._journal.record("download", sErrorType, sUrl, sMessage)
+
+def _readFile(filePath):
+    with open(filePath, 'rb') as fileHandler:
+        return fileHandler.read()
+
+def _writeFile(filePath, contents):
+    # Written to a temporary file first, so an interrupted download never leaves a partial page in the mirror.
+    os.makedirs(os.path.dirname(filePath), exist_ok=True)
+    temporaryPath = filePath + ".part"
+    with open(temporaryPath, 'wb') as fileHandler:
+        fileHandler.write(contents)
+    os.replace(temporaryPath, filePath)
+
+# ----------------------------------------------------------------------------------------------------------------------
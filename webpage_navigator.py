@@ -1,39 +1,227 @@
 # ----------------------------------------------------------------------------------------------------------------------
+from fnmatch import translate
+from multiprocessing import Pool
 from os import scandir
-from os.path import isfile
 
 import crawler
+import json
+import os
+import re
 
 # ----------------------------------------------------------------------------------------------------------------------
-def crawlThroughSubDirs(dirPath, setMemo=set()):
+# Name patterns (fnmatch syntax) of the files the web crawler is called for.
+lstDefaultIncludePatterns = ["*.html"]
+
+# Name patterns of the files and directories which are skipped; category index pages hold no product information.
+lstDefaultExcludePatterns = ["*index.html"]
+
+# ----------------------------------------------------------------------------------------------------------------------
+def crawlThroughSubDirs(dirPath, session, setMemo=None, manifest=None):
     """
-    Navigates through all sub directories recursively and calls the web crawler for each html file found.
-        dirPath: Path to the current directory (string).
-        setMemo: Lookup table containing all processed directory and file paths (set).
+    Navigates through all sub directories and calls the web crawler for each html file found.
+        dirPath: Path to the root directory (string).
+        session: Crawl session the product information is written to (CrawlSession).
+        setMemo: Lookup table of the directories processed so far, which are not entered again (set).
+        manifest: CrawlManifest of the previous crawls; unchanged files are not parsed again (CrawlManifest).
     """
-    if dirPath in setMemo:
-        return
-    setMemo.add(dirPath)
+    if setMemo is None:
+        setMemo = set()
+    for filePath in iterHtmlFiles(dirPath, setMemo):
+        callWebCrawler(filePath, session, setMemo, manifest)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def crawlThroughSubDirsParallel(dirPath, session, iWorkers=None, iMaxTasksPerChild=200, iChunkSize=16, manifest=None,
+                                indexPath=None, checkpoint=None, iFirstPage=0):
+    """
+    Navigates through all sub directories and parses the html files found in a pool of worker processes.
+    The rows and statistics are merged back in the main process in sorted file path order, so the output does not
+    depend on the number of workers or on their scheduling.
+        dirPath: Path to the root directory (string).
+        session: Crawl session the product information is written to (CrawlSession).
+        iWorkers: Number of worker processes; None uses the number of CPUs (int).
+        iMaxTasksPerChild: Number of tasks (chunks of iChunkSize files) after which a worker process is replaced by
+                           a fresh one to keep the memory bounded (int).
+        iChunkSize: Number of files sent to a worker process at once (int).
+        manifest: CrawlManifest of the previous crawls; unchanged files are not parsed again (CrawlManifest).
+        indexPath: Path to the file index of the directory, see collectHtmlFiles() (string).
+        checkpoint: CrawlCheckpoint saved periodically, so an interrupted crawl can be resumed (CrawlCheckpoint).
+        iFirstPage: Number of sorted html files merged before the crawl was interrupted, which are skipped (int).
+    """
+    lstFilePaths = collectHtmlFiles(dirPath, indexPath)
+    if checkpoint is not None:
+        checkpoint.begin(session.filePath(), lstFilePaths, iFirstPage)
+    if manifest is not None:
+        manifest.markSeen(lstFilePaths[:iFirstPage])
+    lstFilePaths = lstFilePaths[iFirstPage:]
+    if manifest is not None:
+        lstLookups = [(filePath,) + manifest.lookup(filePath) for filePath in lstFilePaths]
+    else:
+        lstLookups = [(filePath, None, None) for filePath in lstFilePaths]
+    lstTasks = [(filePath, sPreviousHash) for filePath, result, sPreviousHash in lstLookups if result is None]
+
+    with Pool(processes=iWorkers, maxtasksperchild=iMaxTasksPerChild, initializer=crawler.initWorker,
+              initargs=crawler.workerInitArgs()) as pool:
+        iterResults = pool.imap(crawler.parseProductTask, lstTasks, chunksize=iChunkSize)
+        for iPage, (filePath, result, sPreviousHash) in enumerate(lstLookups, iFirstPage + 1):
+            if result is None:
+                result = next(iterResults)
+            crawler.mergeProductInfo(result, session, manifest)
+            if checkpoint is not None:
+                checkpoint.saveIfDue(iPage, session)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def collectHtmlFiles(dirPath, indexPath=None):
+    """
+    Returns the sorted list of html files the web crawler is called for by crawlThroughSubDirs().
+    If a file index of the directory exists, it is read instead of walking the directory again.
+        dirPath: Path to the root directory (string).
+        indexPath: Path to the file index of the directory; it is written by walking the directory if it does not
+                   exist yet. None walks the directory without index (string).
+    """
+    if indexPath is None:
+        return sorted(iterHtmlFiles(dirPath))
+    lstFilePaths = readFileIndex(indexPath, dirPath)
+    if lstFilePaths is None:
+        lstFilePaths = writeFileIndex(dirPath, indexPath)
+    return lstFilePaths
+
+# ----------------------------------------------------------------------------------------------------------------------
+def iterHtmlFiles(dirPath, setMemo=None, lstIncludePatterns=None, lstExcludePatterns=None):
+    """
+    Navigates through all sub directories iteratively and lazily yields the html files the web crawler is called
+    for by crawlThroughSubDirs(), the entries of every directory in name order. The file types are taken from the
+    directory entries, so no further system call per file is needed. Symbolically linked directories are entered
+    only once.
+        dirPath: Path to the root directory (string).
+        setMemo: Lookup table of the directories processed so far, which are not entered again (set).
+        lstIncludePatterns: Name patterns of the files to yield; None uses lstDefaultIncludePatterns (list).
+        lstExcludePatterns: Name patterns of the files and directories to skip; None uses lstDefaultExcludePatterns
+                            (list).
+    """
+    if setMemo is None:
+        setMemo = set()
+    regexInclude = compilePatterns(lstDefaultIncludePatterns if lstIncludePatterns is None else lstIncludePatterns)
+    regexExclude = compilePatterns(lstDefaultExcludePatterns if lstExcludePatterns is None else lstExcludePatterns)
+
+    lstStack = [dirPath]
+    while lstStack:
+        currentDirPath = lstStack.pop()
+        if currentDirPath in setMemo:
+            continue
+        setMemo.add(currentDirPath)
+
+        lstSubDirPaths = []
+        with scandir(currentDirPath) as iterEntries:
+            lstEntries = sorted(iterEntries, key=lambda entry: entry.name)
+        for entry in lstEntries:
+            if regexExclude is not None and regexExclude.match(entry.name):
+                continue
+            if entry.is_dir():
+                if entry.is_symlink():
+                    # A link may point to a directory which is walked anyway or to one of its own parents.
+                    realDirPath = os.path.realpath(entry.path)
+                    if realDirPath in setMemo:
+                        continue
+                    setMemo.add(realDirPath)
+                lstSubDirPaths.append(entry.path)
+            elif regexInclude is not None and regexInclude.match(entry.name) and entry.is_file():
+                yield entry.path
+        # Pushed in reverse order, so the sub directories are walked in name order.
+        lstStack.extend(reversed(lstSubDirPaths))
+
+# ----------------------------------------------------------------------------------------------------------------------
+def compilePatterns(lstPatterns):
+    """
+    Returns one regular expression matching a name if any of the name patterns (fnmatch syntax) does, or None if
+    there are no patterns.
+        lstPatterns: List of name patterns.
+    """
+    if not lstPatterns:
+        return None
+    return re.compile("|".join(translate(sPattern) for sPattern in lstPatterns))
 
-    for element in scandir(dirPath):
-        if element.is_dir():
-            crawlThroughSubDirs(element.path, setMemo)
-        if isfile(element.path) and element.path.endswith(".html"):
-            callWebCrawler(element.path, setMemo)
+# ----------------------------------------------------------------------------------------------------------------------
+def writeFileIndex(dirPath, indexPath, lstIncludePatterns=None, lstExcludePatterns=None, lstFilePaths=None):
+    """
+    Walks the directory (see iterHtmlFiles()) and writes the sorted paths of all html files found, relative to the
+    directory, to the file index. The first line holds the directory and the patterns the index was built with.
+    The index is replaced atomically, so readers never see a partial index.
+    Returns the sorted list of html file paths.
+        dirPath: Path to the root directory (string).
+        indexPath: Path to the file index (string).
+        lstIncludePatterns: Name patterns of the files to index, see iterHtmlFiles() (list).
+        lstExcludePatterns: Name patterns of the files and directories to skip, see iterHtmlFiles() (list).
+        lstFilePaths: Paths of the files within the directory to index instead of walking it, e.g. the pages of a
+                      download limited by a budget; they are filtered by the same patterns (list).
+    """
+    if lstFilePaths is None:
+        lstFilePaths = sorted(iterHtmlFiles(dirPath, lstIncludePatterns=lstIncludePatterns,
+                                            lstExcludePatterns=lstExcludePatterns))
+    else:
+        lstFilePaths = sorted(_filterHtmlFiles(dirPath, lstFilePaths, lstIncludePatterns, lstExcludePatterns))
+    dictHeader = {"root": os.path.abspath(dirPath), "files": len(lstFilePaths),
+                  "include": lstDefaultIncludePatterns if lstIncludePatterns is None else lstIncludePatterns,
+                  "exclude": lstDefaultExcludePatterns if lstExcludePatterns is None else lstExcludePatterns}
+    temporaryPath = indexPath + ".tmp"
+    with open(temporaryPath, 'w', encoding="utf-8", newline="\n") as fileHandler:
+        fileHandler.write(json.dumps(dictHeader) + "\n")
+        for filePath in lstFilePaths:
+            fileHandler.write(os.path.relpath(filePath, dirPath) + "\n")
+    os.replace(temporaryPath, indexPath)
+    return lstFilePaths
+
+def _filterHtmlFiles(dirPath, lstFilePaths, lstIncludePatterns, lstExcludePatterns):
+    # Yields the files iterHtmlFiles() would yield out of the specified ones, without walking the directory.
+    regexInclude = compilePatterns(lstDefaultIncludePatterns if lstIncludePatterns is None else lstIncludePatterns)
+    regexExclude = compilePatterns(lstDefaultExcludePatterns if lstExcludePatterns is None else lstExcludePatterns)
+    for filePath in set(lstFilePaths):
+        lstNames = os.path.relpath(filePath, dirPath).split(os.sep)
+        if regexInclude is None or not regexInclude.match(lstNames[-1]) or lstNames[0] == os.pardir:
+            continue
+        if regexExclude is not None and any(regexExclude.match(sName) for sName in lstNames):
+            continue
+        if os.path.isfile(filePath):
+            yield filePath
+
+# ----------------------------------------------------------------------------------------------------------------------
+def readFileIndex(indexPath, dirPath=None):
+    """
+    Reads the file index written by writeFileIndex().
+    Returns the sorted list of html file paths joined to the directory, or None if there is no complete index of
+    the directory.
+        indexPath: Path to the file index (string).
+        dirPath: Path to the root directory the paths are joined to; None uses the directory stored in the index.
+                 An index of another directory is not used (string).
+    """
+    try:
+        with open(indexPath, 'r', encoding="utf-8") as fileHandler:
+            dictHeader = json.loads(fileHandler.readline())
+            lstRelativePaths = fileHandler.read().splitlines()
+    except (OSError, ValueError):
+        return None
+    if dirPath is None:
+        dirPath = dictHeader["root"]
+    elif os.path.abspath(dirPath) != dictHeader["root"]:
+        return None
+    if len(lstRelativePaths) != dictHeader["files"]:
+        return None
+    return [os.path.join(dirPath, relativePath) for relativePath in lstRelativePaths]
 
 # ----------------------------------------------------------------------------------------------------------------------
-def callWebCrawler(filePath, setMemo):
+def callWebCrawler(filePath, session, setMemo, manifest=None):
     """
     Calls the web crawler for the specified file path.
         filePath: Path to the current file (string).
+        session: Crawl session the product information is written to (CrawlSession).
         setMemo: Lookup table containing all processed directory and file paths (set).
+        manifest: CrawlManifest of the previous crawls; unchanged files are not parsed again (CrawlManifest).
     """
     if filePath in setMemo:
         return
     if filePath.endswith('index.html'):
         return
-    crawler.getAllProductInfo(filePath)
+    crawler.getAllProductInfo(filePath, session, manifest)
 
 # ----------------------------------------------------------------------------------------------------------------------
-def printCrawlerStatistics():
-    crawler.printStatistics()
+def printCrawlerStatistics(session):
+    crawler.printStatistics(session)
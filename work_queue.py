@@ -0,0 +1,340 @@
+# ----------------------------------------------------------------------------------------------------------------------
+from collections import namedtuple
+from multiprocessing import Pool
+
+import crawl_journal as cj
+import crawler
+import csv
+import os
+import pyarrow.parquet as pq
+import shutil
+import socket
+import sqlite3
+import time
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Batch of pages claimed by a worker, see WorkQueue.claim().
+#     iBatch: Number of the batch.
+#     sWorker: Name of the worker holding the lease.
+#     lstFilePaths: Paths to the html files of the batch, joined to the mirror directory of the worker.
+#     dExpires: Wall clock time at which the lease expires unless it is renewed.
+Lease = namedtuple("Lease", ["iBatch", "sWorker", "lstFilePaths", "dExpires"])
+
+# ----------------------------------------------------------------------------------------------------------------------
+class WorkQueue:
+    """
+    Shared work queue of the pages of a mirror in an SQLite database. Several crawler processes, also on several
+    nodes sharing the mirror, crawl the mirror together. The pages are enqueued in batches. A worker claims a batch
+    with a lease, crawls it into part files of its own and completes the batch. The lease of a crashed or stalled
+    worker expires, and its batch is claimed again by another worker. A batch whose lease expired iMaxAttempts times
+    is given up as failed. The parts of the completed batches are merged into the daily files by mergeParts(), which
+    fails if a batch is not done, so an incomplete table is never taken for a complete one.
+    Every enqueue() opens a new run, which the coordinating process closes by closeRun() once its parts are merged.
+    Workers wait for an open run, so they can be started before the coordinator has enqueued the pages, and the
+    finished batches of a closed run do not end them.
+    The database and the parts directory next to it have to be on a file system with working POSIX locks, shared
+    by all nodes. The rollback journal is used instead of WAL, which needs shared memory and does not work across
+    hosts. Leases expire by wall clock time, so the clocks of the nodes have to be synchronized.
+    """
+
+    def __init__(self, queuePath, dLeaseSeconds=300.0, iMaxAttempts=3):
+        """
+        Opens the queue, creating it if it does not exist.
+            queuePath: Path to the SQLite database file.
+            dLeaseSeconds: Time after which a lease expires unless it is renewed.
+            iMaxAttempts: Number of claims after which a batch whose lease expired is given up.
+        """
+        self._queuePath = queuePath
+        self._dLeaseSeconds = dLeaseSeconds
+        self._iMaxAttempts = iMaxAttempts
+        # Transactions are started explicitly; a busy database is retried for up to a minute.
+        self._connection = sqlite3.connect(queuePath, timeout=60.0, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=DELETE")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS batches (id INTEGER PRIMARY KEY, state TEXT, worker TEXT, "
+                                 "lease_expires REAL, attempts INTEGER, part_name TEXT)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS pages (batch INTEGER, path TEXT)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS pages_batch ON pages (batch)")
+
+    def partDirPath(self):
+        """
+        Returns the directory next to the database the workers write their part files to.
+        """
+        return os.path.splitext(self._queuePath)[0] + "_parts"
+
+    def enqueue(self, dirPath, lstFilePaths, iBatchSize=500):
+        """
+        Replaces the content of the queue by the specified pages in batches of iBatchSize pages, removes all part
+        files of the previous run and opens a new run. The paths are stored relative to the mirror directory, so
+        every node may mount the mirror elsewhere.
+        Returns the number of batches.
+            dirPath: Path to the mirror directory.
+            lstFilePaths: Paths to the html files within the mirror directory.
+            iBatchSize: Number of pages per batch.
+        """
+        shutil.rmtree(self.partDirPath(), ignore_errors=True)
+        os.makedirs(self.partDirPath())
+        lstBatches = [lstFilePaths[iBegin:iBegin + iBatchSize] for iBegin in range(0, len(lstFilePaths), iBatchSize)]
+        with self._transaction():
+            self._connection.execute("DELETE FROM pages")
+            self._connection.execute("DELETE FROM batches")
+            self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('root', ?)",
+                                     (os.path.abspath(dirPath),))
+            iRun = self._run()[0] + 1
+            self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run', ?)", (str(iRun),))
+            self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run_state', 'open')")
+            for iBatch, lstBatch in enumerate(lstBatches):
+                self._connection.execute("INSERT INTO batches (id, state, worker, lease_expires, attempts, part_name) "
+                                         "VALUES (?, 'pending', NULL, 0.0, 0, NULL)", (iBatch,))
+                self._connection.executemany("INSERT INTO pages (batch, path) VALUES (?, ?)",
+                                             [(iBatch, os.path.relpath(filePath, dirPath)) for filePath in lstBatch])
+        return len(lstBatches)
+
+    def openRun(self):
+        """
+        Returns the number of the open run or None if no run is open, i.e. nothing has been enqueued yet or the last
+        run has been closed.
+        """
+        iRun, bOpen = self._run()
+        return iRun if bOpen else None
+
+    def closeRun(self):
+        """
+        Closes the current run, e.g. once its parts have been merged. Workers waiting for work then wait for the
+        next run instead of treating the finished batches of this run as theirs.
+        """
+        with self._transaction():
+            self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run_state', 'closed')")
+
+    def claim(self, sWorker, dirPath=None):
+        """
+        Claims the next pending batch or a batch whose lease expired.
+        Returns the Lease of the batch or None if no batch can be claimed at the moment, see isFinished().
+            sWorker: Name of the claiming worker, unique across all nodes.
+            dirPath: Path to the mirror directory on this node; None uses the directory given to enqueue().
+        """
+        dNow = time.time()
+        with self._transaction():
+            self._connection.execute("UPDATE batches SET state = 'failed' WHERE state = 'leased' AND lease_expires < ? "
+                                     "AND attempts >= ?", (dNow, self._iMaxAttempts))
+            row = self._connection.execute("SELECT id FROM batches WHERE state = 'pending' OR (state = 'leased' AND "
+                                           "lease_expires < ?) ORDER BY id LIMIT 1", (dNow,)).fetchone()
+            if row is None:
+                return None
+            iBatch = row[0]
+            dExpires = dNow + self._dLeaseSeconds
+            self._connection.execute("UPDATE batches SET state = 'leased', worker = ?, lease_expires = ?, "
+                                     "attempts = attempts + 1 WHERE id = ?", (sWorker, dExpires, iBatch))
+            if dirPath is None:
+                dirPath = self._connection.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()[0]
+            lstFilePaths = [os.path.join(dirPath, row[0]) for row in
+                            self._connection.execute("SELECT path FROM pages WHERE batch = ? ORDER BY rowid", (iBatch,))]
+        return Lease(iBatch, sWorker, lstFilePaths, dExpires)
+
+    def renew(self, lease):
+        """
+        Extends the lease by the lease time.
+        Returns the renewed Lease or None if the lease has been lost to another worker.
+            lease: Lease returned by claim() or renew().
+        """
+        dExpires = time.time() + self._dLeaseSeconds
+        with self._transaction():
+            cursor = self._connection.execute("UPDATE batches SET lease_expires = ? WHERE id = ? AND worker = ? AND "
+                                              "state = 'leased'", (dExpires, lease.iBatch, lease.sWorker))
+        if cursor.rowcount != 1:
+            return None
+        return lease._replace(dExpires=dExpires)
+
+    def renewIfDue(self, lease):
+        """
+        Renews the lease once half of the lease time has passed.
+        Returns the lease, renewed if it was due, or None if the lease has been lost to another worker.
+            lease: Lease returned by claim() or renew().
+        """
+        if time.time() < lease.dExpires - self._dLeaseSeconds / 2:
+            return lease
+        return self.renew(lease)
+
+    def complete(self, lease, sPartName):
+        """
+        Marks the batch of the lease as done with the specified part. A lease which expired is still completed as
+        long as no other worker has claimed the batch meanwhile.
+        Returns False if the lease has been lost, in which case the part has to be discarded.
+            lease: Lease returned by claim() or renew().
+            sPartName: Base name of the part files in the parts directory, without extension.
+        """
+        with self._transaction():
+            cursor = self._connection.execute("UPDATE batches SET state = 'done', part_name = ? WHERE id = ? AND "
+                                              "worker = ? AND state = 'leased'", (sPartName, lease.iBatch, lease.sWorker))
+        return cursor.rowcount == 1
+
+    def release(self, lease):
+        """
+        Returns the batch of the lease to the queue at once, e.g. if the worker is stopped, so another worker does
+        not have to wait for the lease to expire.
+            lease: Lease returned by claim() or renew().
+        """
+        with self._transaction():
+            self._connection.execute("UPDATE batches SET state = 'pending', lease_expires = 0.0 WHERE id = ? AND "
+                                     "worker = ? AND state = 'leased'", (lease.iBatch, lease.sWorker))
+
+    def counts(self):
+        """
+        Returns a dictionary of batch state ("pending", "leased", "done", "failed") and number of batches.
+        """
+        dictCounts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        for sState, iCount in self._connection.execute("SELECT state, COUNT(*) FROM batches GROUP BY state"):
+            dictCounts[sState] = iCount
+        return dictCounts
+
+    def isFinished(self, iRun=None):
+        """
+        Returns True if every batch of the run is done or failed, or if the run is no longer the open one.
+            iRun: Number of the run, see openRun(); None checks the batches of the current run only.
+        """
+        if iRun is not None and self.openRun() != iRun:
+            return True
+        dictCounts = self.counts()
+        return dictCounts["pending"] == 0 and dictCounts["leased"] == 0
+
+    def mergeParts(self, filePath, parquetFilePath=None):
+        """
+        Merges the parts of all completed batches in batch order into the daily CSV file (and Parquet file).
+        Only the part of the worker which completed a batch is used, so a batch crawled twice is not merged twice.
+        Raises a RuntimeError without writing the files if any batch is not done, e.g. because it failed.
+        Returns the number of merged parts.
+            filePath: Path to the merged CSV file.
+            parquetFilePath: Path to the merged Parquet file; None skips the Parquet parts.
+        """
+        dictCounts = self.counts()
+        if dictCounts["done"] != sum(dictCounts.values()):
+            raise RuntimeError("Only {0} of {1} batches of the work queue are done ({2} failed), the parts are not "
+                               "merged.".format(dictCounts["done"], sum(dictCounts.values()), dictCounts["failed"]))
+        lstPartNames = [row[0] for row in
+                        self._connection.execute("SELECT part_name FROM batches WHERE state = 'done' ORDER BY id")]
+        lstPartPaths = [os.path.join(self.partDirPath(), sPartName) for sPartName in lstPartNames]
+        with open(filePath, 'w', newline='', encoding='utf-8') as fileHandler:
+            csv.writer(fileHandler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL) \
+                .writerow(crawler.lstProductColumns)
+            for partPath in lstPartPaths:
+                with open(partPath + ".csv", 'r', newline='', encoding='utf-8') as partHandler:
+                    partHandler.readline()
+                    shutil.copyfileobj(partHandler, fileHandler)
+        if parquetFilePath is not None and lstPartPaths:
+            writer = None
+            try:
+                for partPath in lstPartPaths:
+                    table = pq.read_table(partPath + ".parquet")
+                    if writer is None:
+                        writer = pq.ParquetWriter(parquetFilePath, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        return len(lstPartPaths)
+
+    def printStatistics(self):
+        dictCounts = self.counts()
+        print("Work queue batches: {0} done, {1} failed, {2} leased, {3} pending".format(
+            dictCounts["done"], dictCounts["failed"], dictCounts["leased"], dictCounts["pending"]))
+
+    def close(self):
+        """
+        Closes the queue.
+        """
+        self._connection.close()
+
+    def _run(self):
+        # Number of the current run (0 if nothing has been enqueued yet) and if it is open.
+        dictMeta = dict(self._connection.execute("SELECT key, value FROM meta WHERE key IN ('run', 'run_state')"))
+        return int(dictMeta.get("run", 0)), dictMeta.get("run_state") == "open"
+
+    def _transaction(self):
+        # Takes the write lock at the beginning, so two workers never claim the same batch.
+        self._connection.execute("BEGIN IMMEDIATE")
+        return self._connection
+
+# ----------------------------------------------------------------------------------------------------------------------
+def defaultWorkerName():
+    """
+    Returns a worker name unique across all nodes, made of host name and process id.
+    """
+    return "{0}-{1}".format(socket.gethostname(), os.getpid())
+
+# ----------------------------------------------------------------------------------------------------------------------
+def runWorker(workQueue, session, dirPath=None, sWorker=None, iWorkers=None, iChunkSize=16, dictAdjustDataTypes=None,
+              dPollSeconds=5.0):
+    """
+    Waits for an open run of the queue (see WorkQueue.openRun()), claims its batches until the run is finished and
+    parses the pages of every batch in a pool of worker processes.
+    The rows of a batch are written to part files of their own, which become visible only when the batch is done.
+    The lease is renewed while the batch is crawled; if it is lost anyway, the part is discarded. Every batch is
+    crawled in a session of its own, whose statistics and failures are added to the session only once the batch is
+    completed, so a batch crawled again by another worker is not counted twice.
+    Returns the number of batches completed by this worker.
+        workQueue: WorkQueue to take the batches from.
+        session: CrawlSession collecting the statistics and failures of the completed batches; its sinks are not used.
+        dirPath: Path to the mirror directory on this node; None uses the directory given to WorkQueue.enqueue().
+        sWorker: Name of this worker, unique across all nodes; None uses defaultWorkerName().
+        iWorkers: Number of worker processes parsing the pages; None uses the number of CPUs.
+        iChunkSize: Number of files sent to a worker process at once.
+        dictAdjustDataTypes: Dictionary of column name and SQL data type of the Parquet parts; None writes CSV only.
+        dPollSeconds: Time to wait before looking again for an open run or, while all remaining batches are leased by
+                      other workers, before claiming again.
+    """
+    if sWorker is None:
+        sWorker = defaultWorkerName()
+    iCompleted = 0
+    iRun = None
+    with Pool(processes=iWorkers, initializer=crawler.initWorker, initargs=crawler.workerInitArgs()) as pool:
+        while True:
+            if iRun is None:
+                iRun = workQueue.openRun()
+                if iRun is None:
+                    # The coordinator has not enqueued the pages yet (or the last run is over); wait for a new run.
+                    time.sleep(dPollSeconds)
+                    continue
+            lease = workQueue.claim(sWorker, dirPath)
+            if lease is None:
+                if workQueue.isFinished(iRun):
+                    return iCompleted
+                time.sleep(dPollSeconds)
+                continue
+
+            sPartName = "part_{0:06d}_{1}".format(lease.iBatch, sWorker)
+            temporaryPath = os.path.join(workQueue.partDirPath(), sPartName + ".tmp")
+            # Every page is recorded at most once, so the journal of the batch keeps all of its failures.
+            batchSession = crawler.CrawlSession(temporaryPath + ".csv", tracer=session.tracer(),
+                                                journal=cj.FailureJournal(iRecentEntries=len(lease.lstFilePaths)))
+            if dictAdjustDataTypes is not None:
+                batchSession.setParquetFilePath(temporaryPath + ".parquet", dictAdjustDataTypes)
+            lstTasks = [(filePath, None) for filePath in lease.lstFilePaths]
+            renewedLease = lease
+            try:
+                for result in pool.imap(crawler.parseProductTask, lstTasks, chunksize=iChunkSize):
+                    crawler.mergeProductInfo(result, batchSession)
+                    renewedLease = workQueue.renewIfDue(renewedLease)
+                    if renewedLease is None:
+                        break
+            except BaseException:
+                batchSession.close()
+                workQueue.release(lease)
+                raise
+            batchSession.close()
+
+            lstExtensions = [".csv"] if dictAdjustDataTypes is None else [".csv", ".parquet"]
+            if renewedLease is not None:
+                for sExtension in lstExtensions:
+                    os.replace(temporaryPath + sExtension, os.path.join(workQueue.partDirPath(), sPartName + sExtension))
+                if workQueue.complete(renewedLease, sPartName):
+                    session.workerStatistics().merge(batchSession.statistics())
+                    session.journal().merge(batchSession.journal())
+                    iCompleted += 1
+                    continue
+            # The lease has been lost, another worker crawls the batch again.
+            for sExtension in lstExtensions:
+                for partPath in [temporaryPath + sExtension, os.path.join(workQueue.partDirPath(), sPartName + sExtension)]:
+                    if os.path.exists(partPath):
+                        os.remove(partPath)
+
+# ----------------------------------------------------------------------------------------------------------------------